@@ -171,6 +171,40 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caché (precarga de códigos QR por evento para el escaneo)
+# En desarrollo se usa memoria local; en producción se recomienda un backend compartido
+# entre procesos (ej. 'django.core.cache.backends.redis.RedisCache') vía variables de entorno.
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='sigue-cache'),
+    }
+}
+if CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')):
+    # Los backends locales descartan entradas al superar MAX_ENTRIES (300 por defecto)
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=200000, cast=int)}
+
+# Duración (segundos) de la precarga de códigos QR de un evento
+QR_CACHE_TIMEOUT = config('QR_CACHE_TIMEOUT', default=60 * 60 * 12, cast=int)
+
+# Firma HMAC del contenido de los QR (ver event_management/qr_signing.py).
+# Si QR_SIGNING_KEY está vacía se deriva de SECRET_KEY.
+QR_SIGNING_KEY = config('QR_SIGNING_KEY', default='')
+# Los QR enviados codifican el contenido firmado en lugar del UUID (los UUID siguen siendo válidos)
+QR_PAYLOAD_FIRMADO = config('QR_PAYLOAD_FIRMADO', default=False, cast=bool)
+
+# Dashboard en vivo (ver event_management/en_vivo.py): las redenciones se publican en la caché,
+# que debe ser compartida entre procesos en producción (CACHE_BACKEND).
+# Cada cuántos segundos revisa la conexión si hay novedades, cuánto dura antes de que el
+# navegador se reconecte y cuántos segundos se conservan los mensajes para las reconexiones.
+EN_VIVO_INTERVALO = config('EN_VIVO_INTERVALO', default=0.5, cast=float)
+EN_VIVO_DURACION = config('EN_VIVO_DURACION', default=300, cast=int)
+EN_VIVO_RETENCION = config('EN_VIVO_RETENCION', default=600, cast=int)
+
+# Segundos que se reutiliza en la caché el flujo de escaneos por minuto de un evento
+FLUJO_ESCANEOS_CACHE = config('FLUJO_ESCANEOS_CACHE', default=15, cast=int)
+
 # Configuración de CORS (Intercambio de recursos de origen cruzado)
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",    # Frontend Vite local
@@ -214,6 +248,17 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='').replace(' ', '')
 # Email desde el cual se envían los correos
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default=EMAIL_HOST_USER if EMAIL_HOST_USER else 'noreply@refrigerios.edu.co')
+# Mensajes que se envían por una misma conexión SMTP antes de renovarla en los envíos masivos
+EMAIL_MAX_POR_CONEXION = config('EMAIL_MAX_POR_CONEXION', default=100, cast=int)
+# Hilos de envío concurrentes (cada uno con su conexión) y límite de la cuenta SMTP (mensajes/segundo, 0 = sin límite)
+EMAIL_HILOS_ENVIO = config('EMAIL_HILOS_ENVIO', default=4, cast=int)
+EMAIL_ENVIOS_POR_SEGUNDO = config('EMAIL_ENVIOS_POR_SEGUNDO', default=10, cast=float)
+# Reintentos ante respuestas temporales (4xx) del servidor, con espera exponencial
+EMAIL_MAX_REINTENTOS = config('EMAIL_MAX_REINTENTOS', default=3, cast=int)
+# Procesos que generan los PDF de certificados en los envíos masivos (0 = uno por núcleo)
+CERTIFICADOS_PROCESOS = config('CERTIFICADOS_PROCESOS', default=0, cast=int)
+# Directorio de las fuentes .ttf que los eventos pueden usar en el diseño de sus certificados
+CERTIFICADOS_DIR_FUENTES = config('CERTIFICADOS_DIR_FUENTES', default=os.path.join(MEDIA_ROOT, 'fuentes_certificados'))
 
 # Nota: Para Gmail, necesitas crear una "Contraseña de aplicación" si usas 2FA
 # Instrucciones en: https://support.google.com/accounts/answer/185833
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Asistente, CodigoQR, Evento, Inscripcion
+from .models import Asistente, CodigoQR, ContadorEvento, CorreoSaliente, Evento, Inscripcion, TrabajoEnvio
 
 # -----------------------------------------------------------------------------
 # CONFIGURACIÓN DEL PANEL DE ADMINISTRACIÓN
@@ -40,3 +40,29 @@ class InscripcionAdmin(admin.ModelAdmin):
     list_display = ['evento', 'usuario', 'fecha_inscripcion', 'asistio']
     list_filter = ['asistio', 'fecha_inscripcion', 'evento']
     search_fields = ['usuario__full_name', 'evento__titulo']
+
+@admin.register(TrabajoEnvio)
+class TrabajoEnvioAdmin(admin.ModelAdmin):
+    """Admin para revisar los trabajos de envío masivo"""
+    list_display = ['evento', 'tipo', 'estado', 'total', 'enviados', 'fallidos', 'omitidos', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['estado', 'tipo', 'fecha_creacion']
+    search_fields = ['evento__titulo']
+    readonly_fields = ['fecha_creacion', 'fecha_inicio', 'fecha_latido', 'fecha_fin']
+
+
+@admin.register(ContadorEvento)
+class ContadorEventoAdmin(admin.ModelAdmin):
+    """Admin de solo lectura de los contadores de estadísticas (se recalculan con 'reconstruir_contadores')"""
+    list_display = ['evento', 'tipo', 'dependencia', 'emitidos', 'redimidos']
+    list_filter = ['tipo']
+    search_fields = ['evento__titulo', 'dependencia']
+    readonly_fields = ['evento', 'tipo', 'dependencia', 'emitidos', 'redimidos']
+
+
+@admin.register(CorreoSaliente)
+class CorreoSalienteAdmin(admin.ModelAdmin):
+    """Admin de la bandeja de salida de correos"""
+    list_display = ['destinatario', 'evento', 'tipo', 'estado', 'intentos', 'fecha_envio']
+    list_filter = ['estado', 'tipo']
+    search_fields = ['destinatario', 'evento__titulo']
+    readonly_fields = ['hash_contenido', 'fecha_creacion', 'fecha_actualizacion', 'fecha_envio']
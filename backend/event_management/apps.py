@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EventManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'event_management'
+
+    def ready(self):
+        # Descuento de los contadores de estadísticas al borrar códigos e inscripciones
+        from . import signals  # noqa: F401
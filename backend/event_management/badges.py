@@ -0,0 +1,179 @@
+"""
+PDF imprimible de escarapelas (badges) con código QR para todo un evento.
+
+El canvas de reportlab conserva todas las páginas en memoria hasta save(), lo que con
+10.000 escarapelas se vuelve pesado. Aquí el PDF se escribe objeto por objeto y cada
+página se entrega al cliente apenas se termina (StreamingHttpResponse), así la memoria
+se mantiene constante. De reportlab se usan las métricas de las fuentes estándar para
+centrar y ajustar los textos.
+
+Las imágenes QR se leen de la caché de imágenes (qr_images), por lo que ejecuciones
+posteriores (o un 'prerenderizar_qrs' previo) no vuelven a rasterizar ningún código.
+"""
+import zlib
+from io import BytesIO
+
+from PIL import Image
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from .pdf_objetos import entrada_xref, fuente_estandar, objeto_pdf, stream_pdf, texto_pdf
+from .qr_images import obtener_imagen_qr
+from .qr_signing import contenido_qr
+
+ANCHO_PAGINA, ALTO_PAGINA = letter
+MARGEN = 36
+
+FUENTE_NOMBRE = 'Helvetica-Bold'
+FUENTE_TEXTO = 'Helvetica'
+
+
+class EscritorPDF:
+    """
+    Escritor mínimo de PDF incremental: cada objeto se convierte en bytes al escribirse
+    y solo se conservan sus posiciones para la tabla xref final.
+    """
+
+    def __init__(self):
+        self.posicion = 0
+        self.posiciones = {}
+        self.siguiente = 1
+
+    def reservar(self):
+        """Reserva un número de objeto para escribirlo más adelante."""
+        numero = self.siguiente
+        self.siguiente += 1
+        return numero
+
+    def _emitir(self, datos):
+        self.posicion += len(datos)
+        return datos
+
+    def encabezado(self):
+        return self._emitir(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def objeto(self, numero, diccionario, stream=None):
+        """Serializa un objeto (con stream opcional comprimido por el llamador)."""
+        self.posiciones[numero] = self.posicion
+        cuerpo = diccionario if stream is None else stream_pdf(stream, diccionario)
+        return self._emitir(objeto_pdf(numero, cuerpo))
+
+    def cierre(self, catalogo):
+        """Tabla xref y trailer."""
+        inicio_xref = self.posicion
+        lineas = [f'xref\n0 {self.siguiente}\n', '0000000000 65535 f \n']
+        for numero in range(1, self.siguiente):
+            lineas.append(entrada_xref(self.posiciones[numero]))
+        lineas.append(f'trailer\n<< /Size {self.siguiente} /Root {catalogo} 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n')
+        return self._emitir(''.join(lineas).encode('latin-1'))
+
+
+def _ajustar(texto, fuente, tamano, ancho, minimo=7):
+    """Reduce el tamaño de letra hasta que el texto quepa; si no alcanza, lo recorta."""
+    while tamano > minimo and stringWidth(texto, fuente, tamano) > ancho:
+        tamano -= 0.5
+    while len(texto) > 1 and stringWidth(texto, fuente, tamano) > ancho:
+        texto = texto[:-2] + '…'
+    return texto, tamano
+
+
+def _texto_centrado(fuente_pdf, fuente, tamano, texto, centro_x, y):
+    x = centro_x - stringWidth(texto, fuente, tamano) / 2
+    return f'BT /{fuente_pdf} {tamano:.1f} Tf {x:.2f} {y:.2f} Td ({texto_pdf(texto)}) Tj ET\n'
+
+
+def _imagen_qr(qr):
+    """Imagen del QR (desde la caché) como stream de 1 bit por pixel para el PDF."""
+    png, _ = obtener_imagen_qr(contenido_qr(qr))
+    imagen = Image.open(BytesIO(png)).convert('1')
+    return imagen.width, imagen.height, zlib.compress(imagen.tobytes())
+
+
+def generar_escarapelas_pdf(qrs, columnas=2, filas=4):
+    """
+    Genera el PDF de escarapelas por páginas (generador de bytes).
+
+    Args:
+        qrs (iterable): CodigoQR (con usuario/asistente precargados) en el orden de impresión.
+        columnas, filas: Distribución de escarapelas en cada página carta.
+    """
+    pdf = EscritorPDF()
+    yield pdf.encabezado()
+
+    catalogo = pdf.reservar()
+    paginas = pdf.reservar()
+    fuente_nombre = pdf.reservar()
+    fuente_texto = pdf.reservar()
+    yield pdf.objeto(fuente_nombre, fuente_estandar(FUENTE_NOMBRE))
+    yield pdf.objeto(fuente_texto, fuente_estandar(FUENTE_TEXTO))
+
+    ancho_celda = (ANCHO_PAGINA - 2 * MARGEN) / columnas
+    alto_celda = (ALTO_PAGINA - 2 * MARGEN) / filas
+    lado_qr = min(ancho_celda - 24, alto_celda - 64)
+    por_pagina = columnas * filas
+    ids_paginas = []
+
+    def escribir_pagina(lote):
+        contenido = ['0.6 G 0.5 w\n']
+        imagenes = []
+        partes = []
+
+        for indice, qr in enumerate(lote):
+            columna, fila = indice % columnas, indice // columnas
+            x0 = MARGEN + columna * ancho_celda
+            y0 = ALTO_PAGINA - MARGEN - (fila + 1) * alto_celda
+            centro = x0 + ancho_celda / 2
+
+            # Imagen QR como XObject independiente
+            ancho, alto, datos = _imagen_qr(qr)
+            numero_imagen = pdf.reservar()
+            partes.append(pdf.objeto(
+                numero_imagen,
+                f'/Type /XObject /Subtype /Image /Width {ancho} /Height {alto} '
+                f'/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode',
+                datos
+            ))
+            imagenes.append(f'/Im{indice} {numero_imagen} 0 R')
+
+            x_qr = centro - lado_qr / 2
+            y_qr = y0 + alto_celda - 8 - lado_qr
+            contenido.append(f'{x0 + 4:.2f} {y0 + 4:.2f} {ancho_celda - 8:.2f} {alto_celda - 8:.2f} re S\n')
+            contenido.append(f'q {lado_qr:.2f} 0 0 {lado_qr:.2f} {x_qr:.2f} {y_qr:.2f} cm /Im{indice} Do Q\n')
+
+            info = qr.datos_asistente()
+            tipo = 'Entrada al Evento' if qr.tipo_comida == 'ENTRADA' else qr.tipo_comida
+            nombre, tamano = _ajustar(info['nombre_completo'].upper(), FUENTE_NOMBRE, 11, ancho_celda - 16)
+            contenido.append('0 g\n')
+            contenido.append(_texto_centrado('F1', FUENTE_NOMBRE, tamano, nombre, centro, y_qr - 14))
+            contenido.append(_texto_centrado('F2', FUENTE_TEXTO, 9, f"ID: {info['identificacion']}", centro, y_qr - 27))
+            contenido.append(_texto_centrado('F2', FUENTE_TEXTO, 9, tipo, centro, y_qr - 39))
+            contenido.append('0.6 G\n')
+
+        numero_contenido = pdf.reservar()
+        partes.append(pdf.objeto(
+            numero_contenido, '/Filter /FlateDecode', zlib.compress(''.join(contenido).encode('latin-1'))
+        ))
+
+        numero_pagina = pdf.reservar()
+        ids_paginas.append(numero_pagina)
+        partes.append(pdf.objeto(
+            numero_pagina,
+            f'<< /Type /Page /Parent {paginas} 0 R /MediaBox [0 0 {ANCHO_PAGINA:.0f} {ALTO_PAGINA:.0f}] '
+            f'/Resources << /Font << /F1 {fuente_nombre} 0 R /F2 {fuente_texto} 0 R >> '
+            f'/XObject << {" ".join(imagenes)} >> >> /Contents {numero_contenido} 0 R >>'
+        ))
+        return b''.join(partes)
+
+    lote = []
+    for qr in qrs:
+        lote.append(qr)
+        if len(lote) == por_pagina:
+            yield escribir_pagina(lote)
+            lote = []
+    if lote or not ids_paginas:
+        yield escribir_pagina(lote)
+
+    kids = ' '.join(f'{numero} 0 R' for numero in ids_paginas)
+    yield pdf.objeto(paginas, f'<< /Type /Pages /Kids [{kids}] /Count {len(ids_paginas)} >>')
+    yield pdf.objeto(catalogo, f'<< /Type /Catalog /Pages {paginas} 0 R >>')
+    yield pdf.cierre(catalogo)
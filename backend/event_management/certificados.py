@@ -0,0 +1,293 @@
+"""
+Certificados guardados una sola vez y direccionados por contenido.
+
+La clave de cada certificado es un hash de evento + asistente (id y nombre) + versión de la
+plantilla (SHA-256 de sus bytes) + diseño del evento (Evento.diseno_certificado). El PDF se guarda en
+el storage de Django bajo certificados/<evento>/<asistente>/<clave>.pdf y solo se vuelve a
+generar si cambia alguno de esos datos; las versiones anteriores del asistente se borran al
+guardar la nueva.
+
+La misma clave sirve como ETag fuerte de la descarga. Las vistas previas se guardan en la
+caché por (versión de la plantilla, diseño), así repetir una vista previa es inmediato.
+
+Para los organizadores, todos los certificados de un evento se exportan como un ZIP o un
+PDF combinado que se transmite a medida que se genera (memoria constante).
+"""
+import hashlib
+import io
+import os
+import re
+import zipfile
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import content_disposition_header
+from django.utils.text import get_valid_filename
+
+from . import utils
+
+# Cambiar si se modifica la forma de generar los certificados para invalidar los guardados
+VERSION_CERTIFICADO = 1
+
+DIRECTORIO = 'certificados'
+
+# Duración (segundos) de las vistas previas en la caché
+DURACION_VISTA_PREVIA = 60 * 60 * 24
+
+# Datos de prueba de la vista previa
+NOMBRE_VISTA_PREVIA = 'JUAN PEREZ (VISTA PREVIA)'
+DOCUMENTO_VISTA_PREVIA = '123456789'
+
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@lru_cache(maxsize=32)
+def _version_plantilla(ruta_plantilla_pdf, mtime_ns, tamano):
+    return utils.huella_plantilla(ruta_plantilla_pdf)
+
+
+def version_plantilla(ruta_plantilla_pdf):
+    """Huella de la plantilla; se recalcula solo si cambian su mtime o su tamaño."""
+    estado = os.stat(ruta_plantilla_pdf)
+    return _version_plantilla(ruta_plantilla_pdf, estado.st_mtime_ns, estado.st_size)
+
+
+def diseno_evento(evento, diseno=None):
+    """
+    Diseño normalizado del certificado del evento (o el indicado), con las fuentes TTF
+    resueltas en CERTIFICADOS_DIR_FUENTES.
+
+    Raises:
+        ValueError: si el diseño no es válido.
+    """
+    if diseno is None:
+        diseno = evento.diseno_certificado
+    return utils.normalizar_diseno(diseno, settings.CERTIFICADOS_DIR_FUENTES)
+
+
+def clave_certificado(evento, usuario, version, huella_diseno):
+    """Clave (SHA-256) del certificado del usuario con la versión de plantilla y la huella de diseño dadas."""
+    texto = f'{VERSION_CERTIFICADO}|{evento.pk}|{usuario.pk}|{usuario.full_name}|{version}|{huella_diseno}'
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def actualizar_plantilla(evento, archivo):
+    """
+    Reemplaza la plantilla del evento solo si el archivo subido es distinto (por SHA-256) de la
+    actual, así subirla de nuevo en cada vista previa no reescribe el archivo ni invalida los
+    certificados guardados.
+
+    Returns:
+        bool: True si la plantilla cambió.
+    """
+    if evento.plantilla_certificado:
+        digest = hashlib.sha256()
+        for bloque in archivo.chunks():
+            digest.update(bloque)
+        archivo.seek(0)
+        try:
+            if digest.hexdigest() == version_plantilla(evento.plantilla_certificado.path):
+                return False
+        except OSError:
+            pass
+    evento.plantilla_certificado = archivo
+    evento.save(update_fields=['plantilla_certificado'])
+    return True
+
+
+def vista_previa(evento, diseno):
+    """
+    PDF de vista previa (datos de prueba) con el diseño normalizado dado, desde la caché
+    por (versión de la plantilla, huella del diseño).
+    """
+    ruta_plantilla = evento.plantilla_certificado.path
+    clave = f'certificado_vista_previa:{version_plantilla(ruta_plantilla)}:{utils.huella_diseno(diseno)}'
+    pdf = cache.get(clave)
+    if pdf is None:
+        generado = utils.generar_certificado_pdf(NOMBRE_VISTA_PREVIA, DOCUMENTO_VISTA_PREVIA, ruta_plantilla, diseno)
+        if generado is None:
+            raise ValueError('Error al generar PDF (stream vacío)')
+        pdf = generado.getvalue()
+        cache.set(clave, pdf, DURACION_VISTA_PREVIA)
+    return pdf
+
+
+def _directorio(evento, usuario):
+    return f'{DIRECTORIO}/{evento.pk}/{get_valid_filename(str(usuario.pk))}'
+
+
+def ruta_certificado(evento, usuario, clave):
+    """Ruta del certificado dentro del storage."""
+    return f'{_directorio(evento, usuario)}/{clave}.pdf'
+
+
+def guardado(evento, usuario, clave):
+    """Ruta del certificado si ya está en el storage, o None."""
+    ruta = ruta_certificado(evento, usuario, clave)
+    return ruta if default_storage.exists(ruta) else None
+
+
+def guardar(evento, usuario, clave, pdf):
+    """
+    Guarda el PDF bajo su clave y borra las versiones anteriores del mismo asistente.
+    Si otro proceso ya lo guardó, se conserva ese (el contenido es el mismo).
+
+    Returns:
+        str: ruta del certificado en el storage.
+    """
+    ruta = ruta_certificado(evento, usuario, clave)
+    if not default_storage.exists(ruta):
+        nombre = default_storage.save(ruta, ContentFile(pdf))
+        if nombre != ruta:
+            default_storage.delete(nombre)
+
+    directorio = _directorio(evento, usuario)
+    _, archivos = default_storage.listdir(directorio)
+    for archivo in archivos:
+        if archivo != f'{clave}.pdf':
+            default_storage.delete(f'{directorio}/{archivo}')
+    return ruta
+
+
+def obtener(evento, usuario):
+    """
+    Certificado del usuario desde el storage; se genera y guarda solo si no existe
+    para la plantilla y el diseño actuales.
+
+    Returns:
+        tuple: (ruta en el storage, clave)
+    """
+    ruta_plantilla = evento.plantilla_certificado.path
+    diseno = diseno_evento(evento)
+    clave = clave_certificado(evento, usuario, version_plantilla(ruta_plantilla), utils.huella_diseno(diseno))
+    ruta = guardado(evento, usuario, clave)
+    if ruta is None:
+        pdf = utils.generar_certificado_pdf(usuario.full_name, usuario.id, ruta_plantilla, diseno)
+        if pdf is None:
+            raise ValueError('No se pudo generar el PDF')
+        ruta = guardar(evento, usuario, clave, pdf.getvalue())
+    return ruta, clave
+
+
+def nombre_archivo(usuario):
+    """Nombre con que se adjunta o descarga el certificado del usuario."""
+    return f"Certificado_{usuario.full_name.replace(' ', '_')}.pdf"
+
+
+class _SalidaZip(io.RawIOBase):
+    """
+    Destino del ZipFile que acumula lo escrito hasta que se entrega al cliente.
+    No admite seek/tell, así zipfile escribe cada entrada con descriptor de datos, sin retroceder.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def extraer(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def zip_certificados(evento, usuarios):
+    """
+    ZIP con el certificado de cada usuario como generador de bytes. Cada certificado se toma
+    del storage (o se genera y guarda la primera vez) y se entrega apenas se comprime.
+
+    Args:
+        usuarios (iterable): CustomUser en el orden de las entradas del ZIP.
+    """
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        for usuario in usuarios:
+            ruta, _ = obtener(evento, usuario)
+            with default_storage.open(ruta, 'rb') as pdf:
+                archivo_zip.writestr(f'{get_valid_filename(str(usuario.pk))}_{nombre_archivo(usuario)}', pdf.read())
+            yield salida.extraer()
+    yield salida.extraer()
+
+
+def pdf_combinado(evento, usuarios):
+    """
+    Un solo PDF con una página por usuario como generador de bytes (ver
+    PlantillaCertificado.generar_combinado). No pasa por el storage: cada página son unos
+    pocos bytes de texto sobre la plantilla compartida.
+
+    Raises:
+        ValueError: si el diseño usa fuentes TTF (la plantilla precompilada no las admite).
+    """
+    plantilla = utils.obtener_plantilla(evento.plantilla_certificado.path, diseno_evento(evento))
+    return plantilla.generar_combinado((usuario.full_name, usuario.id) for usuario in usuarios)
+
+
+def _rango(cabecera, tamano):
+    """
+    (inicio, fin) inclusivos de un rango 'bytes=a-b', 'bytes=a-' o 'bytes=-n'.
+    None si la cabecera no es un rango simple (se responde el archivo completo);
+    lanza ValueError si el rango no se puede satisfacer.
+    """
+    coincidencia = _RANGO.match(cabecera.strip())
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        largo = int(fin)
+        if largo == 0:
+            raise ValueError('Rango vacío')
+        return max(tamano - largo, 0), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise ValueError('Rango fuera del archivo')
+    return inicio, fin
+
+
+def respuesta_descarga(request, ruta, clave, nombre):
+    """
+    Respuesta HTTP del certificado guardado: 304 si el cliente ya tiene esa versión (If-None-Match),
+    206 para un rango de bytes (Range, respetando If-Range) o el archivo completo.
+    """
+    etag = f'"{clave}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        tamano = default_storage.size(ruta)
+        rango = None
+        cabecera = request.headers.get('Range')
+        if cabecera and request.headers.get('If-Range', etag) == etag:
+            try:
+                rango = _rango(cabecera, tamano)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{tamano}'
+                return response
+
+        if rango is None:
+            response = FileResponse(default_storage.open(ruta, 'rb'), content_type='application/pdf', filename=nombre)
+        else:
+            inicio, fin = rango
+            with default_storage.open(ruta, 'rb') as archivo:
+                archivo.seek(inicio)
+                datos = archivo.read(fin - inicio + 1)
+            response = HttpResponse(datos, status=206, content_type='application/pdf')
+            response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+            response['Content-Disposition'] = content_disposition_header(False, nombre)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    # La URL es la misma para cada versión: el navegador revalida siempre con el ETag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
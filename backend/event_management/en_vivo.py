@@ -0,0 +1,168 @@
+"""
+Dashboard en vivo: canal Server-Sent Events por evento.
+
+Cada transacción que redime códigos publica, al confirmarse, un mensaje pequeño por evento:
+quién escaneó y qué tipo, sin consultar la base de datos dentro de la petición de escaneo. Los
+mensajes se guardan en el framework de caché de Django con un número de secuencia por evento, así
+cualquier proceso del servidor puede entregarlos: la conexión de cada dashboard revisa la caché
+cada EN_VIVO_INTERVALO segundos y, si llegaron escaneos, lee los contadores (ContadorEvento) una
+sola vez para ese intervalo.
+
+El número de secuencia es el 'id' del evento SSE: al reconectarse, el navegador envía
+Last-Event-ID y recibe lo que se perdió (mientras siga en la caché). En producción la caché
+debe ser compartida entre procesos (CACHE_BACKEND), igual que la precarga de escaneo.
+"""
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+# Prefijo de las claves en la caché
+PREFIJO = 'sigue:en_vivo:'
+
+# Si una conexión quedó más atrás que esto, recibe el estado completo en lugar de los mensajes
+MAX_PENDIENTES = 200
+
+# Segundos sin mensajes tras los que se envía un comentario para mantener viva la conexión
+INTERVALO_PING = 15
+
+
+class RenderizadorEventos(BaseRenderer):
+    """
+    Permite a DRF negociar 'Accept: text/event-stream'. El flujo se entrega como
+    StreamingHttpResponse; por aquí solo pasan las respuestas de error (en JSON).
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def _clave_ultimo(evento_id):
+    return f'{PREFIJO}{evento_id}:ultimo'
+
+
+def _clave_mensaje(evento_id, secuencia):
+    return f'{PREFIJO}{evento_id}:{secuencia}'
+
+
+def publicar(evento_id, tipo, datos):
+    """
+    Publica un mensaje para los dashboards del evento.
+
+    Returns:
+        int: número de secuencia del mensaje.
+    """
+    clave = _clave_ultimo(evento_id)
+    cache.add(clave, 0, None)
+    secuencia = cache.incr(clave)
+    cache.set(_clave_mensaje(evento_id, secuencia), {'tipo': tipo, 'datos': datos}, settings.EN_VIVO_RETENCION)
+    return secuencia
+
+
+def publicar_redenciones(escaneos_por_evento):
+    """
+    Publica los escaneos redimidos en una transacción (se llama al confirmarse). Solo se
+    publica lo escaneado: los contadores los lee cada conexión en 'flujo'. Un error aquí
+    nunca afecta al escaneo.
+
+    Args:
+        escaneos_por_evento (dict): {evento_id: [{'codigo', 'tipo', 'fecha_uso', 'asistente'}, ...]}
+    """
+    for evento_id, escaneos in escaneos_por_evento.items():
+        try:
+            publicar(evento_id, 'escaneo', {'escaneos': escaneos})
+        except Exception:
+            logger.exception(f'No se pudo publicar en vivo las redenciones del evento {evento_id}')
+
+
+def ultimo(evento_id):
+    """Número de secuencia del último mensaje publicado para el evento (0 si no hay)."""
+    return cache.get(_clave_ultimo(evento_id)) or 0
+
+
+def pendientes(evento_id, desde):
+    """
+    Mensajes publicados después de 'desde', en orden.
+
+    Returns:
+        tuple: (mensajes [(secuencia, mensaje)], nueva posición, completos)
+            completos es False si faltan mensajes (vencidos o demasiados): la conexión
+            debe reenviar el estado completo.
+    """
+    hasta = ultimo(evento_id)
+    if hasta <= desde:
+        return [], hasta, hasta == desde
+    if hasta - desde > MAX_PENDIENTES:
+        return [], hasta, False
+
+    encontrados = cache.get_many([_clave_mensaje(evento_id, secuencia) for secuencia in range(desde + 1, hasta + 1)])
+    mensajes = []
+    completos = True
+    for secuencia in range(desde + 1, hasta + 1):
+        mensaje = encontrados.get(_clave_mensaje(evento_id, secuencia))
+        if mensaje is not None:
+            mensajes.append((secuencia, mensaje))
+        elif secuencia == hasta and completos:
+            # El último puede estar numerado pero aún sin guardar: se espera a la siguiente revisión
+            return mensajes, secuencia - 1, True
+        else:
+            # Vencido en la caché
+            completos = False
+    return mensajes, hasta, completos
+
+
+def _sse(tipo, datos, secuencia=None):
+    lineas = [f'id: {secuencia}'] if secuencia is not None else []
+    lineas += [f'event: {tipo}', f'data: {json.dumps(datos, cls=DjangoJSONEncoder)}']
+    return '\n'.join(lineas) + '\n\n'
+
+
+def flujo(evento, ultimo_id=None):
+    """
+    Generador del flujo SSE de un evento: primero las estadísticas completas ('estadisticas'),
+    luego un mensaje 'escaneo' por cada transacción de redenciones y, tras los escaneos de cada
+    revisión, los contadores del evento ('contadores', una consulta por EN_VIVO_INTERVALO como
+    máximo). Termina tras EN_VIVO_DURACION segundos para liberar el proceso; el navegador se
+    reconecta solo.
+
+    Args:
+        ultimo_id (int, opcional): Last-Event-ID de una reconexión; si los mensajes siguientes
+            siguen en la caché se entregan en lugar del estado completo.
+    """
+    from . import estadisticas
+
+    def estado_completo(secuencia):
+        return _sse('estadisticas', estadisticas.calcular(evento), secuencia)
+
+    yield 'retry: 3000\n\n'
+    posicion = ultimo(evento.pk)
+    if ultimo_id is None or ultimo_id > posicion:
+        yield estado_completo(posicion)
+    else:
+        posicion = ultimo_id
+
+    fin = time.monotonic() + settings.EN_VIVO_DURACION
+    ultimo_envio = time.monotonic()
+    while time.monotonic() < fin:
+        mensajes, posicion, completos = pendientes(evento.pk, posicion)
+        for secuencia, mensaje in mensajes:
+            yield _sse(mensaje['tipo'], mensaje['datos'], secuencia)
+        if not completos:
+            yield estado_completo(posicion)
+        elif mensajes:
+            yield _sse('contadores', estadisticas.contadores(evento.pk))
+        if mensajes or not completos:
+            ultimo_envio = time.monotonic()
+        elif time.monotonic() - ultimo_envio >= INTERVALO_PING:
+            yield ': ping\n\n'
+            ultimo_envio = time.monotonic()
+        time.sleep(settings.EN_VIVO_INTERVALO)
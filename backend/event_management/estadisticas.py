@@ -0,0 +1,198 @@
+"""
+Estadísticas de asistencia de un evento (endpoint 'estadisticas' del dashboard).
+
+Se leen de ContadorEvento, que se mantiene al crear inscripciones y al generar y redimir
+códigos: unas pocas filas por evento (tipo × dependencia), sin importar cuántas personas
+hayan asistido. Las funciones de reconstrucción recalculan esos contadores desde los códigos
+con agregaciones en la base de datos (GROUP BY sobre la dependencia guardada en cada código).
+
+El flujo de escaneos (escaneos por minuto por tipo y estación) se agrupa en la base de datos
+por minuto y se guarda unos segundos en la caché.
+"""
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.db.models.functions import TruncMinute
+
+from .models import CodigoQR, ContadorEvento, Evento, Inscripcion
+
+# Intervalos (minutos) admitidos para el flujo de escaneos
+INTERVALOS_FLUJO = (1, 5, 15)
+
+
+def contadores(evento_id):
+    """
+    Totales y desglose por dependencia del evento leídos de ContadorEvento
+    (lo mismo que 'calcular' sin los datos propios del evento).
+    """
+    total_inscritos = 0
+    asistentes_reales = 0
+    refrigerios_entregados = 0
+    por_dependencia = {}
+
+    for tipo, dependencia, emitidos, redimidos in ContadorEvento.objects.filter(evento_id=evento_id).values_list(
+        'tipo', 'dependencia', 'emitidos', 'redimidos'
+    ):
+        if tipo == ContadorEvento.INSCRIPCION:
+            total_inscritos += emitidos
+        elif tipo == 'ENTRADA':
+            asistentes_reales += redimidos
+            if redimidos:
+                por_dependencia[dependencia] = redimidos
+        elif tipo == 'REFRIGERIO':
+            refrigerios_entregados += redimidos
+
+    return {
+        'total_inscritos': total_inscritos,
+        'asistentes_reales': asistentes_reales,
+        'porcentaje_asistencia': (asistentes_reales / total_inscritos * 100) if total_inscritos > 0 else 0,
+        'refrigerios_entregados': refrigerios_entregados,
+        'asistencia_por_dependencia': por_dependencia,
+    }
+
+
+def calcular(evento):
+    """
+    Estadísticas del evento:
+    - Total inscritos
+    - Asistencia real (basada en QRs de entrada usados)
+    - Refrigerios entregados
+    - Desglose por dependencia
+    """
+    resultado = contadores(evento.pk)
+    por_dependencia = resultado.pop('asistencia_por_dependencia')
+    resultado['total_refrigerios_disponibles'] = evento.cantidad_refrigerios
+    resultado['asistencia_por_dependencia'] = por_dependencia
+    return resultado
+
+
+def contar(evento):
+    """
+    Contadores del evento calculados desde los códigos e inscripciones. La base agrupa por
+    tipo y por la dependencia guardada en cada código al emitirlo (dependencia_contador).
+
+    Returns:
+        dict: {(tipo, dependencia): [emitidos, redimidos]} en el orden de aparición.
+    """
+    contadores = defaultdict(lambda: [0, 0])
+    inscritos = Inscripcion.objects.filter(evento=evento).count()
+    if inscritos:
+        contadores[(ContadorEvento.INSCRIPCION, '')][0] = inscritos
+
+    grupos = (
+        CodigoQR.objects.filter(evento=evento)
+        .values('tipo_comida', 'dependencia_contador')
+        .annotate(emitidos=Count('pk'), redimidos=Count('pk', filter=Q(usado=True)), primero=Min('fecha_creacion'))
+        .order_by('primero', 'tipo_comida', 'dependencia_contador')
+    )
+    for grupo in grupos:
+        contador = contadores[(grupo['tipo_comida'], grupo['dependencia_contador'])]
+        contador[0] += grupo['emitidos']
+        contador[1] += grupo['redimidos']
+    return dict(contadores)
+
+
+def diferencias(evento):
+    """
+    Contadores guardados que no coinciden con los códigos del evento.
+
+    Returns:
+        dict: {(tipo, dependencia): ((emitidos, redimidos) guardados, (emitidos, redimidos) reales)}
+    """
+    guardados = {
+        (tipo, dependencia): (emitidos, redimidos)
+        for tipo, dependencia, emitidos, redimidos in ContadorEvento.objects.filter(evento=evento).values_list(
+            'tipo', 'dependencia', 'emitidos', 'redimidos'
+        )
+    }
+    reales = {clave: tuple(valores) for clave, valores in contar(evento).items()}
+    resultado = {}
+    for clave in list(guardados) + [clave for clave in reales if clave not in guardados]:
+        guardado, real = guardados.get(clave, (0, 0)), reales.get(clave, (0, 0))
+        if guardado != real:
+            resultado[clave] = (guardado, real)
+    return resultado
+
+
+def reconstruir(evento):
+    """
+    Recalcula los contadores del evento desde los códigos e inscripciones.
+
+    Primero bloquea el evento (como 'generar_qrs_masivo') y las filas de contadores del evento:
+    una redención concurrente que ya actualizó su código queda esperando ese bloqueo y suma su
+    +1 sobre el valor reconstruido, en lugar de perderse.
+
+    Returns:
+        int: contadores que cambiaron.
+    """
+    with transaction.atomic():
+        list(Evento.objects.select_for_update().filter(pk=evento.pk).values_list('pk'))
+        existentes = {
+            (fila.tipo, fila.dependencia): fila
+            for fila in ContadorEvento.objects.select_for_update().filter(evento=evento)
+        }
+        cambios = 0
+        reales = contar(evento)
+        for clave, (emitidos, redimidos) in reales.items():
+            fila = existentes.get(clave)
+            if fila is None:
+                ContadorEvento.objects.create(
+                    evento=evento, tipo=clave[0], dependencia=clave[1], emitidos=emitidos, redimidos=redimidos
+                )
+                cambios += 1
+            elif (fila.emitidos, fila.redimidos) != (emitidos, redimidos):
+                ContadorEvento.objects.filter(pk=fila.pk).update(emitidos=emitidos, redimidos=redimidos)
+                cambios += 1
+
+        sobrantes = [fila.pk for clave, fila in existentes.items() if clave not in reales]
+        cambios += ContadorEvento.objects.filter(pk__in=sobrantes).delete()[0]
+    return cambios
+
+
+def flujo_escaneos(evento, intervalo=1, desde=None, hasta=None):
+    """
+    Escaneos redimidos del evento por intervalo de 'intervalo' minutos, tipo y estación,
+    opcionalmente entre 'desde' y 'hasta' (fecha_uso). La base de datos trunca fecha_uso al
+    minuto y agrupa (índice qr_evento_fecha_uso_idx); aquí solo se suman los minutos de cada
+    intervalo, así el trabajo en Python depende de la duración del evento y no de los escaneos.
+    El resultado se guarda FLUJO_ESCANEOS_CACHE segundos.
+
+    Returns:
+        list: [{'inicio', 'tipo', 'estacion', 'total'}, ...] ordenado por inicio, tipo y estación.
+    """
+    if intervalo not in INTERVALOS_FLUJO:
+        raise ValueError(f'El intervalo debe ser uno de {", ".join(map(str, INTERVALOS_FLUJO))} minutos')
+
+    clave = f'flujo_escaneos:{evento.pk}:{intervalo}:{desde.isoformat() if desde else ""}:{hasta.isoformat() if hasta else ""}'
+    resultado = cache.get(clave)
+    if resultado is not None:
+        return resultado
+
+    qrs = CodigoQR.objects.filter(evento=evento, fecha_uso__isnull=False)
+    if desde:
+        qrs = qrs.filter(fecha_uso__gte=desde)
+    if hasta:
+        qrs = qrs.filter(fecha_uso__lt=hasta)
+    # En UTC: truncar al minuto no depende de la zona horaria y MySQL no necesita CONVERT_TZ
+    por_minuto = (
+        qrs.annotate(minuto=TruncMinute('fecha_uso', tzinfo=dt_timezone.utc))
+        .values('minuto', 'tipo_comida', 'estacion')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+
+    totales = defaultdict(int)
+    for fila in por_minuto:
+        inicio = fila['minuto'] - timedelta(minutes=fila['minuto'].minute % intervalo)
+        totales[(inicio, fila['tipo_comida'], fila['estacion'])] += fila['total']
+
+    resultado = [
+        {'inicio': inicio, 'tipo': tipo, 'estacion': estacion, 'total': total}
+        for (inicio, tipo, estacion), total in sorted(totales.items())
+    ]
+    cache.set(clave, resultado, settings.FLUJO_ESCANEOS_CACHE)
+    return resultado
@@ -0,0 +1,373 @@
+"""
+Procesamiento en segundo plano de los trabajos de envío masivo (TrabajoEnvio).
+
+La API solo encola el trabajo y responde de inmediato; el comando 'procesar_envios'
+reclama los trabajos pendientes y los procesa guardando el avance cada pocos correos.
+Si el proceso trabajador se detiene, el trabajo queda con su latido vencido y otro
+trabajador (o el mismo al reiniciar) lo retoma desde la última inscripción procesada.
+
+Tipos de trabajo:
+- QR: códigos QR a todos los inscritos con correo.
+- CERTIFICADO: certificado PDF a los inscritos que asistieron; los PDF se generan en un
+  pool de procesos y pasan al motor de envío a medida que salen.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import certificados, outbox, utils
+from .email_utils import PlantillaCorreoQR
+from .mail_dispatch import MotorEnvio
+from .models import CodigoQR, Evento, TrabajoEnvio
+from .qr_signing import contenido_qr
+
+logger = logging.getLogger(__name__)
+
+# Si un trabajo EN_PROCESO no actualiza su latido en este tiempo, se considera abandonado
+LATIDO_VENCIDO = timedelta(minutes=2)
+
+# Inscripciones procesadas entre cada guardado del avance
+TAMANO_LOTE = 20
+
+# Máximo de errores detallados que se conservan por trabajo
+MAX_ERRORES = 500
+
+# Certificados por tarea del pool de procesos (menos comunicación entre procesos) y
+# tareas en vuelo por proceso (los siguientes PDF se generan mientras se envían los anteriores)
+TAMANO_LOTE_PDF = 16
+LOTES_POR_PROCESO = 2
+
+
+class AsistenteAdapter:
+    """
+    Adaptador para que la función de envío de email funcione con el modelo User
+    (originalmente estaba hecha solo para Asistente legacy).
+    """
+    def __init__(self, u):
+        self.nombre_completo = u.full_name
+        self.correo = u.email
+        self.identificacion = u.id
+
+
+def identificador_trabajador():
+    """Identifica al proceso trabajador (host:pid) en los trabajos que reclama."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _inscripciones_con_correo(evento):
+    return (
+        evento.inscripciones.select_related('usuario')
+        .exclude(usuario__email__isnull=True)
+        .exclude(usuario__email='')
+        .order_by('pk')
+    )
+
+
+def _inscripciones_del_trabajo(evento, tipo, solo_fallidos):
+    """
+    Inscripciones a procesar: todas las que tienen correo (los certificados, solo las de
+    quienes asistieron) o únicamente las de envíos fallidos.
+    """
+    inscripciones = _inscripciones_con_correo(evento)
+    if tipo == 'CERTIFICADO':
+        inscripciones = inscripciones.filter(asistio=True)
+    if solo_fallidos:
+        inscripciones = inscripciones.filter(
+            usuario__email__in=outbox.fallidos(evento, tipo).values('destinatario')
+        )
+    return inscripciones
+
+
+def encolar_envio(evento, usuario, tipo='QR', solo_fallidos=False):
+    """
+    Crea un trabajo de envío para el evento. Si ya hay uno activo del mismo tipo lo devuelve
+    en lugar de crear otro, para no enviar dos veces a las mismas personas.
+    Con solo_fallidos=True el trabajo reenvía únicamente los correos que fallaron.
+    La fila del evento se bloquea antes de buscar el trabajo activo (como en
+    'generar_qrs_masivo'): dos peticiones simultáneas no crean dos trabajos.
+
+    Returns:
+        tuple: (TrabajoEnvio, creado)
+    """
+    with transaction.atomic():
+        list(Evento.objects.select_for_update().filter(pk=evento.pk).values_list('pk'))
+        activo = TrabajoEnvio.objects.filter(
+            evento=evento, tipo=tipo, estado__in=['PENDIENTE', 'EN_PROCESO']
+        ).first()
+        if activo:
+            return activo, False
+
+        trabajo = TrabajoEnvio.objects.create(
+            evento=evento,
+            tipo=tipo,
+            creado_por=usuario,
+            solo_fallidos=solo_fallidos,
+            total=_inscripciones_del_trabajo(evento, tipo, solo_fallidos).count()
+        )
+    return trabajo, True
+
+
+def reclamar_trabajo(trabajador):
+    """
+    Reclama el trabajo pendiente más antiguo (o uno abandonado) con un UPDATE condicional,
+    de modo que dos trabajadores nunca procesen el mismo trabajo.
+
+    Returns:
+        TrabajoEnvio o None si no hay trabajos por procesar.
+    """
+    ahora = timezone.now()
+    candidatos = TrabajoEnvio.objects.filter(
+        Q(estado='PENDIENTE') | Q(estado='EN_PROCESO', fecha_latido__lt=ahora - LATIDO_VENCIDO)
+    ).order_by('fecha_creacion').values_list('pk', 'estado', 'fecha_latido')[:10]
+
+    for pk, estado, latido in candidatos:
+        reclamado = TrabajoEnvio.objects.filter(pk=pk, estado=estado, fecha_latido=latido).update(
+            estado='EN_PROCESO',
+            trabajador=trabajador,
+            fecha_latido=ahora
+        )
+        if reclamado:
+            TrabajoEnvio.objects.filter(pk=pk, fecha_inicio__isnull=True).update(fecha_inicio=ahora)
+            return TrabajoEnvio.objects.select_related('evento').get(pk=pk)
+    return None
+
+
+def _guardar_avance(trabajo, **extra):
+    """
+    Persiste contadores y cursor. Devuelve False si otro trabajador tomó el trabajo
+    (por ejemplo, porque este se quedó sin latido), en cuyo caso hay que detenerse.
+    """
+    trabajo.fecha_latido = timezone.now()
+    campos = {
+        'procesados': trabajo.procesados,
+        'enviados': trabajo.enviados,
+        'fallidos': trabajo.fallidos,
+        'omitidos': trabajo.omitidos,
+        'ultimo_procesado': trabajo.ultimo_procesado,
+        'errores': trabajo.errores,
+        'fecha_latido': trabajo.fecha_latido,
+    }
+    campos.update(extra)
+    return bool(TrabajoEnvio.objects.filter(pk=trabajo.pk, trabajador=trabajo.trabajador).update(**campos))
+
+
+def _codigos_por_usuario(evento):
+    """Todos los QRs del evento en una sola consulta, agrupados por usuario."""
+    codigos = defaultdict(list)
+    qrs = (
+        CodigoQR.objects.filter(evento=evento, usuario__isnull=False)
+        .only('codigo', 'tipo_comida', 'evento_id', 'usuario_id')
+        .order_by('usuario_id', 'pk')
+    )
+    for qr in qrs.iterator(chunk_size=2000):
+        codigos[qr.usuario_id].append(qr)
+    return codigos
+
+
+def _tareas_qr(trabajo, pendientes):
+    """
+    Prepara (en el hilo del trabajo, con acceso a la BD) el correo de cada inscripción.
+    Genera (mensaje, contexto); el mensaje es None si no hay nada que enviar.
+    """
+    evento = trabajo.evento
+    plantilla = PlantillaCorreoQR(evento)
+    codigos = _codigos_por_usuario(evento)
+
+    for inscripcion in pendientes.iterator(chunk_size=200):
+        user = inscripcion.usuario
+        contexto = {'inscripcion': inscripcion, 'correo': None, 'error': None}
+
+        qrs = codigos.get(user.pk)
+        if not qrs:
+            yield None, contexto
+            continue
+
+        contexto['correo'] = outbox.registrar(
+            evento, user.email, trabajo.tipo, outbox.hash_contenido(contenido_qr(qr) for qr in qrs), trabajo
+        )
+        if contexto['correo'].estado == 'ENVIADO':
+            yield None, contexto
+            continue
+
+        try:
+            yield plantilla.construir(AsistenteAdapter(user), qrs), contexto
+        except Exception as e:
+            logger.exception(f"Error construyendo el email para {user.email}: {e}")
+            contexto['error'] = f"Error al construir email: {str(e)}"
+            yield None, contexto
+
+
+def _mensaje_certificado(evento, user, pdf):
+    email = EmailMessage(
+        f"Certificado de Asistencia - {evento.titulo}",
+        f"Hola {user.full_name},\n\nAdjunto encontrarás tu certificado de asistencia al evento "
+        f"'{evento.titulo}'.\n\n¡Gracias por participar!",
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+    )
+    email.attach(certificados.nombre_archivo(user), pdf, 'application/pdf')
+    return email
+
+
+def _requiere_pdf(contexto):
+    return contexto['correo'] is not None and contexto['correo'].estado != 'ENVIADO'
+
+
+def _requiere_generar(contexto):
+    return _requiere_pdf(contexto) and contexto['guardado'] is None
+
+
+def _tareas_certificados(trabajo, pendientes):
+    """
+    Genera (mensaje, contexto) con el certificado de cada asistente.
+
+    Los PDF se generan por lotes en un pool de procesos (uno por núcleo, o
+    CERTIFICADOS_PROCESOS) mientras el MotorEnvio envía los ya generados. Los lotes se
+    entregan en el orden de las inscripciones, así el cursor del trabajo sigue sirviendo
+    para reanudar. Los certificados ya enviados con la misma versión de la plantilla se omiten
+    y los que ya están en el storage (ver certificados.py) se adjuntan sin volver a generarlos.
+    """
+    evento = trabajo.evento
+    ruta = evento.plantilla_certificado.path
+    version = certificados.version_plantilla(ruta)
+    diseno = certificados.diseno_evento(evento)
+    huella = utils.huella_diseno(diseno)
+
+    procesos = settings.CERTIFICADOS_PROCESOS or os.cpu_count() or 1
+    pool = None
+    if procesos > 1 and trabajo.restantes > TAMANO_LOTE_PDF:
+        # 'spawn': el trabajador ya tiene hilos (motor de envío, correos transaccionales)
+        # y hacer fork de un proceso con hilos no es seguro
+        pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'))
+    limite = procesos * LOTES_POR_PROCESO
+    en_vuelo = deque()
+
+    def lanzar(lote):
+        asistentes = [
+            (c['inscripcion'].usuario.full_name, c['inscripcion'].usuario.id) for c in lote if _requiere_generar(c)
+        ]
+        if pool is not None and asistentes:
+            futuro = pool.submit(utils.generar_certificados_lote, ruta, asistentes, diseno)
+        else:
+            # Trabajos pequeños: arrancar el pool cuesta más que generar los PDF aquí
+            futuro = Future()
+            futuro.set_result(utils.generar_certificados_lote(ruta, asistentes, diseno))
+        en_vuelo.append((lote, futuro))
+
+    def entregar():
+        lote, futuro = en_vuelo.popleft()
+        pdfs = iter(futuro.result())
+        for contexto in lote:
+            if not _requiere_pdf(contexto):
+                yield None, contexto
+                continue
+            user = contexto['inscripcion'].usuario
+            if contexto['guardado'] is not None:
+                with default_storage.open(contexto['guardado'], 'rb') as archivo:
+                    pdf = archivo.read()
+            else:
+                pdf = next(pdfs)
+                if isinstance(pdf, bytes):
+                    certificados.guardar(evento, user, contexto['clave'], pdf)
+            if isinstance(pdf, bytes):
+                yield _mensaje_certificado(evento, user, pdf), contexto
+            else:
+                contexto['error'] = pdf
+                yield None, contexto
+
+    try:
+        lote = []
+        for inscripcion in pendientes.iterator(chunk_size=200):
+            user = inscripcion.usuario
+            clave = certificados.clave_certificado(evento, user, version, huella)
+            contexto = {'inscripcion': inscripcion, 'correo': None, 'error': None, 'clave': clave, 'guardado': None}
+            contexto['correo'] = outbox.registrar(evento, user.email, trabajo.tipo, clave, trabajo)
+            if _requiere_pdf(contexto):
+                contexto['guardado'] = certificados.guardado(evento, user, clave)
+            lote.append(contexto)
+            if len(lote) < TAMANO_LOTE_PDF:
+                continue
+
+            lanzar(lote)
+            lote = []
+            while en_vuelo and (len(en_vuelo) > limite or en_vuelo[0][1].done()):
+                yield from entregar()
+
+        if lote:
+            lanzar(lote)
+        while en_vuelo:
+            yield from entregar()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+# Preparación de los correos según el tipo de trabajo
+TAREAS = {
+    'QR': _tareas_qr,
+    'CERTIFICADO': _tareas_certificados,
+}
+
+
+def procesar_trabajo(trabajo):
+    """
+    Envía los correos del trabajo desde donde quedó, guardando el avance por lotes.
+    Cada correo pasa por la bandeja de salida: si ese contenido ya se envió al destinatario, se omite.
+    Los envíos se reparten entre los hilos del MotorEnvio; los resultados llegan en orden, así
+    el cursor de avance nunca salta una inscripción sin resultado.
+    """
+    pendientes = _inscripciones_del_trabajo(trabajo.evento, trabajo.tipo, trabajo.solo_fallidos).filter(
+        pk__gt=trabajo.ultimo_procesado
+    )
+
+    try:
+        with MotorEnvio() as motor:
+            resultados = motor.mapear(TAREAS[trabajo.tipo](trabajo, pendientes))
+            for indice, (contexto, result) in enumerate(resultados, start=1):
+                inscripcion, correo = contexto['inscripcion'], contexto['correo']
+
+                if correo is not None:
+                    if contexto['error'] is not None:
+                        result = contexto['error']
+                    if result is None:
+                        trabajo.omitidos += 1
+                    else:
+                        outbox.registrar_resultado(correo, result, trabajo)
+                        if result is True:
+                            trabajo.enviados += 1
+                        else:
+                            trabajo.fallidos += 1
+                            if len(trabajo.errores) < MAX_ERRORES:
+                                trabajo.errores.append(f"{correo.destinatario}: {correo.error}")
+
+                trabajo.procesados += 1
+                trabajo.ultimo_procesado = inscripcion.pk
+
+                if indice % TAMANO_LOTE == 0 and not _guardar_avance(trabajo):
+                    logger.warning(f"El trabajo {trabajo.pk} fue retomado por otro proceso; se detiene {trabajo.trabajador}")
+                    # Los envíos encolados no se registrarían en la bandeja: los enviaría también el nuevo dueño
+                    motor.cancelar()
+                    resultados.close()
+                    return
+
+        trabajo.estado = 'COMPLETADO'
+        trabajo.fecha_fin = timezone.now()
+        _guardar_avance(trabajo, estado=trabajo.estado, fecha_fin=trabajo.fecha_fin)
+
+    except Exception as e:
+        logger.exception(f"Error procesando el trabajo de envío {trabajo.pk}: {e}")
+        trabajo.estado = 'FALLIDO'
+        trabajo.fecha_fin = timezone.now()
+        trabajo.errores.append(f"Error general: {str(e)}")
+        _guardar_avance(trabajo, estado=trabajo.estado, fecha_fin=trabajo.fecha_fin)
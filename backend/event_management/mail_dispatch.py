@@ -0,0 +1,297 @@
+"""
+Despacho de correos reutilizando la conexión SMTP.
+
+email.send() abre una conexión nueva por mensaje (TCP + STARTTLS + login) y la cierra al
+terminar; en un envío masivo ese saludo cuesta más que el propio mensaje. El despachador
+mantiene una conexión abierta y envía por ella con send_messages(), la renueva cada
+EMAIL_MAX_POR_CONEXION mensajes (los proveedores como Gmail cortan la sesión pasado un
+límite) y se reconecta una vez si el servidor la cerró a mitad del envío.
+
+Uso:
+    with DespachadorCorreos() as despachador:
+        for mensaje in mensajes:
+            despachador.intentar(mensaje)   # propaga el error si el envío falla
+
+El envío SMTP depende de la latencia de red, no de la CPU: MotorEnvio reparte los mensajes
+entre varios hilos, cada uno con su propio DespachadorCorreos. Todos comparten un
+LimitadorTasa (token bucket) ajustado al límite del proveedor, que además baja la tasa y
+pausa los envíos cuando el servidor responde 4xx ("intente más tarde").
+"""
+import logging
+import random
+import smtplib
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Errores que indican que la conexión ya no sirve (se reintenta con una nueva)
+ERRORES_CONEXION = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+
+
+class DespachadorCorreos:
+    """
+    Envía mensajes por una conexión de larga duración del backend de correo configurado.
+
+    Args:
+        max_por_conexion (int, opcional): Mensajes antes de renovar la conexión
+            (por defecto settings.EMAIL_MAX_POR_CONEXION).
+        **opciones_conexion: Se pasan a get_connection() (backend, host, port, ...).
+    """
+
+    def __init__(self, max_por_conexion=None, **opciones_conexion):
+        self.max_por_conexion = max_por_conexion or getattr(settings, 'EMAIL_MAX_POR_CONEXION', 100)
+        self.opciones_conexion = opciones_conexion
+        self.conexion = None
+        self.enviados_en_conexion = 0
+        self.conexiones_abiertas = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def _abrir(self):
+        self.conexion = get_connection(fail_silently=False, **self.opciones_conexion)
+        self.conexion.open()
+        self.enviados_en_conexion = 0
+        self.conexiones_abiertas += 1
+
+    def cerrar(self):
+        """Cierra la conexión actual (si la hay) sin propagar errores del QUIT."""
+        if self.conexion is not None:
+            try:
+                self.conexion.close()
+            except Exception:
+                pass
+            self.conexion = None
+
+    def _enviar_por_conexion(self, mensaje):
+        if self.conexion is None or self.enviados_en_conexion >= self.max_por_conexion:
+            self.cerrar()
+            self._abrir()
+        mensaje.connection = self.conexion
+        enviados = self.conexion.send_messages([mensaje])
+        self.enviados_en_conexion += 1
+        if not enviados:
+            raise ValueError('El mensaje no tiene destinatarios')
+
+    def intentar(self, mensaje):
+        """Envía el mensaje (reconectando una vez si la conexión se perdió); propaga los errores."""
+        try:
+            self._enviar_por_conexion(mensaje)
+        except ERRORES_CONEXION as e:
+            logger.warning(f"Conexión SMTP perdida ({e}); reconectando")
+            self.cerrar()
+            self._enviar_por_conexion(mensaje)
+
+
+def codigo_smtp(error):
+    """Código de respuesta SMTP asociado a una excepción (o None si no es una respuesta del servidor)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codigos = [codigo for codigo, _ in error.recipients.values()]
+        return max(codigos) if codigos else None
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code
+    return None
+
+
+def es_error_temporal(error):
+    """Respuestas 4xx: el servidor pide reintentar más tarde (límite de tasa, sobrecarga, greylisting)."""
+    codigo = codigo_smtp(error)
+    return codigo is not None and 400 <= codigo < 500
+
+
+class LimitadorTasa:
+    """
+    Token bucket compartido entre hilos con ajuste adaptativo.
+
+    Entrega hasta 'por_segundo' permisos por segundo (con ráfagas de hasta 'rafaga'). Ante un
+    4xx, reducir() divide la tasa a la mitad y pausa a todos los hilos; cada envío exitoso la
+    recupera de a poco hasta el máximo configurado. Con por_segundo vacío o 0 no limita la tasa,
+    pero sigue respetando las pausas.
+    """
+
+    def __init__(self, por_segundo=None, rafaga=None):
+        self.maximo = float(por_segundo) if por_segundo else None
+        self.tasa = self.maximo
+        self.minimo = self.maximo / 16 if self.maximo else None
+        self.capacidad = float(rafaga or max(1.0, self.maximo or 1.0))
+        self.tokens = self.capacidad
+        self.actualizado = time.monotonic()
+        self.pausa_hasta = 0.0
+        self.candado = threading.Lock()
+
+    def tomar(self):
+        """Bloquea hasta obtener permiso para enviar un mensaje."""
+        while True:
+            with self.candado:
+                ahora = time.monotonic()
+                if self.tasa:
+                    self.tokens = min(self.capacidad, self.tokens + (ahora - self.actualizado) * self.tasa)
+                self.actualizado = ahora
+
+                espera = self.pausa_hasta - ahora
+                if espera <= 0:
+                    if not self.tasa:
+                        return
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    espera = (1 - self.tokens) / self.tasa
+            time.sleep(espera)
+
+    def reducir(self, pausa):
+        """El servidor pidió bajar el ritmo: tasa a la mitad y pausa global de 'pausa' segundos."""
+        with self.candado:
+            if self.tasa:
+                self.tasa = max(self.minimo, self.tasa / 2)
+                self.tokens = min(self.tokens, 1.0)
+            self.pausa_hasta = max(self.pausa_hasta, time.monotonic() + pausa)
+
+    def recuperar(self):
+        """Envío exitoso: sube la tasa un 5% del máximo (aumento aditivo)."""
+        if not self.maximo:
+            return
+        with self.candado:
+            self.tasa = min(self.maximo, self.tasa + self.maximo / 20)
+
+
+_limitador_global = None
+_candado_global = threading.Lock()
+
+
+def limitador_global():
+    """Limitador del proceso: todos los envíos comparten el límite de la cuenta SMTP."""
+    global _limitador_global
+    with _candado_global:
+        if _limitador_global is None:
+            _limitador_global = LimitadorTasa(getattr(settings, 'EMAIL_ENVIOS_POR_SEGUNDO', 0))
+        return _limitador_global
+
+
+class MotorEnvio:
+    """
+    Envío concurrente con un número acotado de hilos, cada uno con su conexión reutilizable.
+
+    Args:
+        hilos (int, opcional): Hilos de envío (por defecto settings.EMAIL_HILOS_ENVIO).
+        limitador (LimitadorTasa, opcional): Por defecto el limitador global del proceso.
+        max_reintentos (int, opcional): Reintentos ante respuestas 4xx (settings.EMAIL_MAX_REINTENTOS).
+        espera_base (float): Segundos de la primera espera ante un 4xx (se duplica en cada reintento).
+        **opciones_conexion: Se pasan a cada DespachadorCorreos (max_por_conexion, backend, host, ...).
+
+    Uso:
+        with MotorEnvio() as motor:
+            for contexto, resultado in motor.mapear((mensaje, contexto) for ...):
+                ...   # resultado: True, texto del error, o None si la tarea no traía mensaje
+    """
+
+    def __init__(self, hilos=None, limitador=None, max_reintentos=None, espera_base=1.0, **opciones_conexion):
+        self.hilos = hilos or getattr(settings, 'EMAIL_HILOS_ENVIO', 4)
+        self.limitador = limitador or limitador_global()
+        self.max_reintentos = max_reintentos if max_reintentos is not None else getattr(settings, 'EMAIL_MAX_REINTENTOS', 3)
+        self.espera_base = espera_base
+        self.opciones_conexion = opciones_conexion
+        self._local = threading.local()
+        self._despachadores = []
+        self._candado = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='envio-correo')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        """Espera los envíos en curso y cierra las conexiones de todos los hilos."""
+        self._pool.shutdown(wait=True)
+        with self._candado:
+            for despachador in self._despachadores:
+                despachador.cerrar()
+            self._despachadores = []
+
+    def cancelar(self):
+        """
+        Descarta los envíos encolados que aún no empezaron (los que están en curso terminan) y
+        cierra las conexiones. Para detenerse sin entregar correos cuyo resultado no se registrará.
+        """
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self.cerrar()
+
+    def _despachador(self):
+        despachador = getattr(self._local, 'despachador', None)
+        if despachador is None:
+            despachador = DespachadorCorreos(**self.opciones_conexion)
+            self._local.despachador = despachador
+            with self._candado:
+                self._despachadores.append(despachador)
+        return despachador
+
+    def _enviar(self, mensaje):
+        despachador = self._despachador()
+        for intento in range(self.max_reintentos + 1):
+            self.limitador.tomar()
+            try:
+                despachador.intentar(mensaje)
+                self.limitador.recuperar()
+                return True
+            except Exception as e:
+                if es_error_temporal(e) and intento < self.max_reintentos:
+                    # Espera exponencial con algo de azar para que los hilos no reintenten a la vez
+                    espera = self.espera_base * (2 ** intento) * random.uniform(1, 1.5)
+                    logger.warning(f"Respuesta temporal del servidor ({e}); reintento en {espera:.1f} s")
+                    if codigo_smtp(e) == 421:
+                        despachador.cerrar()
+                    self.limitador.reducir(espera)
+                    continue
+                destinatarios = ', '.join(mensaje.to)
+                logger.exception(f"Error al enviar email a {destinatarios}: {e}")
+                if isinstance(e, ERRORES_CONEXION):
+                    despachador.cerrar()
+                return f"Error al enviar email: {str(e)}"
+
+    def enviar(self, mensaje):
+        """Encola un mensaje; devuelve un Future cuyo resultado es True o el texto del error."""
+        return self._pool.submit(self._enviar, mensaje)
+
+    def mapear(self, tareas):
+        """
+        Envía las tareas (mensaje, contexto) y devuelve (contexto, resultado) en el mismo orden.
+        Las tareas se consumen en el hilo que llama (pueden consultar la BD) y a lo sumo
+        4 por hilo esperan en vuelo. Una tarea sin mensaje (None) pasa con resultado None.
+        """
+        en_vuelo = deque()
+        limite = self.hilos * 4
+        for mensaje, contexto in tareas:
+            en_vuelo.append((contexto, self.enviar(mensaje) if mensaje is not None else None))
+            while en_vuelo and (len(en_vuelo) > limite or en_vuelo[0][1] is None or en_vuelo[0][1].done()):
+                contexto_listo, futuro = en_vuelo.popleft()
+                yield contexto_listo, futuro.result() if futuro is not None else None
+        while en_vuelo:
+            contexto_listo, futuro = en_vuelo.popleft()
+            yield contexto_listo, futuro.result() if futuro is not None else None
+
+
+_motor_compartido = None
+
+
+def motor_compartido():
+    """
+    Motor del proceso para correos sueltos (p.ej. verificación de registro): comparte el
+    limitador y mantiene conexiones abiertas entre peticiones.
+    """
+    global _motor_compartido
+    limitador = limitador_global()
+    with _candado_global:
+        if _motor_compartido is None:
+            _motor_compartido = MotorEnvio(limitador=limitador)
+        return _motor_compartido
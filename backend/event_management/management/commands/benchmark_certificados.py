@@ -0,0 +1,67 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.pdfgen import canvas
+
+from event_management import utils
+
+
+class Command(BaseCommand):
+    """
+    Mide certificados por segundo con la plantilla precompilada (caché por proceso) frente a
+    la fusión clásica con PyPDF2, que vuelve a leer la plantilla en cada certificado.
+    Si no se indica --plantilla, genera una plantilla de ejemplo temporal.
+
+    Uso: python manage.py benchmark_certificados --asistentes 1000 [--plantilla ruta.pdf]
+    """
+    help = 'Mide certificados/segundo con y sin caché de la plantilla'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--asistentes', type=int, default=1000, help='Certificados a generar por escenario')
+        parser.add_argument('--plantilla', help='Ruta de una plantilla PDF real')
+
+    def _plantilla_ejemplo(self, ruta):
+        c = canvas.Canvas(ruta, pagesize=landscape(letter))
+        ancho, alto = landscape(letter)
+        c.setStrokeColorRGB(0.72, 0.11, 0.11)
+        c.setLineWidth(10)
+        c.rect(24, 24, ancho - 48, alto - 48)
+        c.setFont('Times-Bold', 40)
+        c.drawCentredString(ancho / 2, alto - 130, 'CERTIFICADO DE ASISTENCIA')
+        c.setFont('Times-Roman', 16)
+        c.drawCentredString(ancho / 2, 200, 'Por su participación en el evento')
+        c.save()
+
+    def _medir(self, generar, cantidad, ruta):
+        inicio = time.perf_counter()
+        total_bytes = 0
+        for i in range(cantidad):
+            total_bytes += len(generar(f'Asistente de Prueba {i}', f'{1000000 + i}', ruta).getvalue())
+        segundos = time.perf_counter() - inicio
+        return cantidad / segundos, segundos, total_bytes / cantidad
+
+    def handle(self, *args, **options):
+        cantidad = options['asistentes']
+        temporal = None
+        ruta = options['plantilla']
+        if not ruta:
+            descriptor, temporal = tempfile.mkstemp(suffix='.pdf')
+            os.close(descriptor)
+            self._plantilla_ejemplo(temporal)
+            ruta = temporal
+
+        try:
+            antes = self._medir(utils.generar_certificado_pdf_fusion, cantidad, ruta)
+            utils._plantilla.cache_clear()
+            despues = self._medir(utils.generar_certificado_pdf, cantidad, ruta)
+        finally:
+            if temporal:
+                os.remove(temporal)
+
+        self.stdout.write(f'Certificados por escenario: {cantidad}')
+        self.stdout.write(f'Fusión PyPDF2 (sin caché):   {antes[0]:10.1f} cert/s  ({antes[1]:.2f} s, {antes[2] / 1024:.1f} KB c/u)')
+        self.stdout.write(f'Plantilla precompilada:      {despues[0]:10.1f} cert/s  ({despues[1]:.2f} s, {despues[2] / 1024:.1f} KB c/u)')
+        self.stdout.write(self.style.SUCCESS(f'Mejora: {despues[0] / antes[0]:.1f}x'))
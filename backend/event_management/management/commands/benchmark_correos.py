@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from event_management.mail_dispatch import DespachadorCorreos, LimitadorTasa, MotorEnvio
+from event_management.smtp_local import ServidorSMTPLocal
+
+BACKEND_SMTP = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class Command(BaseCommand):
+    """
+    Compara el envío con una conexión SMTP por mensaje (email.send()) contra el
+    DespachadorCorreos, que reutiliza la conexión, y el MotorEnvio con varios hilos.
+    Usa un servidor SMTP local que simula la latencia de red y el costo del saludo
+    (STARTTLS + login) de un proveedor real.
+
+    Uso: python manage.py benchmark_correos --mensajes 300 --latencia 0.005 --latencia-conexion 0.15 --hilos 8
+    """
+    help = 'Mide mensajes por segundo con y sin reutilización de la conexión SMTP y con envío concurrente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mensajes', type=int, default=300, help='Mensajes por escenario')
+        parser.add_argument('--latencia', type=float, default=0.005, help='Segundos por respuesta SMTP')
+        parser.add_argument('--latencia-conexion', type=float, default=0.15, help='Segundos del saludo por conexión')
+        parser.add_argument('--max-por-conexion', type=int, default=100, help='Mensajes por conexión del despachador')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos del motor de envío')
+        parser.add_argument('--por-segundo', type=float, default=0, help='Límite de tasa del motor (0 = sin límite)')
+
+    def handle(self, *args, **options):
+        cantidad = options['mensajes']
+
+        with ServidorSMTPLocal(latencia=options['latencia'], latencia_conexion=options['latencia_conexion']) as servidor:
+            opciones = {
+                'backend': BACKEND_SMTP,
+                'host': servidor.host,
+                'port': servidor.port,
+                'username': '',
+                'password': '',
+                'use_tls': False,
+                'use_ssl': False,
+            }
+
+            def mensajes():
+                for i in range(cantidad):
+                    yield EmailMessage(
+                        f'Benchmark {i}', 'Mensaje de prueba', settings.DEFAULT_FROM_EMAIL, [f'asistente{i}@example.com']
+                    )
+
+            # Antes: cada mensaje abre y cierra su propia conexión
+            inicio = time.perf_counter()
+            for mensaje in mensajes():
+                mensaje.connection = get_connection(fail_silently=False, **opciones)
+                mensaje.send()
+            antes = time.perf_counter() - inicio
+            conexiones_antes = servidor.conexiones
+
+            # Después: conexión reutilizada, renovada cada --max-por-conexion mensajes
+            inicio = time.perf_counter()
+            with DespachadorCorreos(max_por_conexion=options['max_por_conexion'], **opciones) as despachador:
+                for mensaje in mensajes():
+                    despachador.intentar(mensaje)
+            despues = time.perf_counter() - inicio
+            conexiones_despues = servidor.conexiones - conexiones_antes
+
+            # Motor: varios hilos, cada uno con su conexión reutilizada
+            inicio = time.perf_counter()
+            with MotorEnvio(
+                hilos=options['hilos'], limitador=LimitadorTasa(options['por_segundo']),
+                max_por_conexion=options['max_por_conexion'], **opciones
+            ) as motor:
+                resultados = [r for _, r in motor.mapear((mensaje, None) for mensaje in mensajes())]
+            motor_segundos = time.perf_counter() - inicio
+            conexiones_motor = servidor.conexiones - conexiones_antes - conexiones_despues
+
+        fallidos = sum(1 for r in resultados if r is not True)
+        self.stdout.write(f'Mensajes por escenario: {cantidad}')
+        self.stdout.write(
+            f'Una conexión por mensaje: {cantidad / antes:8.1f} msg/s  ({conexiones_antes} conexiones, {antes:.2f} s)'
+        )
+        self.stdout.write(
+            f'Conexión reutilizada:     {cantidad / despues:8.1f} msg/s  ({conexiones_despues} conexiones, {despues:.2f} s)'
+        )
+        self.stdout.write(
+            f'Motor con {options["hilos"]} hilos:       {cantidad / motor_segundos:8.1f} msg/s  '
+            f'({conexiones_motor} conexiones, {motor_segundos:.2f} s)'
+        )
+        if fallidos:
+            self.stdout.write(self.style.WARNING(f'{fallidos} mensajes fallaron en el escenario del motor'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Mejora: {antes / despues:.1f}x (conexión reutilizada), {antes / motor_segundos:.1f}x (motor)'
+        ))
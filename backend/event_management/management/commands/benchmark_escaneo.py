@@ -0,0 +1,83 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.models import CustomUser
+from event_management import estadisticas, qr_cache
+from event_management.models import CodigoQR, Evento, Inscripcion
+from event_management.views import CodigoQRViewSet
+
+
+class Command(BaseCommand):
+    """
+    Compara la latencia del endpoint 'escanear' con el evento en frío (consultas a la BD)
+    y precargado en caché ('precargar_escaneo').
+    Crea eventos y usuarios temporales que se eliminan al terminar.
+
+    Uso: python manage.py benchmark_escaneo --codigos 1000
+    """
+    help = 'Mide p50/p99 de la latencia de escaneo de QR con y sin precarga en caché'
+
+    PREFIJO = 'bench-'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--codigos', type=int, default=1000, help='Códigos QR por escenario')
+
+    def handle(self, *args, **options):
+        cantidad = options['codigos']
+        staff = CustomUser(id=f'{self.PREFIJO}staff', full_name='Benchmark', role='Asistente')
+        vista = CodigoQRViewSet.as_view({'post': 'escanear'})
+        factory = APIRequestFactory()
+
+        def escanear(codigo, evento):
+            request = factory.post('/api/qr/escanear/', {'codigo': codigo, 'evento': evento.pk}, format='json')
+            force_authenticate(request, user=staff)
+            inicio = time.perf_counter()
+            vista(request)
+            return (time.perf_counter() - inicio) * 1000
+
+        usuarios = [
+            CustomUser(id=f'{self.PREFIJO}{i:06d}', full_name=f'Asistente {i}', dependency='Benchmark', password='!')
+            for i in range(cantidad)
+        ]
+        CustomUser.objects.bulk_create(usuarios, batch_size=1000)
+        eventos = []
+
+        try:
+            for modo in ('frío', 'caliente'):
+                evento = Evento.objects.create(
+                    titulo=f'Benchmark escaneo ({modo})', fecha=timezone.now(), lugar='N/A', estado='APROBADO'
+                )
+                eventos.append(evento)
+                Inscripcion.objects.bulk_create(
+                    [Inscripcion(evento=evento, usuario=u) for u in usuarios], batch_size=1000
+                )
+                CodigoQR.objects.bulk_create(
+                    [CodigoQR(evento=evento, usuario=u, tipo_comida='ENTRADA') for u in usuarios], batch_size=1000
+                )
+                estadisticas.reconstruir(evento)
+                codigos = [str(c) for c in CodigoQR.objects.filter(evento=evento).values_list('codigo', flat=True)]
+
+                if modo == 'caliente':
+                    qr_cache.calentar_evento(evento)
+
+                escenarios = {
+                    'redención': [escanear(c, evento) for c in codigos],
+                    'ya usado': [escanear(c, evento) for c in codigos],
+                    'desconocido': [escanear(str(uuid.uuid4()), evento) for _ in codigos],
+                }
+
+                for escenario, tiempos in escenarios.items():
+                    percentiles = statistics.quantiles(tiempos, n=100)
+                    self.stdout.write(
+                        f'{modo:<9} {escenario:<12} p50={percentiles[49]:7.2f} ms  p99={percentiles[98]:7.2f} ms'
+                    )
+        finally:
+            for evento in eventos:
+                qr_cache.enfriar_evento(evento)
+                evento.delete()
+            CustomUser.objects.filter(id__startswith=self.PREFIJO).delete()
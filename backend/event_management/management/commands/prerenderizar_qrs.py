@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from event_management.models import CodigoQR, Evento
+from event_management.qr_images import prerenderizar
+from event_management.qr_signing import contenido_qr
+
+
+class Command(BaseCommand):
+    """
+    Pre-renderiza en paralelo todas las imágenes QR de un evento en la caché de disco,
+    antes del envío masivo de correos o de la impresión de escarapelas.
+
+    Uso: python manage.py prerenderizar_qrs <evento_id> [--procesos N]
+    """
+    help = 'Renderiza en paralelo las imágenes QR de un evento en la caché de imágenes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('evento_id', type=int)
+        parser.add_argument('--procesos', type=int, default=None, help='Procesos del pool (por defecto, núcleos del equipo)')
+
+    def handle(self, *args, **options):
+        try:
+            evento = Evento.objects.get(pk=options['evento_id'])
+        except Evento.DoesNotExist:
+            raise CommandError(f"No existe el evento {options['evento_id']}")
+
+        qrs = CodigoQR.objects.filter(evento=evento).only('codigo', 'evento_id', 'tipo_comida')
+        contenidos = [contenido_qr(qr) for qr in qrs.iterator(chunk_size=2000)]
+        self.stdout.write(f'Evento "{evento.titulo}": {len(contenidos)} códigos QR')
+
+        def progreso(hechas, total, por_segundo):
+            self.stdout.write(f'  {hechas}/{total} imágenes ({por_segundo:.0f} img/s)')
+
+        resumen = prerenderizar(contenidos, procesos=options['procesos'], progreso=progreso)
+        self.stdout.write(self.style.SUCCESS(
+            f"Renderizadas: {resumen['renderizadas']}. Ya existentes: {resumen['existentes']}. "
+            f"{resumen['segundos']:.1f} s ({resumen['imagenes_por_segundo']:.0f} img/s)"
+        ))
@@ -0,0 +1,71 @@
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from event_management.jobs import identificador_trabajador, procesar_trabajo, reclamar_trabajo
+from event_management.transaccional import procesar_pendientes
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Proceso trabajador de los envíos de correo. Debe mantenerse corriendo junto al
+    servidor (systemd, supervisor, etc.).
+
+    - Los correos transaccionales (verificación de registro) se atienden en un hilo
+      propio cada pocos segundos, así no esperan a que termine un envío masivo.
+    - Los envíos masivos (TrabajoEnvio) se reclaman y procesan uno a la vez.
+
+    Uso: python manage.py procesar_envios [--una-vez] [--intervalo 5] [--intervalo-transaccional 1]
+    """
+    help = 'Procesa los trabajos de envío de correos encolados desde la API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre consultas de trabajos nuevos')
+        parser.add_argument(
+            '--intervalo-transaccional', type=float, default=1,
+            help='Segundos entre consultas de correos transaccionales pendientes'
+        )
+
+    def _transaccionales(self, intervalo):
+        while True:
+            procesados = 0
+            try:
+                close_old_connections()
+                procesados = procesar_pendientes()
+            except Exception as e:
+                logger.exception(f"Error procesando correos transaccionales: {e}")
+            if not procesados:
+                time.sleep(intervalo)
+
+    def handle(self, *args, **options):
+        trabajador = identificador_trabajador()
+        self.stdout.write(f'Trabajador de envíos {trabajador} iniciado')
+
+        if options['una_vez']:
+            while procesar_pendientes():
+                pass
+        else:
+            threading.Thread(
+                target=self._transaccionales, args=(options['intervalo_transaccional'],), daemon=True
+            ).start()
+
+        while True:
+            trabajo = reclamar_trabajo(trabajador)
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'Procesando trabajo {trabajo.pk} ({trabajo.evento.titulo})')
+            procesar_trabajo(trabajo)
+            trabajo.refresh_from_db()
+            self.stdout.write(
+                f'Trabajo {trabajo.pk} {trabajo.estado}: {trabajo.enviados} enviados, {trabajo.fallidos} fallidos'
+            )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from event_management import estadisticas
+from event_management.models import Evento
+
+
+class Command(BaseCommand):
+    """
+    Recalcula (o solo verifica con --verificar) los contadores de estadísticas de uno o de
+    todos los eventos a partir de sus códigos QR e inscripciones.
+    Con --verificar termina con error si algún contador no coincide.
+
+    Uso: python manage.py reconstruir_contadores [evento_id] [--verificar]
+    """
+    help = 'Recalcula o verifica los contadores de estadísticas de los eventos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('evento_id', type=int, nargs='?', help='Evento a procesar (por defecto, todos)')
+        parser.add_argument('--verificar', action='store_true', help='Solo compara los contadores sin modificarlos')
+
+    def handle(self, *args, **options):
+        eventos = Evento.objects.order_by('pk')
+        if options['evento_id'] is not None:
+            eventos = eventos.filter(pk=options['evento_id'])
+            if not eventos.exists():
+                raise CommandError(f"No existe el evento {options['evento_id']}")
+
+        inconsistentes = 0
+        for evento in eventos.iterator():
+            if options['verificar']:
+                diferencias = estadisticas.diferencias(evento)
+                for (tipo, dependencia), (guardado, real) in diferencias.items():
+                    self.stdout.write(
+                        f'Evento {evento.pk} - {tipo} {dependencia or ""}: guardado {guardado[0]}/{guardado[1]}, '
+                        f'real {real[0]}/{real[1]} (emitidos/redimidos)'
+                    )
+                inconsistentes += bool(diferencias)
+            else:
+                cambios = estadisticas.reconstruir(evento)
+                if cambios:
+                    self.stdout.write(f'Evento {evento.pk} "{evento.titulo}": {cambios} contadores corregidos')
+                inconsistentes += bool(cambios)
+
+        if options['verificar'] and inconsistentes:
+            raise CommandError(f'{inconsistentes} eventos con contadores inconsistentes')
+        self.stdout.write(self.style.SUCCESS(
+            'Contadores verificados.' if options['verificar'] else f'Contadores reconstruidos ({inconsistentes} eventos corregidos).'
+        ))
@@ -0,0 +1,127 @@
+"""
+Manifiesto offline de códigos QR de un evento para los dispositivos escáneres.
+
+El manifiesto es un JSON en columnas comprimido con gzip: los dueños se guardan una sola
+vez en una tabla de personas y los tipos de comida en un diccionario, de modo que un
+teléfono puede almacenar 50.000 códigos en alrededor de 1 MB.
+
+Estructura (formato 2):
+    {
+        "formato": 2,
+        "evento": <id>,
+        "version": <milisegundos epoch en que se generó>,
+        "tipos": ["ENTRADA", "REFRIGERIO", ...],
+        "personas": [[identificacion, nombre], ...],
+        "codigos": [<UUID en hex, 32 caracteres>, ...],   # columnas alineadas por posición
+        "tipo": [<índice en 'tipos'>, ...],
+        "persona": [<índice en 'personas'>, ...],
+        "usado": [0 | 1, ...],
+        "fecha_uso": [<segundos epoch> | 0, ...],
+        "firma": [<firma del contenido firmado del código (qr_signing), 16 caracteres>, ...]
+    }
+
+Un contenido firmado escaneado offline es válido si su código está en 'codigos', con el
+mismo tipo y evento, y su firma coincide con la de 'firma'. El manifiesto no incluye la clave
+del evento: quien lo descargue puede verificar los códigos existentes pero no firmar otros.
+
+La 'version' se usa luego para la sincronización delta: el dispositivo recibe solo las
+filas modificadas desde esa versión.
+"""
+import gzip
+import json
+from datetime import timedelta, datetime, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import CodigoQR
+from .qr_signing import clave_evento, firma_codigo
+
+FORMATO = 2
+
+# Margen de solapamiento al calcular el delta: cubre transacciones que confirmaron
+# justo después de generar la versión anterior con una fecha ligeramente previa.
+MARGEN_SINCRONIZACION = timedelta(seconds=5)
+
+
+def version_actual():
+    """Versión del manifiesto: instante actual en milisegundos epoch."""
+    return int(timezone.now().timestamp() * 1000)
+
+
+def fecha_de_version(version):
+    """Convierte una versión (milisegundos epoch) en datetime con zona horaria."""
+    return datetime.fromtimestamp(int(version) / 1000, tz=dt_timezone.utc)
+
+
+def _filas(qrs):
+    """Convierte un queryset de CodigoQR en las columnas del manifiesto."""
+    tipos = {}
+    personas = {}
+    claves = {}
+    datos = {
+        'tipos': [],
+        'personas': [],
+        'codigos': [],
+        'tipo': [],
+        'persona': [],
+        'usado': [],
+        'fecha_uso': [],
+        'firma': [],
+    }
+
+    qrs = qrs.select_related('usuario', 'asistente').order_by('pk')
+    for qr in qrs.iterator(chunk_size=2000):
+        if qr.tipo_comida not in tipos:
+            tipos[qr.tipo_comida] = len(datos['tipos'])
+            datos['tipos'].append(qr.tipo_comida)
+
+        info = qr.datos_asistente()
+        clave = (str(info['identificacion']), info['nombre_completo'])
+        if clave not in personas:
+            personas[clave] = len(datos['personas'])
+            datos['personas'].append(list(clave))
+
+        datos['codigos'].append(qr.codigo.hex)
+        datos['tipo'].append(tipos[qr.tipo_comida])
+        datos['persona'].append(personas[clave])
+        datos['usado'].append(1 if qr.usado else 0)
+        datos['fecha_uso'].append(int(qr.fecha_uso.timestamp()) if qr.fecha_uso else 0)
+
+        if qr.evento_id not in claves:
+            claves[qr.evento_id] = clave_evento(qr.evento_id)
+        datos['firma'].append(firma_codigo(qr.evento_id, qr.tipo_comida, qr.codigo, claves[qr.evento_id]))
+
+    return datos
+
+
+def construir_manifiesto(evento):
+    """
+    Genera el manifiesto completo del evento.
+
+    Returns:
+        tuple: (bytes comprimidos con gzip, versión)
+    """
+    # La versión se toma antes de leer: lo que cambie durante la lectura entra en el próximo delta
+    version = version_actual()
+    manifiesto = {
+        'formato': FORMATO,
+        'evento': evento.pk,
+        'version': version,
+    }
+    manifiesto.update(_filas(CodigoQR.objects.filter(evento=evento)))
+
+    contenido = json.dumps(manifiesto, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(contenido, compresslevel=6), version
+
+
+def cambios_desde(evento, version):
+    """
+    Devuelve las filas del evento modificadas desde la versión indicada y la nueva versión.
+
+    Returns:
+        tuple: (dict con las columnas del manifiesto, nueva versión)
+    """
+    nueva_version = version_actual()
+    desde = fecha_de_version(version) - MARGEN_SINCRONIZACION
+    qrs = CodigoQR.objects.filter(evento=evento, fecha_actualizacion__gte=desde)
+    return _filas(qrs), nueva_version
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0008_evento_estado_alter_evento_fecha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codigoqr',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Fecha de Actualización'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='codigoqr',
+            index=models.Index(fields=['evento', 'fecha_actualizacion'], name='qr_evento_actualizacion_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0009_codigoqr_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='codigoqr',
+            index=models.Index(fields=['evento', 'usuario', 'tipo_comida', 'usado'], name='qr_evento_usuario_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='codigoqr',
+            index=models.Index(fields=['evento', 'asistente', 'tipo_comida', 'usado'], name='qr_evento_asistente_tipo_idx'),
+        ),
+    ]
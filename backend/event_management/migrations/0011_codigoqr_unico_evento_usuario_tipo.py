@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:20
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def eliminar_duplicados(apps, schema_editor):
+    """
+    Antes de crear la restricción única se eliminan los QRs repetidos (mismo evento, usuario y tipo).
+    Se conserva el usado (si lo hay) o el más antiguo.
+    """
+    CodigoQR = apps.get_model('event_management', 'CodigoQR')
+    repetidos = (
+        CodigoQR.objects.filter(evento__isnull=False, usuario__isnull=False)
+        .values('evento_id', 'usuario_id', 'tipo_comida')
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for grupo in repetidos:
+        qrs = CodigoQR.objects.filter(
+            evento_id=grupo['evento_id'],
+            usuario_id=grupo['usuario_id'],
+            tipo_comida=grupo['tipo_comida'],
+        ).order_by('-usado', 'fecha_creacion', 'id')
+        conservar = qrs.first()
+        qrs.exclude(pk=conservar.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0010_codigoqr_indices_busqueda_identificacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_duplicados, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='codigoqr',
+            unique_together={('evento', 'usuario', 'tipo_comida')},
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0011_codigoqr_unico_evento_usuario_tipo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoEnvio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('QR', 'Códigos QR por correo')], default='QR', max_length=20, verbose_name='Tipo de Envío')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('COMPLETADO', 'Completado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20, verbose_name='Estado')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de Destinatarios')),
+                ('procesados', models.PositiveIntegerField(default=0, verbose_name='Procesados')),
+                ('enviados', models.PositiveIntegerField(default=0, verbose_name='Enviados')),
+                ('fallidos', models.PositiveIntegerField(default=0, verbose_name='Fallidos')),
+                ('ultimo_procesado', models.PositiveBigIntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list, verbose_name='Detalle de Errores')),
+                ('trabajador', models.CharField(blank=True, max_length=100, verbose_name='Proceso Trabajador')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_latido', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_envio', to=settings.AUTH_USER_MODEL)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_envio', to='event_management.evento')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Envío',
+                'verbose_name_plural': 'Trabajos de Envío',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_estado_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0012_trabajoenvio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoenvio',
+            name='omitidos',
+            field=models.PositiveIntegerField(default=0, verbose_name='Omitidos (ya enviados)'),
+        ),
+        migrations.AddField(
+            model_name='trabajoenvio',
+            name='solo_fallidos',
+            field=models.BooleanField(default=False, verbose_name='Solo Reenviar Fallidos'),
+        ),
+        migrations.CreateModel(
+            name='CorreoSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254, verbose_name='Destinatario')),
+                ('tipo', models.CharField(choices=[('QR', 'Códigos QR por correo')], default='QR', max_length=20, verbose_name='Tipo de Correo')),
+                ('hash_contenido', models.CharField(max_length=64, verbose_name='Hash del Contenido')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20, verbose_name='Estado')),
+                ('error', models.TextField(blank=True, verbose_name='Último Error')),
+                ('intentos', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='correos_salientes', to='event_management.evento')),
+                ('trabajo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='correos', to='event_management.trabajoenvio')),
+            ],
+            options={
+                'verbose_name': 'Correo Saliente',
+                'verbose_name_plural': 'Correos Salientes',
+                'indexes': [models.Index(fields=['evento', 'tipo', 'estado'], name='correo_evento_tipo_estado_idx')],
+                'unique_together': {('evento', 'destinatario', 'tipo', 'hash_contenido')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0013_correosaliente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='correosaliente',
+            name='proximo_intento',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='correosaliente',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='correos_salientes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='correosaliente',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido'), ('CANCELADO', 'Cancelado')], default='PENDIENTE', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AlterField(
+            model_name='correosaliente',
+            name='evento',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='correos_salientes', to='event_management.evento'),
+        ),
+        migrations.AlterField(
+            model_name='correosaliente',
+            name='tipo',
+            field=models.CharField(choices=[('QR', 'Códigos QR por correo'), ('VERIFICACION', 'Verificación de registro')], default='QR', max_length=20, verbose_name='Tipo de Correo'),
+        ),
+        migrations.AddIndex(
+            model_name='correosaliente',
+            index=models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_proximo_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0014_correosaliente_transaccional'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='correosaliente',
+            name='tipo',
+            field=models.CharField(choices=[('QR', 'Códigos QR por correo'), ('CERTIFICADO', 'Certificados de asistencia'), ('VERIFICACION', 'Verificación de registro')], default='QR', max_length=20, verbose_name='Tipo de Correo'),
+        ),
+        migrations.AlterField(
+            model_name='trabajoenvio',
+            name='tipo',
+            field=models.CharField(choices=[('QR', 'Códigos QR por correo'), ('CERTIFICADO', 'Certificados de asistencia')], default='QR', max_length=20, verbose_name='Tipo de Envío'),
+        ),
+    ]
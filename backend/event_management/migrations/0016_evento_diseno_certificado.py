@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0015_certificados_trabajo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='diseno_certificado',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Diseño del Certificado'),
+        ),
+    ]
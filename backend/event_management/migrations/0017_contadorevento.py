@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:05
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Value
+from django.db.models.functions import Coalesce, Lower, NullIf, Trim
+
+
+def calcular_contadores(apps, schema_editor):
+    """Llena los contadores de los eventos existentes desde sus inscripciones y códigos QR."""
+    CodigoQR = apps.get_model('event_management', 'CodigoQR')
+    ContadorEvento = apps.get_model('event_management', 'ContadorEvento')
+    Inscripcion = apps.get_model('event_management', 'Inscripcion')
+
+    contadores = defaultdict(lambda: [0, 0])
+    for grupo in Inscripcion.objects.values('evento_id').annotate(total=Count('id')).order_by('evento_id'):
+        contadores[(grupo['evento_id'], 'INSCRIPCION', '')][0] = grupo['total']
+
+    dependencia = Lower(Trim(Coalesce(
+        NullIf('usuario__dependency', Value('')),
+        NullIf('asistente__sede', Value('')),
+        Value('Sin Definir'),
+    )))
+    grupos = (
+        CodigoQR.objects.filter(evento__isnull=False)
+        .annotate(clave=dependencia)
+        .values('evento_id', 'tipo_comida', 'clave')
+        .annotate(emitidos=Count('id'), redimidos=Count('id', filter=Q(usado=True)), primero=Min('fecha_creacion'))
+        .order_by('evento_id', 'primero', 'tipo_comida', 'clave')
+    )
+    for grupo in grupos:
+        contador = contadores[(grupo['evento_id'], grupo['tipo_comida'], grupo['clave'].strip().title()[:100])]
+        contador[0] += grupo['emitidos']
+        contador[1] += grupo['redimidos']
+
+    ContadorEvento.objects.bulk_create([
+        ContadorEvento(evento_id=evento_id, tipo=tipo, dependencia=dep, emitidos=emitidos, redimidos=redimidos)
+        for (evento_id, tipo, dep), (emitidos, redimidos) in contadores.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0016_evento_diseno_certificado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=100, verbose_name='Tipo')),
+                ('dependencia', models.CharField(blank=True, max_length=100, verbose_name='Dependencia')),
+                ('emitidos', models.PositiveIntegerField(default=0, verbose_name='Emitidos')),
+                ('redimidos', models.PositiveIntegerField(default=0, verbose_name='Redimidos')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contadores', to='event_management.evento')),
+            ],
+            options={
+                'verbose_name': 'Contador de Evento',
+                'verbose_name_plural': 'Contadores de Evento',
+                'ordering': ['id'],
+                'unique_together': {('evento', 'tipo', 'dependencia')},
+            },
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
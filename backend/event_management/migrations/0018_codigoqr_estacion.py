@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0017_contadorevento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codigoqr',
+            name='estacion',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Estación'),
+        ),
+        migrations.AddIndex(
+            model_name='codigoqr',
+            index=models.Index(fields=['evento', 'fecha_uso', 'tipo_comida', 'estacion'], name='qr_evento_fecha_uso_idx'),
+        ),
+    ]
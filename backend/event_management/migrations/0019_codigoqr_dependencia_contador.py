@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+
+def guardar_dependencias(apps, schema_editor):
+    """Guarda en cada QR de evento la dependencia actual de su dueño (la que usan sus contadores)."""
+    CodigoQR = apps.get_model('event_management', 'CodigoQR')
+
+    lote = []
+    qrs = CodigoQR.objects.filter(evento__isnull=False).values_list('pk', 'usuario__dependency', 'asistente__sede')
+    for pk, dependencia, sede in qrs.iterator(chunk_size=2000):
+        # Igual que ContadorEvento.normalizar_dependencia(CodigoQR.dueno()[2])
+        dependencia = (dependencia or sede or 'Sin Definir').strip().title()[:100]
+        lote.append(CodigoQR(pk=pk, dependencia_contador=dependencia))
+        if len(lote) >= 1000:
+            CodigoQR.objects.bulk_update(lote, ['dependencia_contador'])
+            lote = []
+    CodigoQR.objects.bulk_update(lote, ['dependencia_contador'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_management', '0018_codigoqr_estacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codigoqr',
+            name='dependencia_contador',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Dependencia (Contadores)'),
+        ),
+        migrations.RunPython(guardar_dependencias, migrations.RunPython.noop),
+    ]
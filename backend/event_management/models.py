@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 import uuid
+from collections import defaultdict
 from django.utils import timezone
 from users.models import CustomUser
 
@@ -87,6 +89,8 @@ class Evento(models.Model):
     
     # Plantilla PDF para generar certificados automáticos
     plantilla_certificado = models.FileField(upload_to='plantillas_certificados/', blank=True, null=True, verbose_name='Plantilla de Certificado (PDF)')
+    # Posiciones, fuentes, tamaños y colores del texto del certificado (ver utils.normalizar_diseno)
+    diseno_certificado = models.JSONField(default=dict, blank=True, verbose_name='Diseño del Certificado')
     
     # Workflow de Aprobación
     ESTADO_CHOICES = [
@@ -121,6 +125,14 @@ class Inscripcion(models.Model):
     def __str__(self):
         return f"{self.usuario.full_name} - {self.evento.titulo}"
 
+    def save(self, *args, **kwargs):
+        """Al crear la inscripción suma un inscrito en los contadores del evento (misma transacción)."""
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ContadorEvento.sumar({(self.evento_id, ContadorEvento.INSCRIPCION, ''): (1, 0)})
+
 
 class CodigoQR(models.Model):
     """
@@ -195,11 +207,42 @@ class CodigoQR(models.Model):
         blank=True, 
         verbose_name="Fecha de Uso"
     )
+    # Estación (puerta o punto de entrega) que redimió el código, según la reporta el escáner
+    estacion = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Estación"
+    )
+
+    # Dependencia normalizada del dueño al emitir el código: fila de ContadorEvento que suman
+    # y restan su emisión, su redención y su borrado aunque el dueño cambie de dependencia después
+    dependencia_contador = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Dependencia (Contadores)"
+    )
+
+    # Última modificación: permite a los escáneres offline sincronizar solo lo que cambió.
+    # Los UPDATE masivos (que no disparan auto_now) deben asignarla explícitamente.
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Fecha de Actualización"
+    )
     
     class Meta:
         verbose_name = "Código QR"
         verbose_name_plural = "Códigos QR"
         ordering = ['fecha_creacion']
+        # Un usuario tiene un solo QR por tipo en cada evento (evita duplicados en generaciones concurrentes)
+        unique_together = ('evento', 'usuario', 'tipo_comida')
+        indexes = [
+            models.Index(fields=['evento', 'fecha_actualizacion'], name='qr_evento_actualizacion_idx'),
+            # Búsqueda manual por cédula en el escaneo (evento + dueño + tipo, disponibles primero)
+            models.Index(fields=['evento', 'usuario', 'tipo_comida', 'usado'], name='qr_evento_usuario_tipo_idx'),
+            models.Index(fields=['evento', 'asistente', 'tipo_comida', 'usado'], name='qr_evento_asistente_tipo_idx'),
+            # Flujo de escaneos por minuto: rango de fecha_uso del evento, cubriendo tipo y estación
+            models.Index(fields=['evento', 'fecha_uso', 'tipo_comida', 'estacion'], name='qr_evento_fecha_uso_idx'),
+        ]
 
     def __str__(self):
         estado = "Usado" if self.usado else "Disponible"
@@ -211,26 +254,410 @@ class CodigoQR(models.Model):
             
         return f"{nombre} - {self.tipo_comida} ({estado})"
 
-    def marcar_como_usado(self):
+    def save(self, *args, **kwargs):
+        """
+        Al crear un QR de evento guarda la dependencia de su dueño y suma un emitido en los
+        contadores del evento (misma transacción).
+        """
+        if not self._state.adding or not self.evento_id:
+            return super().save(*args, **kwargs)
+        if not self.dependencia_contador:
+            self.dependencia_contador = self.dependencia()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ContadorEvento.sumar({self.clave_contador(): (1, int(self.usado))})
+
+    def dueno(self):
+        """
+        (nombre, identificación, dependencia sin normalizar) del dueño del QR: Usuario o Asistente
+        legacy; la dependencia es la del usuario o, si no tiene, la sede del asistente.
+        Usa los datos de la precarga de escaneo (ver qr_cache.qr_desde_entrada), las relaciones
+        ya cargadas o, si no lo están, una consulta por llave primaria.
+        """
+        if getattr(self, '_dueno', None) is not None:
+            return self._dueno
+
+        cargadas = (
+            (self.usuario_id is None or CodigoQR.usuario.is_cached(self))
+            and (self.asistente_id is None or CodigoQR.asistente.is_cached(self))
+        )
+        if cargadas or self.pk is None:
+            usuario, asistente = self.usuario, self.asistente
+            fila = (
+                (usuario.full_name, usuario.id, usuario.dependency) if usuario else (None, None, None)
+            ) + (
+                (asistente.nombre_completo, asistente.identificacion, asistente.sede) if asistente else (None, None, None)
+            )
+        else:
+            fila = CodigoQR.objects.filter(pk=self.pk).values_list(
+                'usuario__full_name', 'usuario_id', 'usuario__dependency',
+                'asistente__nombre_completo', 'asistente__identificacion', 'asistente__sede',
+            ).first() or (None,) * 6
+
+        nombre_usuario, id_usuario, dependencia, nombre_asistente, id_asistente, sede = fila
+        if id_usuario is not None:
+            self._dueno = (nombre_usuario, id_usuario, dependencia or sede)
+        elif id_asistente is not None:
+            self._dueno = (nombre_asistente, id_asistente, sede)
+        else:
+            self._dueno = ('Desconocido', 'N/A', None)
+        return self._dueno
+
+    def escaneo_en_vivo(self, dueno, fecha_uso, estacion):
+        """Resumen de la redención que se publica en el dashboard en vivo (ver en_vivo.py)."""
+        nombre, identificacion, _ = dueno
+        return {
+            'codigo': str(self.codigo),
+            'tipo': self.tipo_comida,
+            'fecha_uso': fecha_uso,
+            'estacion': estacion,
+            'usuario_id': self.usuario_id,
+            'asistente': {
+                'nombre_completo': nombre,
+                'identificacion': identificacion,
+                'dependencia': self.dependencia_contador,
+            },
+        }
+
+    def dependencia(self):
+        """
+        Dependencia normalizada actual del dueño del QR: la del usuario, o la sede del asistente
+        legacy, o 'Sin Definir'. Se guarda en 'dependencia_contador' al emitir el código.
+        """
+        return ContadorEvento.normalizar_dependencia(self.dueno()[2])
+
+    def clave_contador(self):
+        """Fila de ContadorEvento del código: (evento_id, tipo, dependencia al emitirlo)."""
+        return (self.evento_id, self.tipo_comida, self.dependencia_contador)
+
+    def datos_asistente(self):
+        """
+        Devuelve la información normalizada del dueño del QR (Usuario o Asistente legacy),
+        tal como la expone el endpoint de escaneo.
+        """
+        if self.usuario:
+            return {
+                'nombre_completo': self.usuario.full_name,
+                'identificacion': self.usuario.id,
+                'sede': self.usuario.dependency or 'N/A',
+                'email': self.usuario.email
+            }
+        if self.asistente:
+            return {
+                'nombre_completo': self.asistente.nombre_completo,
+                'identificacion': self.asistente.identificacion,
+                'sede': self.asistente.sede or 'N/A',
+                'email': self.asistente.correo
+            }
+        return {
+            'nombre_completo': 'Desconocido',
+            'identificacion': 'N/A',
+            'sede': 'N/A'
+        }
+
+    def marcar_como_usado(self, fecha_uso=None, estacion=''):
         """
         Lógica para redimir el QR.
-        Marca 'usado' = True y registra la fecha.
-        Si es un QR de 'ENTRADA', actualiza automáticamente la inscripción a 'asistio=True'.
+        Marca 'usado' = True y registra la fecha mediante un UPDATE condicional
+        (WHERE usado = false), de modo que si varias estaciones escanean el mismo código
+        a la vez solo una de ellas lo redime.
+        Si es un QR de 'ENTRADA', actualiza en la misma transacción la inscripción a 'asistio=True'.
+        Al confirmarse, la redención se publica en el dashboard en vivo del evento.
+        'estacion' identifica la puerta o punto de entrega que escaneó el código.
+
+        Returns:
+            bool: True si esta llamada redimió el código, False si ya estaba usado.
         """
-        if not self.usado:
-            self.usado = True
-            self.fecha_uso = timezone.now()
-            self.save()
-            
+        from . import en_vivo
+
+        fecha_uso = fecha_uso or timezone.now()
+
+        with transaction.atomic():
+            # El número de filas afectadas decide quién ganó la redención
+            actualizados = CodigoQR.objects.filter(pk=self.pk, usado=False).update(
+                usado=True,
+                fecha_uso=fecha_uso,
+                estacion=estacion,
+                fecha_actualizacion=timezone.now()
+            )
+            if not actualizados:
+                return False
+
+            if self.evento_id:
+                ContadorEvento.sumar({self.clave_contador(): (0, 1)})
+                escaneo = self.escaneo_en_vivo(self.dueno(), fecha_uso, estacion)
+                transaction.on_commit(lambda: en_vivo.publicar_redenciones({self.evento_id: [escaneo]}))
+
             # Si es Entrada y está vinculado a un usuario, marcar asistencia en la inscripción
-            if self.tipo_comida == 'ENTRADA' and self.evento and self.usuario:
-                 try:
-                     inscripcion = Inscripcion.objects.get(evento=self.evento, usuario=self.usuario)
-                     if not inscripcion.asistio:
-                         inscripcion.asistio = True
-                         inscripcion.save()
-                 except Inscripcion.DoesNotExist:
-                     pass # No debería pasar si la integridad de datos es correcta
-            
-            return True
-        return False
+            if self.tipo_comida == 'ENTRADA' and self.evento_id and self.usuario_id:
+                Inscripcion.objects.filter(
+                    evento_id=self.evento_id,
+                    usuario_id=self.usuario_id,
+                    asistio=False
+                ).update(asistio=True)
+
+        self.usado = True
+        self.fecha_uso = fecha_uso
+        self.estacion = estacion
+        return True
+
+    @classmethod
+    def redimir_en_lote(cls, fechas_por_codigo, evento=None, conservar_mas_temprana=False, estacion=''):
+        """
+        Redime varios QRs en una sola transacción (estaciones con cola de escaneos offline).
+        Los códigos se resuelven con una única consulta 'codigo__in' bloqueando las filas,
+        y se actualizan con un bulk_update más un UPDATE de inscripciones por evento.
+        Al confirmarse, las redenciones se publican en el dashboard en vivo de cada evento.
+
+        Args:
+            fechas_por_codigo (dict): {UUID del código: fecha de escaneo en el dispositivo}
+            evento (Evento, opcional): Limita la redención a los códigos de este evento.
+            conservar_mas_temprana (bool): Si un código ya estaba usado con una fecha posterior
+                a la reportada, se corrige 'fecha_uso' a la más temprana (conflicto entre
+                dispositivos offline: gana el primer escaneo).
+            estacion (str): Estación que reporta los escaneos.
+
+        Returns:
+            dict: {UUID del código: (CodigoQR, redimido)} solo para los códigos existentes.
+                  'redimido' es False si el código ya estaba usado.
+        """
+        from . import en_vivo
+
+        resultados = {}
+        asistencias = defaultdict(list)
+        redenciones = defaultdict(int)
+        escaneos = defaultdict(list)
+        ahora = timezone.now()
+
+        with transaction.atomic():
+            qrs = cls.objects.select_related('usuario', 'asistente', 'evento').select_for_update().filter(
+                codigo__in=list(fechas_por_codigo.keys())
+            )
+            if evento is not None:
+                qrs = qrs.filter(evento=evento)
+
+            modificados = []
+            for qr in qrs:
+                fecha = fechas_por_codigo[qr.codigo]
+                redimido = not qr.usado
+                if redimido:
+                    qr.usado = True
+                    qr.fecha_uso = fecha
+                    qr.estacion = estacion
+                    modificados.append(qr)
+                    if qr.evento_id:
+                        redenciones[qr.clave_contador()] += 1
+                        escaneos[qr.evento_id].append(qr.escaneo_en_vivo(qr.dueno(), fecha, estacion))
+                    if qr.tipo_comida == 'ENTRADA' and qr.evento_id and qr.usuario_id:
+                        asistencias[qr.evento_id].append(qr.usuario_id)
+                elif conservar_mas_temprana and qr.fecha_uso and fecha < qr.fecha_uso:
+                    qr.fecha_uso = fecha
+                    qr.estacion = estacion
+                    modificados.append(qr)
+                resultados[qr.codigo] = (qr, redimido)
+
+            for qr in modificados:
+                qr.fecha_actualizacion = ahora
+            cls.objects.bulk_update(modificados, ['usado', 'fecha_uso', 'estacion', 'fecha_actualizacion'], batch_size=500)
+            ContadorEvento.sumar({clave: (0, total) for clave, total in redenciones.items()})
+            if escaneos:
+                transaction.on_commit(lambda: en_vivo.publicar_redenciones(dict(escaneos)))
+
+            # Marcar asistencia de todas las entradas redimidas, un UPDATE por evento
+            for evento_id, usuarios in asistencias.items():
+                Inscripcion.objects.filter(
+                    evento_id=evento_id,
+                    usuario_id__in=usuarios,
+                    asistio=False
+                ).update(asistio=True)
+
+        return resultados
+
+
+class ContadorEvento(models.Model):
+    """
+    Contadores de un evento por tipo de QR y dependencia: códigos emitidos y redimidos.
+    Se actualizan en la misma transacción que crea o redime cada código (UPDATE con F(), sin
+    condiciones de carrera entre estaciones), así las estadísticas del evento se leen de unas
+    pocas filas sin recorrer los códigos. La fila de tipo 'INSCRIPCION' cuenta los inscritos.
+
+    Cada código suma y resta siempre en la dependencia de su dueño al emitirse
+    (CodigoQR.dependencia_contador). Los borrados de códigos e inscripciones (uno a uno, en
+    bloque, en cascada o desde el admin) los descuentan mediante señales (ver signals.py). El comando 'reconstruir_contadores' los
+    recalcula o verifica a partir de los códigos e inscripciones.
+    """
+
+    INSCRIPCION = 'INSCRIPCION'
+    SIN_DEPENDENCIA = 'Sin Definir'
+
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='contadores')
+    tipo = models.CharField(max_length=100, verbose_name='Tipo')
+    dependencia = models.CharField(max_length=100, blank=True, verbose_name='Dependencia')
+    emitidos = models.PositiveIntegerField(default=0, verbose_name='Emitidos')
+    redimidos = models.PositiveIntegerField(default=0, verbose_name='Redimidos')
+
+    class Meta:
+        verbose_name = "Contador de Evento"
+        verbose_name_plural = "Contadores de Evento"
+        # El orden de creación es el orden de aparición de las dependencias
+        ordering = ['id']
+        unique_together = ('evento', 'tipo', 'dependencia')
+
+    def __str__(self):
+        return f"{self.evento_id} - {self.tipo} - {self.dependencia}: {self.redimidos}/{self.emitidos}"
+
+    @classmethod
+    def normalizar_dependencia(cls, dependencia):
+        """'  contaduría ' -> 'Contaduría'; vacía o nula -> 'Sin Definir'."""
+        return (dependencia or cls.SIN_DEPENDENCIA).strip().title()[:100]
+
+    @classmethod
+    def sumar(cls, cambios):
+        """
+        Suma (emitidos, redimidos) a cada contador con un UPDATE atómico (F()), creando la fila
+        si es la primera vez. Las restas (valores negativos, al borrar) solo actualizan filas
+        existentes. Las filas se recorren en orden para que dos transacciones concurrentes no se
+        bloqueen mutuamente.
+
+        Args:
+            cambios (dict): {(evento_id, tipo, dependencia): (emitidos, redimidos)}
+        """
+        for (evento_id, tipo, dependencia), (emitidos, redimidos) in sorted(cambios.items()):
+            if not emitidos and not redimidos:
+                continue
+            with transaction.atomic():
+                filtro = cls.objects.filter(evento_id=evento_id, tipo=tipo, dependencia=dependencia)
+                incremento = {'emitidos': F('emitidos') + emitidos, 'redimidos': F('redimidos') + redimidos}
+                if filtro.update(**incremento) or (emitidos <= 0 and redimidos <= 0):
+                    continue
+                # get_or_create resuelve la carrera si otra transacción crea la misma fila
+                _, creado = cls.objects.get_or_create(
+                    evento_id=evento_id, tipo=tipo, dependencia=dependencia,
+                    defaults={'emitidos': emitidos, 'redimidos': redimidos},
+                )
+                if not creado:
+                    filtro.update(**incremento)
+
+
+class TrabajoEnvio(models.Model):
+    """
+    Trabajo en segundo plano para los envíos masivos de correo de un evento.
+    Lo crea la API (respuesta inmediata) y lo procesa el comando 'procesar_envios'.
+    Guarda el avance (cursor + contadores) para reanudarse si el proceso trabajador se reinicia.
+    """
+
+    TIPO_CHOICES = [
+        ('QR', 'Códigos QR por correo'),
+        ('CERTIFICADO', 'Certificados de asistencia'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En Proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='trabajos_envio')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='QR', verbose_name='Tipo de Envío')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE', verbose_name='Estado')
+    creado_por = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos_envio')
+
+    # Avance del trabajo
+    total = models.PositiveIntegerField(default=0, verbose_name='Total de Destinatarios')
+    procesados = models.PositiveIntegerField(default=0, verbose_name='Procesados')
+    enviados = models.PositiveIntegerField(default=0, verbose_name='Enviados')
+    fallidos = models.PositiveIntegerField(default=0, verbose_name='Fallidos')
+    # Destinatarios que ya habían recibido el mismo contenido (según la bandeja de salida)
+    omitidos = models.PositiveIntegerField(default=0, verbose_name='Omitidos (ya enviados)')
+    # Reenvío: solo se procesan los destinatarios cuyo último intento falló
+    solo_fallidos = models.BooleanField(default=False, verbose_name='Solo Reenviar Fallidos')
+    # Cursor para reanudar: pk de la última inscripción procesada
+    ultimo_procesado = models.PositiveBigIntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True, verbose_name='Detalle de Errores')
+
+    # Control del proceso trabajador
+    trabajador = models.CharField(max_length=100, blank=True, verbose_name='Proceso Trabajador')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    # Latido: el trabajador lo actualiza al avanzar; si se detiene, otro puede retomar el trabajo
+    fecha_latido = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo de Envío"
+        verbose_name_plural = "Trabajos de Envío"
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_estado_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.evento.titulo} ({self.estado})"
+
+    @property
+    def restantes(self):
+        return max(self.total - self.procesados, 0)
+
+    @property
+    def correos_por_minuto(self):
+        """Velocidad de procesamiento desde que inició el trabajo."""
+        if not self.fecha_inicio:
+            return 0
+        fin = self.fecha_fin or self.fecha_latido or timezone.now()
+        minutos = (fin - self.fecha_inicio).total_seconds() / 60
+        return round(self.procesados / minutos, 1) if minutos > 0 else 0
+
+
+class CorreoSaliente(models.Model):
+    """
+    Bandeja de salida: un registro por (evento, destinatario, tipo, contenido).
+    Hace idempotentes los envíos masivos: lo que ya fue ENVIADO no se vuelve a enviar
+    al repetir el proceso, y los FALLIDOS pueden reenviarse por separado.
+
+    Los correos transaccionales (p.ej. verificación de registro) no tienen evento: la API solo
+    crea el registro PENDIENTE y el proceso 'procesar_envios' los entrega y reintenta.
+    """
+
+    TIPO_CHOICES = TrabajoEnvio.TIPO_CHOICES + [
+        ('VERIFICACION', 'Verificación de registro'),
+    ]
+
+    # Tipos que se entregan uno a uno desde la bandeja (sin TrabajoEnvio)
+    TIPOS_TRANSACCIONALES = ['VERIFICACION']
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('ENVIADO', 'Enviado'),
+        ('FALLIDO', 'Fallido'),
+        ('CANCELADO', 'Cancelado'),
+    ]
+
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='correos_salientes', null=True, blank=True)
+    usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='correos_salientes', null=True, blank=True)
+    destinatario = models.EmailField(verbose_name='Destinatario')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='QR', verbose_name='Tipo de Correo')
+    # SHA-256 del contenido relevante (p.ej. los códigos QR incluidos): si cambia, es un correo nuevo
+    hash_contenido = models.CharField(max_length=64, verbose_name='Hash del Contenido')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE', verbose_name='Estado')
+    error = models.TextField(blank=True, verbose_name='Último Error')
+    intentos = models.PositiveIntegerField(default=0, verbose_name='Intentos')
+    trabajo = models.ForeignKey(TrabajoEnvio, on_delete=models.SET_NULL, null=True, blank=True, related_name='correos')
+    # Transaccionales: cuándo puede (re)intentarse el envío (espera creciente tras cada fallo)
+    proximo_intento = models.DateTimeField(null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Correo Saliente"
+        verbose_name_plural = "Correos Salientes"
+        unique_together = ('evento', 'destinatario', 'tipo', 'hash_contenido')
+        indexes = [
+            models.Index(fields=['evento', 'tipo', 'estado'], name='correo_evento_tipo_estado_idx'),
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_proximo_idx'),
+        ]
+
+    def __str__(self):
+        origen = self.evento.titulo if self.evento_id else self.get_tipo_display()
+        return f"{self.destinatario} - {origen} ({self.estado})"
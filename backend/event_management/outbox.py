@@ -0,0 +1,80 @@
+"""
+Bandeja de salida (CorreoSaliente) para que los envíos masivos sean idempotentes.
+
+Cada correo se identifica por (evento, destinatario, tipo, hash del contenido). Antes de enviar
+se registra en la bandeja; si ese mismo contenido ya figura como ENVIADO se omite, así repetir
+'enviar_emails_evento' después de un fallo parcial no vuelve a gastar la cuota SMTP con
+quienes ya lo recibieron.
+"""
+import hashlib
+
+from django.utils import timezone
+
+from .models import CorreoSaliente
+
+# Máximo de errores detallados que se devuelven al dashboard
+MAX_DETALLES = 500
+
+
+def hash_contenido(partes):
+    """SHA-256 de las partes que definen el contenido del correo (sin importar el orden)."""
+    texto = '\n'.join(sorted(str(parte) for parte in partes))
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def registrar(evento, destinatario, tipo, huella, trabajo=None):
+    """
+    Obtiene (o crea como PENDIENTE) el registro del correo en la bandeja de salida.
+
+    Returns:
+        CorreoSaliente: revisar su 'estado' para saber si ya fue enviado.
+    """
+    correo, _ = CorreoSaliente.objects.get_or_create(
+        evento=evento,
+        destinatario=destinatario,
+        tipo=tipo,
+        hash_contenido=huella,
+        defaults={'trabajo': trabajo}
+    )
+    return correo
+
+
+def registrar_resultado(correo, resultado, trabajo=None):
+    """
+    Guarda el resultado de un intento de envío (True o el texto/valor del error).
+    Al enviarse, los fallos anteriores del mismo destinatario con otro contenido dejan de aplicar.
+    """
+    ahora = timezone.now()
+    correo.intentos += 1
+    correo.trabajo = trabajo or correo.trabajo
+    if resultado is True:
+        correo.estado = 'ENVIADO'
+        correo.error = ''
+        correo.fecha_envio = ahora
+        CorreoSaliente.objects.filter(
+            evento_id=correo.evento_id, destinatario=correo.destinatario, tipo=correo.tipo, estado='FALLIDO'
+        ).exclude(pk=correo.pk).delete()
+    else:
+        correo.estado = 'FALLIDO'
+        correo.error = resultado if isinstance(resultado, str) else 'No se pudo enviar el correo'
+    correo.save(update_fields=['estado', 'error', 'intentos', 'trabajo', 'fecha_envio', 'fecha_actualizacion'])
+
+
+def fallidos(evento, tipo='QR'):
+    """Correos del evento cuyo último intento falló."""
+    return CorreoSaliente.objects.filter(evento=evento, tipo=tipo, estado='FALLIDO')
+
+
+def detalle_errores(evento, tipo='QR'):
+    """
+    Errores de envío del evento tal como los muestra el dashboard.
+
+    Returns:
+        tuple: (cantidad de fallidos, lista de 'destinatario: error')
+    """
+    consulta = fallidos(evento, tipo)
+    detalles = [
+        f'{destinatario}: {error}'
+        for destinatario, error in consulta.order_by('destinatario').values_list('destinatario', 'error')[:MAX_DETALLES]
+    ]
+    return consulta.count(), detalles
@@ -0,0 +1,36 @@
+"""
+Piezas de bajo nivel para escribir PDF a mano: objetos, streams, fuentes estándar,
+entradas de la tabla xref y strings literales.
+
+Las usan el escritor incremental de escarapelas (badges) y la plantilla precompilada de
+certificados (utils), que arman el PDF byte a byte en lugar de usar el canvas de reportlab.
+"""
+
+
+def texto_pdf(texto):
+    """Codifica un texto para un string literal de PDF (WinAnsiEncoding, con escapes)."""
+    datos = texto.encode('cp1252', errors='replace')
+    return datos.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').decode('latin-1')
+
+
+def stream_pdf(datos, diccionario=''):
+    """Cuerpo de un stream (diccionario con /Length + datos), sin el envoltorio 'obj'."""
+    entradas = f'{diccionario} /Length {len(datos)}' if diccionario else f'/Length {len(datos)}'
+    return f'<< {entradas} >>\nstream\n'.encode('latin-1') + datos + b'\nendstream'
+
+
+def objeto_pdf(numero, cuerpo):
+    """Objeto indirecto 'N 0 obj ... endobj' con el cuerpo dado (str o bytes)."""
+    if isinstance(cuerpo, str):
+        cuerpo = cuerpo.encode('latin-1')
+    return f'{numero} 0 obj\n'.encode('latin-1') + cuerpo + b'\nendobj\n'
+
+
+def fuente_estandar(nombre):
+    """Diccionario de una de las 14 fuentes estándar (no se incrusta) con WinAnsiEncoding."""
+    return f'<< /Type /Font /Subtype /Type1 /BaseFont /{nombre} /Encoding /WinAnsiEncoding >>'
+
+
+def entrada_xref(posicion):
+    """Entrada de la tabla xref para un objeto en uso."""
+    return f'{posicion:010d} 00000 n \n'
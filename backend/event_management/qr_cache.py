@@ -0,0 +1,147 @@
+"""
+Caché "caliente" de códigos QR por evento para el endpoint de escaneo.
+
+Una vez ejecutado 'generar_qrs_masivo', el conjunto de códigos válidos de un evento es fijo.
+Precargarlo en el framework de caché de Django (memoria local o archivo en desarrollo,
+backend compartido en producción) permite que 'escanear' resuelva la búsqueda y rechace
+códigos desconocidos o ya usados sin consultar la base de datos: solo la escritura de la
+redención llega a MySQL.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CodigoQR
+
+# Prefijos de las claves en la caché
+PREFIJO_CODIGO = 'sigue:qr:'
+PREFIJO_EVENTO = 'sigue:qr_evento:'
+
+# Cantidad de códigos que se escriben en la caché por cada set_many
+TAMANO_LOTE = 2000
+
+
+def _timeout():
+    """Duración de la precarga (por defecto 12 horas, lo que dura una jornada de evento)."""
+    return getattr(settings, 'QR_CACHE_TIMEOUT', 60 * 60 * 12)
+
+
+def normalizar_codigo(codigo):
+    """Devuelve el UUID en su forma canónica o None si el texto no es un UUID."""
+    try:
+        return str(uuid.UUID(str(codigo).strip()))
+    except ValueError:
+        return None
+
+
+def _entrada(qr):
+    """Construye la entrada de caché de un QR con todo lo que necesita la respuesta de escaneo."""
+    return {
+        'id': qr.pk,
+        'codigo': str(qr.codigo),
+        'evento_id': qr.evento_id,
+        'usuario_id': qr.usuario_id,
+        'evento': qr.evento.titulo if qr.evento else None,
+        'tipo': qr.tipo_comida,
+        'usado': qr.usado,
+        'fecha_uso': qr.fecha_uso,
+        'asistente': qr.datos_asistente(),
+        # Dueño (dashboard en vivo) y fila de contadores del código al redimir
+        'dueno': list(qr.dueno()),
+        'dependencia_contador': qr.dependencia_contador,
+    }
+
+
+def calentar_evento(evento):
+    """
+    Precarga en la caché todos los códigos QR del evento: codigo -> (dueño, tipo, usado).
+
+    Returns:
+        int: Cantidad de códigos precargados.
+    """
+    timeout = _timeout()
+    total = 0
+    lote = {}
+
+    qrs = CodigoQR.objects.filter(evento=evento).select_related('usuario', 'asistente', 'evento')
+    for qr in qrs.iterator(chunk_size=TAMANO_LOTE):
+        lote[f'{PREFIJO_CODIGO}{qr.codigo}'] = _entrada(qr)
+        if len(lote) >= TAMANO_LOTE:
+            cache.set_many(lote, timeout)
+            total += len(lote)
+            lote = {}
+
+    if lote:
+        cache.set_many(lote, timeout)
+        total += len(lote)
+
+    # La marca se escribe al final: mientras no exista, los fallos de caché van a la base de datos
+    cache.set(f'{PREFIJO_EVENTO}{evento.pk}', total, timeout)
+    return total
+
+
+def enfriar_evento(evento):
+    """Elimina la precarga del evento (los escaneos vuelven a consultar la base de datos)."""
+    cache.delete(f'{PREFIJO_EVENTO}{evento.pk}')
+    codigos = CodigoQR.objects.filter(evento=evento).values_list('codigo', flat=True)
+    claves = [f'{PREFIJO_CODIGO}{codigo}' for codigo in codigos.iterator(chunk_size=TAMANO_LOTE)]
+    for inicio in range(0, len(claves), TAMANO_LOTE):
+        cache.delete_many(claves[inicio:inicio + TAMANO_LOTE])
+
+
+def evento_caliente(evento_id):
+    """Indica si el evento está precargado (su caché es la fuente de verdad de códigos válidos)."""
+    if not evento_id:
+        return False
+    return cache.get(f'{PREFIJO_EVENTO}{evento_id}') is not None
+
+
+def obtener(codigo):
+    """Devuelve la entrada precargada del código o None si no está en la caché."""
+    codigo = normalizar_codigo(codigo)
+    if not codigo:
+        return None
+    return cache.get(f'{PREFIJO_CODIGO}{codigo}')
+
+
+def qr_desde_entrada(entrada):
+    """
+    Instancia mínima de CodigoQR (sin consultar la BD) suficiente para 'marcar_como_usado'.
+    Las entradas precargadas antes de existir 'dependencia_contador' la leen de la BD.
+    """
+    dependencia = entrada.get('dependencia_contador')
+    if dependencia is None:
+        dependencia = CodigoQR.objects.filter(pk=entrada['id']).values_list('dependencia_contador', flat=True).first() or ''
+    qr = CodigoQR(
+        pk=entrada['id'],
+        codigo=uuid.UUID(entrada['codigo']),
+        evento_id=entrada['evento_id'],
+        usuario_id=entrada['usuario_id'],
+        tipo_comida=entrada['tipo'],
+        usado=entrada['usado'],
+        fecha_uso=entrada['fecha_uso'],
+        dependencia_contador=dependencia,
+    )
+    if entrada.get('dueno'):
+        qr._dueno = tuple(entrada['dueno'])
+    return qr
+
+
+def registrar_redenciones(redenciones):
+    """
+    Mantiene la caché consistente tras redimir códigos.
+    Solo actualiza códigos ya precargados (los eventos fríos no se cargan por esta vía).
+
+    Args:
+        redenciones (dict): {codigo: fecha_uso}
+    """
+    claves = {f'{PREFIJO_CODIGO}{codigo}': fecha for codigo, fecha in redenciones.items()}
+    entradas = cache.get_many(list(claves.keys()))
+    if not entradas:
+        return
+
+    for clave, entrada in entradas.items():
+        entrada['usado'] = True
+        entrada['fecha_uso'] = claves[clave]
+    cache.set_many(entradas, _timeout())
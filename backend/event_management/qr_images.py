@@ -0,0 +1,173 @@
+"""
+Caché de imágenes QR direccionada por contenido.
+
+La clave de cada imagen es un hash del contenido codificado + los parámetros de render,
+así que un mismo código nunca se rasteriza dos veces: primero se busca en un LRU en
+memoria del proceso y luego en disco (MEDIA_ROOT/qr_cache/); solo si no está en ninguno
+se genera con qrcode + Pillow y se guarda en ambos.
+
+La misma clave sirve como ETag fuerte del endpoint de imágenes.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+
+# Cambiar si se modifica la forma de renderizar para invalidar las imágenes guardadas
+VERSION_RENDER = 1
+
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Parámetros por defecto (los mismos que usaba generar_imagen_qr)
+BOX_SIZE = 10
+BORDER = 4
+
+# Cantidad de imágenes que se conservan en memoria por proceso (~1 KB cada PNG)
+TAMANO_LRU = 4096
+
+
+def directorio_cache():
+    return os.path.join(settings.MEDIA_ROOT, 'qr_cache')
+
+
+def clave_imagen(contenido, formato='png', box_size=BOX_SIZE, border=BORDER):
+    """Clave (SHA-256) del contenido y los parámetros de render."""
+    texto = f'{VERSION_RENDER}|{formato}|{box_size}|{border}|{contenido}'
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def ruta_imagen(clave, formato='png'):
+    """Ruta en disco de una imagen (subdirectorio por los 2 primeros caracteres de la clave)."""
+    return os.path.join(directorio_cache(), clave[:2], f'{clave}.{formato}')
+
+
+def renderizar_qr(contenido, formato='png', box_size=BOX_SIZE, border=BORDER):
+    """Rasteriza el QR (sin caché) y devuelve los bytes de la imagen."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(str(contenido))
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if formato == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _escribir_atomico(ruta, datos):
+    """Escribe el archivo de forma atómica (temporal + rename) para no dejar imágenes a medias."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(datos)
+    os.replace(temporal, ruta)
+
+
+def guardar_en_disco(clave, formato, datos):
+    """Guarda la imagen en la caché de disco y devuelve su ruta."""
+    ruta = ruta_imagen(clave, formato)
+    _escribir_atomico(ruta, datos)
+    return ruta
+
+
+def leer_de_disco(clave, formato='png'):
+    """Devuelve los bytes guardados en disco o None si la imagen no existe."""
+    try:
+        with open(ruta_imagen(clave, formato), 'rb') as archivo:
+            return archivo.read()
+    except FileNotFoundError:
+        return None
+
+
+@lru_cache(maxsize=TAMANO_LRU)
+def _obtener(clave, contenido, formato, box_size, border):
+    datos = leer_de_disco(clave, formato)
+    if datos is None:
+        datos = renderizar_qr(contenido, formato, box_size, border)
+        guardar_en_disco(clave, formato, datos)
+    return datos
+
+
+def obtener_imagen_qr(contenido, formato='png', box_size=BOX_SIZE, border=BORDER):
+    """
+    Devuelve la imagen del QR desde la caché (memoria -> disco -> render).
+
+    Returns:
+        tuple: (bytes de la imagen, clave de contenido)
+    """
+    clave = clave_imagen(contenido, formato, box_size, border)
+    return _obtener(clave, str(contenido), formato, box_size, border), clave
+
+
+def _renderizar_lote(tareas):
+    """
+    Trabajo de cada proceso del pool: renderiza y escribe en disco un lote de imágenes.
+    Recibe las rutas ya resueltas para no depender de la configuración de Django en el proceso hijo.
+    """
+    for contenido, formato, box_size, border, ruta in tareas:
+        _escribir_atomico(ruta, renderizar_qr(contenido, formato, box_size, border))
+    return len(tareas)
+
+
+def prerenderizar(contenidos, formato='png', box_size=BOX_SIZE, border=BORDER, procesos=None, progreso=None):
+    """
+    Renderiza en paralelo (un proceso por núcleo) las imágenes que aún no están en la caché de disco.
+    Así el envío de correos y la impresión solo leen bytes ya generados.
+
+    Args:
+        contenidos (iterable): Textos a codificar (ver qr_signing.contenido_qr).
+        procesos (int, opcional): Tamaño del pool; por defecto os.cpu_count().
+        progreso (callable, opcional): progreso(hechas, total, imagenes_por_segundo).
+
+    Returns:
+        dict: {'total', 'existentes', 'renderizadas', 'segundos', 'imagenes_por_segundo'}
+    """
+    contenidos = list(dict.fromkeys(str(c) for c in contenidos))
+    tareas = []
+    for contenido in contenidos:
+        ruta = ruta_imagen(clave_imagen(contenido, formato, box_size, border), formato)
+        if not os.path.exists(ruta):
+            tareas.append((contenido, formato, box_size, border, ruta))
+
+    inicio = time.perf_counter()
+    hechas = 0
+    if tareas:
+        procesos = procesos or os.cpu_count() or 1
+        # Lotes por envío al pool: reduce el costo de IPC sin dejar procesos ociosos al final
+        lote = max(1, min(256, len(tareas) // (procesos * 4) or 1))
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = [
+                pool.submit(_renderizar_lote, tareas[i:i + lote])
+                for i in range(0, len(tareas), lote)
+            ]
+            for futuro in as_completed(futuros):
+                hechas += futuro.result()
+                if progreso:
+                    transcurrido = time.perf_counter() - inicio
+                    progreso(hechas, len(tareas), hechas / transcurrido if transcurrido else 0)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'total': len(contenidos),
+        'existentes': len(contenidos) - len(tareas),
+        'renderizadas': hechas,
+        'segundos': segundos,
+        'imagenes_por_segundo': hechas / segundos if hechas and segundos else 0,
+    }
+
@@ -0,0 +1,105 @@
+"""
+Contenido firmado (HMAC) para los códigos QR.
+
+Formato:  SG1.<evento_id>.<tipo en base64url>.<UUID en hex>.<firma>
+
+La firma es un HMAC-SHA256 truncado (96 bits) con una clave derivada por evento a partir de
+settings.QR_SIGNING_KEY (o SECRET_KEY si no está definida). Así un código falsificado,
+mal digitado o de otro evento se rechaza sin consultar la base de datos. La clave nunca sale
+del servidor: los escáneres offline reciben en su manifiesto solo la firma de cada código
+(ver firma_codigo), que les permite comprobar un contenido escaneado pero no firmar otros.
+
+Los QRs con el UUID "desnudo" siguen siendo válidos: la firma es opcional y se activa
+para los nuevos envíos con settings.QR_PAYLOAD_FIRMADO.
+"""
+import base64
+import hashlib
+import hmac
+import uuid
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+PREFIJO = 'SG1'
+
+# Caracteres base64url de la firma que se conservan (16 caracteres = 96 bits)
+LONGITUD_FIRMA = 16
+
+
+def _b64(datos):
+    return base64.urlsafe_b64encode(datos).rstrip(b'=').decode('ascii')
+
+
+def _desde_b64(texto):
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+def clave_evento(evento_id):
+    """Clave HMAC del evento, derivada de la clave maestra de la aplicación."""
+    secreto = getattr(settings, 'QR_SIGNING_KEY', '') or settings.SECRET_KEY
+    return salted_hmac('sigue.qr.evento', str(evento_id), secret=secreto, algorithm='sha256').digest()
+
+
+def _firma(evento_id, tipo_b64, codigo_hex, clave=None):
+    mensaje = f'{PREFIJO}.{evento_id}.{tipo_b64}.{codigo_hex}'.encode('utf-8')
+    digest = hmac.new(clave or clave_evento(evento_id), mensaje, hashlib.sha256).digest()
+    return _b64(digest)[:LONGITUD_FIRMA]
+
+
+def firmar(evento_id, tipo, codigo):
+    """Construye el contenido firmado de un QR."""
+    tipo_b64 = _b64(tipo.encode('utf-8'))
+    codigo_hex = uuid.UUID(str(codigo)).hex
+    return f'{PREFIJO}.{evento_id}.{tipo_b64}.{codigo_hex}.{_firma(evento_id, tipo_b64, codigo_hex)}'
+
+
+def firma_codigo(evento_id, tipo, codigo, clave=None):
+    """
+    Firma (último segmento del contenido firmado) de un código, para el manifiesto offline.
+    'clave' evita derivar la clave del evento en cada código al firmar muchos.
+    """
+    return _firma(evento_id, _b64(tipo.encode('utf-8')), uuid.UUID(str(codigo)).hex, clave)
+
+
+def contenido_qr(qr):
+    """
+    Texto que se codifica en la imagen del QR: el contenido firmado si está activado
+    (y el QR pertenece a un evento) o el UUID tradicional.
+    """
+    if getattr(settings, 'QR_PAYLOAD_FIRMADO', False) and qr.evento_id:
+        return firmar(qr.evento_id, qr.tipo_comida, qr.codigo)
+    return str(qr.codigo)
+
+
+def es_firmado(texto):
+    """Indica si el texto escaneado tiene el formato de contenido firmado."""
+    return str(texto).startswith(f'{PREFIJO}.')
+
+
+def verificar(texto):
+    """
+    Verifica un contenido firmado sin acceder a la base de datos.
+
+    Returns:
+        dict: {'evento_id': int, 'tipo': str, 'codigo': UUID} o None si está mal formado
+              o la firma no coincide.
+    """
+    partes = str(texto).strip().split('.')
+    if len(partes) != 5 or partes[0] != PREFIJO:
+        return None
+
+    _, evento_id, tipo_b64, codigo_hex, firma = partes
+    if not evento_id.isdigit():
+        return None
+
+    if not constant_time_compare(firma, _firma(evento_id, tipo_b64, codigo_hex)):
+        return None
+
+    try:
+        return {
+            'evento_id': int(evento_id),
+            'tipo': _desde_b64(tipo_b64).decode('utf-8'),
+            'codigo': uuid.UUID(hex=codigo_hex),
+        }
+    except (ValueError, UnicodeDecodeError):
+        return None
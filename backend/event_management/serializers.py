@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Asistente, CodigoQR, Evento, Inscripcion
+from .models import Asistente, CodigoQR, Evento, Inscripcion, TrabajoEnvio
 from users.serializers import UserSerializer
 
 class AsistenteSerializer(serializers.ModelSerializer):
@@ -39,9 +39,18 @@ class EventoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Evento
         fields = ['id', 'titulo', 'descripcion', 'fecha', 'fecha_fin', 'lugar', 'creado_por', 'creado_por_nombre', 'fecha_creacion', 'ya_inscrito',
-                 'flyer', 'requiere_refrigerio', 'cantidad_refrigerios', 'detalles_refrigerios', 'asistencia_qr', 'estado']
+                 'flyer', 'requiere_refrigerio', 'cantidad_refrigerios', 'detalles_refrigerios', 'asistencia_qr', 'estado',
+                 'diseno_certificado']
         read_only_fields = ['creado_por', 'fecha_creacion', 'estado']
 
+    def validate_diseno_certificado(self, value):
+        from .certificados import diseno_evento
+        try:
+            diseno_evento(self.instance, value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
     def get_ya_inscrito(self, obj):
         """Verifica si el usuario que hace la petición está inscrito en este evento."""
         request = self.context.get('request')
@@ -60,3 +69,17 @@ class InscripcionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Inscripcion
         fields = ['id', 'evento', 'evento_titulo', 'usuario', 'fecha_inscripcion', 'asistio']
+
+class TrabajoEnvioSerializer(serializers.ModelSerializer):
+    """
+    Serializador del avance de un trabajo de envío masivo (enviados/fallidos/restantes y velocidad).
+    """
+    evento_titulo = serializers.CharField(source='evento.titulo', read_only=True)
+    restantes = serializers.IntegerField(read_only=True)
+    correos_por_minuto = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = TrabajoEnvio
+        fields = ['id', 'evento', 'evento_titulo', 'tipo', 'estado', 'solo_fallidos', 'total', 'procesados', 'enviados',
+                  'fallidos', 'omitidos', 'restantes', 'correos_por_minuto', 'errores', 'fecha_creacion', 'fecha_inicio',
+                  'fecha_fin']
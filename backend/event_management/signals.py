@@ -0,0 +1,32 @@
+"""
+Señales que descuentan los contadores de estadísticas (ContadorEvento) al borrar códigos QR e
+inscripciones: uno a uno, con QuerySet.delete(), en cascada (usuario, asistente) o desde el admin.
+
+Cada código se resta en post_delete (dentro de la misma transacción del borrado) de la fila en
+la que se sumó al emitirse (CodigoQR.dependencia_contador), aunque su dueño haya cambiado de
+dependencia. Si lo que se borra es el evento, sus contadores se borran en cascada y no se
+descuenta nada.
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import CodigoQR, ContadorEvento, Evento, Inscripcion
+
+
+def _borra_evento(origin):
+    """True si el borrado se originó en un evento (o un queryset de eventos)."""
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return modelo is Evento
+
+
+@receiver(post_delete, sender=CodigoQR)
+def descontar_qr(sender, instance, origin=None, **kwargs):
+    if instance.evento_id and not _borra_evento(origin):
+        ContadorEvento.sumar({instance.clave_contador(): (-1, -int(instance.usado))})
+
+
+@receiver(post_delete, sender=Inscripcion)
+def descontar_inscripcion(sender, instance, origin=None, **kwargs):
+    if not _borra_evento(origin):
+        ContadorEvento.sumar({(instance.evento_id, ContadorEvento.INSCRIPCION, ''): (-1, 0)})
@@ -0,0 +1,139 @@
+"""
+Servidor SMTP local mínimo para benchmarks y pruebas de envío masivo.
+
+Acepta EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP y QUIT sin entregar nada: solo cuenta
+conexiones y mensajes. Permite simular el costo de un proveedor real:
+
+    latencia_conexion:  espera antes del saludo (TCP + STARTTLS + login de un servidor remoto)
+    latencia:           espera antes de cada respuesta (ida y vuelta de red)
+    max_por_conexion:   cierra la conexión tras N mensajes (como los límites por sesión de Gmail)
+    fallos_temporales:  responde 451 (reintentar más tarde) a los primeros N MAIL FROM
+
+Uso:
+    with ServidorSMTPLocal(latencia=0.01) as servidor:
+        conexion = get_connection('django.core.mail.backends.smtp.EmailBackend',
+                                  host=servidor.host, port=servidor.port, use_tls=False)
+"""
+import socketserver
+import threading
+import time
+
+
+class _ManejadorSMTP(socketserver.StreamRequestHandler):
+
+    def _responder(self, linea):
+        if self.server.latencia:
+            time.sleep(self.server.latencia)
+        self.wfile.write(f'{linea}\r\n'.encode('ascii'))
+
+    def handle(self):
+        try:
+            self._atender()
+        except (ConnectionError, BrokenPipeError):
+            # El cliente cerró la conexión sin QUIT
+            pass
+
+    def _atender(self):
+        servidor = self.server
+        with servidor.candado:
+            servidor.conexiones += 1
+            servidor.activas += 1
+            servidor.max_simultaneas = max(servidor.max_simultaneas, servidor.activas)
+        try:
+            self._sesion()
+        finally:
+            with servidor.candado:
+                servidor.activas -= 1
+
+    def _sesion(self):
+        servidor = self.server
+        if servidor.latencia_conexion:
+            time.sleep(servidor.latencia_conexion)
+        self._responder('220 localhost SMTP local')
+
+        mensajes = 0
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode('latin-1').strip()
+            verbo = comando.split(' ', 1)[0].upper()
+
+            if verbo == 'EHLO':
+                self.wfile.write(b'250-localhost\r\n250-AUTH PLAIN LOGIN\r\n')
+                self._responder('250 8BITMIME')
+            elif verbo == 'AUTH':
+                self._responder('235 2.7.0 Autenticado')
+            elif verbo == 'MAIL' and servidor.consumir_fallo():
+                self._responder('451 4.7.1 Intente mas tarde')
+            elif verbo in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self._responder('250 OK')
+            elif verbo == 'DATA':
+                self._responder('354 Fin con <CRLF>.<CRLF>')
+                while True:
+                    datos = self.rfile.readline()
+                    if not datos or datos == b'.\r\n':
+                        break
+                mensajes += 1
+                with servidor.candado:
+                    servidor.mensajes += 1
+                self._responder('250 OK encolado')
+                if servidor.max_por_conexion and mensajes >= servidor.max_por_conexion:
+                    return
+            elif verbo == 'QUIT':
+                self._responder('221 Hasta luego')
+                return
+            else:
+                self._responder('502 Comando no implementado')
+
+
+class ServidorSMTPLocal(socketserver.ThreadingTCPServer):
+    """Servidor SMTP en un hilo de fondo (puerto libre asignado por el sistema)."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latencia=0.0, latencia_conexion=0.0, max_por_conexion=None, fallos_temporales=0,
+                 host='127.0.0.1', port=0):
+        super().__init__((host, port), _ManejadorSMTP)
+        self.latencia = latencia
+        self.latencia_conexion = latencia_conexion
+        self.max_por_conexion = max_por_conexion
+        self.fallos_temporales = fallos_temporales
+        self.candado = threading.Lock()
+        self.conexiones = 0
+        self.activas = 0
+        self.max_simultaneas = 0
+        self.mensajes = 0
+        self.rechazos = 0
+        self._hilo = None
+
+    def consumir_fallo(self):
+        """Indica si el próximo MAIL FROM debe rechazarse con un 4xx."""
+        with self.candado:
+            if self.rechazos < self.fallos_temporales:
+                self.rechazos += 1
+                return True
+            return False
+
+    @property
+    def host(self):
+        return self.server_address[0]
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
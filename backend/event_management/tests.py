@@ -1,3 +1,1200 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from PyPDF2 import PdfReader
+from django.conf import settings
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+from . import en_vivo, estadisticas, jobs, pdf_objetos, qr_cache, qr_images, qr_signing, utils
+from .mail_dispatch import DespachadorCorreos, LimitadorTasa, MotorEnvio
+from .models import Asistente, CodigoQR, ContadorEvento, CorreoSaliente, Evento, Inscripcion, TrabajoEnvio
+from .smtp_local import ServidorSMTPLocal
+
+
+def crear_evento_con_inscrito(id_usuario='1001'):
+    """Crea un evento aprobado con un usuario inscrito y su QR de ENTRADA."""
+    usuario = CustomUser.objects.create_user(id=id_usuario, password='clave123', full_name='Ana Gómez', dependency='contaduría')
+    evento = Evento.objects.create(titulo='Congreso', fecha='2026-03-01T08:00:00Z', lugar='Auditorio', estado='APROBADO')
+    Inscripcion.objects.create(evento=evento, usuario=usuario)
+    qr = CodigoQR.objects.create(evento=evento, usuario=usuario, tipo_comida='ENTRADA')
+    return evento, usuario, qr
+
+
+class EscanearTests(TestCase):
+    """Pruebas del endpoint de escaneo /api/qr/escanear/."""
+
+    def setUp(self):
+        self.evento, self.usuario, self.qr = crear_evento_con_inscrito()
+        self.staff = CustomUser.objects.create_user(id='9000', password='clave123', full_name='Staff', role='Asistente')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        cache.clear()
+
+    def test_redime_y_marca_asistencia(self):
+        response = self.client.post('/api/qr/escanear/', {'codigo': str(self.qr.codigo)}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertEqual(response.data['asistente']['identificacion'], self.usuario.id)
+        self.qr.refresh_from_db()
+        self.assertTrue(self.qr.usado)
+        self.assertTrue(Inscripcion.objects.get(evento=self.evento, usuario=self.usuario).asistio)
+
+    def test_segundo_escaneo_rechazado(self):
+        self.client.post('/api/qr/escanear/', {'codigo': str(self.qr.codigo)}, format='json')
+        response = self.client.post('/api/qr/escanear/', {'codigo': str(self.qr.codigo)}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['status'], 'error')
+
+    def test_marcar_como_usado_con_instancia_obsoleta(self):
+        # Dos estaciones leyeron el QR antes de que cualquiera lo redimiera
+        lectura_a = CodigoQR.objects.get(pk=self.qr.pk)
+        lectura_b = CodigoQR.objects.get(pk=self.qr.pk)
+
+        self.assertTrue(lectura_a.marcar_como_usado())
+        self.assertFalse(lectura_b.marcar_como_usado())
+
+    def test_escanear_lote(self):
+        otro = CodigoQR.objects.create(evento=self.evento, usuario=self.usuario, tipo_comida='REFRIGERIO')
+        otro.marcar_como_usado()
+        escaneos = [
+            {'codigo': str(self.qr.codigo), 'fecha_escaneo': '2026-03-01T08:05:00-05:00'},
+            {'codigo': str(otro.codigo), 'fecha_escaneo': '2026-03-01T08:06:00-05:00'},
+            {'codigo': '00000000-0000-0000-0000-000000000000'},
+            {'codigo': 'no-es-un-uuid'},
+        ]
+
+        response = self.client.post('/api/qr/escanear_lote/', {'escaneos': escaneos}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        estados = [item['status'] for item in response.data['resultados']]
+        self.assertEqual(estados, ['success', 'usado', 'desconocido', 'desconocido'])
+        self.assertEqual(response.data['resultados'][0]['asistente'], self.qr.datos_asistente())
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.fecha_uso.isoformat(), '2026-03-01T13:05:00+00:00')
+        self.assertTrue(Inscripcion.objects.get(evento=self.evento, usuario=self.usuario).asistio)
+
+    def test_evento_precargado_responde_sin_bd(self):
+        qr_cache.calentar_evento(self.evento)
+        datos = {'codigo': str(self.qr.codigo), 'evento': self.evento.pk}
+
+        # La redención solo escribe: código, contador y asistencia (sin consultas de lectura)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post('/api/qr/escanear/', datos, format='json')
+        sentencias = [q['sql'].split()[0].upper() for q in consultas.captured_queries]
+        self.assertNotIn('SELECT', sentencias)
+        self.assertEqual(sentencias.count('UPDATE'), 3)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertEqual(response.data['asistente'], self.qr.datos_asistente())
+        self.assertTrue(qr_cache.obtener(self.qr.codigo)['usado'])
+
+        with self.assertNumQueries(0):
+            usado = self.client.post('/api/qr/escanear/', datos, format='json')
+            desconocido = self.client.post(
+                '/api/qr/escanear/', {'codigo': str(uuid.uuid4()), 'evento': self.evento.pk}, format='json'
+            )
+        self.assertEqual(usado.status_code, 400)
+        self.assertEqual(desconocido.status_code, 404)
+
+    def test_payload_firmado(self):
+        firmado = qr_signing.firmar(self.evento.pk, 'ENTRADA', self.qr.codigo)
+        alterado = firmado[:-1] + ('A' if firmado[-1] != 'A' else 'B')
+
+        with self.assertNumQueries(0):
+            invalido = self.client.post('/api/qr/escanear/', {'codigo': alterado}, format='json')
+            otro_evento = self.client.post(
+                '/api/qr/escanear/', {'codigo': firmado, 'evento': self.evento.pk + 1}, format='json'
+            )
+        self.assertEqual(invalido.status_code, 404)
+        self.assertEqual(otro_evento.status_code, 404)
+
+        response = self.client.post('/api/qr/escanear/', {'codigo': firmado, 'evento': self.evento.pk}, format='json')
+        self.assertEqual(response.data['status'], 'success')
+
+    def test_cedula_limitada_a_evento_y_tipo(self):
+        otro_evento = Evento.objects.create(titulo='Otro', fecha='2026-04-01T08:00:00Z', lugar='Sala', estado='APROBADO')
+        CodigoQR.objects.create(evento=otro_evento, usuario=self.usuario, tipo_comida='ENTRADA')
+        refrigerio = CodigoQR.objects.create(evento=self.evento, usuario=self.usuario, tipo_comida='REFRIGERIO')
+
+        response = self.client.post(
+            '/api/qr/escanear/', {'codigo': self.usuario.id, 'evento': self.evento.pk, 'tipo': 'REFRIGERIO'}, format='json'
+        )
+
+        self.assertEqual(response.data['status'], 'success')
+        self.assertEqual(response.data['tipo'], 'REFRIGERIO')
+        refrigerio.refresh_from_db()
+        self.assertTrue(refrigerio.usado)
+        self.assertFalse(CodigoQR.objects.filter(evento=otro_evento, usado=True).exists())
+
+
+class GenerarQRsMasivoTests(TestCase):
+    """Generación masiva de QRs como operación de conjuntos."""
+
+    def test_genera_solo_los_faltantes(self):
+        evento, usuario, _ = crear_evento_con_inscrito()
+        evento.detalles_refrigerios = {'items': ['DESAYUNO', 'ALMUERZO']}
+        evento.save()
+        otro = CustomUser.objects.create_user(id='1002', password='clave123', full_name='Luis Díaz')
+        Inscripcion.objects.create(evento=evento, usuario=otro)
+        client = APIClient()
+        client.force_authenticate(usuario)
+
+        primera = client.post(f'/api/eventos/{evento.pk}/generar_qrs_masivo/')
+        segunda = client.post(f'/api/eventos/{evento.pk}/generar_qrs_masivo/')
+
+        self.assertEqual(primera.data['generados'], 5)
+        self.assertEqual(segunda.data['generados'], 0)
+        self.assertEqual(segunda.data['message'], 'Se generaron 0 códigos QR nuevos.')
+        self.assertEqual(CodigoQR.objects.filter(evento=evento).count(), 6)
+
+
+class ImagenQRTests(TestCase):
+    """Endpoint de imágenes QR servidas desde la caché por contenido."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        _, self.usuario, self.qr = crear_evento_con_inscrito()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_imagen_qr_con_etag(self):
+        url = f'/api/qr/{self.qr.pk}/generar_imagen/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        revalidacion = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidacion.status_code, 304)
+        self.assertEqual(self.client.get(url, {'formato': 'svg'})['Content-Type'], 'image/svg+xml')
+
+    def test_escarapelas_pdf(self):
+        from PyPDF2 import PdfReader
+
+        for i in range(8):
+            CodigoQR.objects.create(evento=self.qr.evento, usuario=self.usuario, tipo_comida=f'REFRIGERIO {i}')
+
+        response = self.client.get(f'/api/eventos/{self.qr.evento_id}/escarapelas_pdf/', {'columnas': 2, 'filas': 4})
+
+        self.assertEqual(response.status_code, 200)
+        pdf = PdfReader(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(pdf.pages), 2)
+        self.assertIn('ANA GÓMEZ', pdf.pages[0].extract_text())
+
+
+class PrerenderizarQRsTests(TestCase):
+    """Comando prerenderizar_qrs: llena la caché de disco que luego sirve obtener_imagen_qr."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        # El LRU en memoria es por proceso: se vacía para que la lectura pase por el disco
+        qr_images._obtener.cache_clear()
+        self.addCleanup(qr_images._obtener.cache_clear)
+
+        self.evento, self.usuario, self.qr = crear_evento_con_inscrito()
+        CodigoQR.objects.create(evento=self.evento, usuario=self.usuario, tipo_comida='REFRIGERIO')
+
+    def test_prerenderiza_y_se_sirve_sin_renderizar(self):
+        salida = StringIO()
+        call_command('prerenderizar_qrs', self.evento.pk, '--procesos', '1', stdout=salida)
+        self.assertIn('Renderizadas: 2', salida.getvalue())
+
+        contenidos = [qr_signing.contenido_qr(qr) for qr in CodigoQR.objects.filter(evento=self.evento)]
+        for contenido in contenidos:
+            ruta = qr_images.ruta_imagen(qr_images.clave_imagen(contenido))
+            self.assertTrue(os.path.exists(ruta))
+
+        with mock.patch.object(qr_images, 'renderizar_qr', side_effect=AssertionError('no debe renderizar')):
+            for contenido in contenidos:
+                datos, clave = qr_images.obtener_imagen_qr(contenido)
+                with open(qr_images.ruta_imagen(clave), 'rb') as archivo:
+                    self.assertEqual(datos, archivo.read())
+
+        # Una segunda ejecución no vuelve a renderizar lo que ya está en disco
+        salida = StringIO()
+        call_command('prerenderizar_qrs', self.evento.pk, '--procesos', '1', stdout=salida)
+        self.assertIn('Renderizadas: 0. Ya existentes: 2', salida.getvalue())
+
+    def test_evento_inexistente(self):
+        with self.assertRaises(CommandError):
+            call_command('prerenderizar_qrs', 999999, stdout=StringIO())
+
+
+class ManifiestoTests(TestCase):
+    """Manifiesto offline y sincronización delta de escáneres."""
+
+    def setUp(self):
+        self.evento, self.usuario, self.qr = crear_evento_con_inscrito()
+        self.refrigerio = CodigoQR.objects.create(evento=self.evento, usuario=self.usuario, tipo_comida='REFRIGERIO')
+        self.staff = CustomUser.objects.create_user(id='9000', password='clave123', full_name='Staff', role='Asistente')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_manifiesto_requiere_rol_de_escaner(self):
+        self.client.force_authenticate(self.usuario)
+        response = self.client.get(f'/api/eventos/{self.evento.pk}/manifiesto/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_docente_solo_descarga_el_manifiesto_de_sus_eventos(self):
+        docente = CustomUser.objects.create_user(id='9100', password='clave123', full_name='Docente', role='Docente')
+        self.client.force_authenticate(docente)
+        self.assertEqual(self.client.get(f'/api/eventos/{self.evento.pk}/manifiesto/').status_code, 403)
+        respuesta = self.client.post(
+            f'/api/eventos/{self.evento.pk}/sincronizar_manifiesto/', {'version': 0, 'redenciones': []}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 403)
+
+        self.evento.creado_por = docente
+        self.evento.save()
+        self.assertEqual(self.client.get(f'/api/eventos/{self.evento.pk}/manifiesto/').status_code, 200)
+
+    def test_manifiesto_comprimido(self):
+        response = self.client.get(f'/api/eventos/{self.evento.pk}/manifiesto/')
+
+        self.assertEqual(response.status_code, 200)
+        manifiesto = json.loads(gzip.decompress(response.content))
+        self.assertEqual(manifiesto['version'], int(response['X-Manifiesto-Version']))
+        self.assertEqual(manifiesto['codigos'], [self.qr.codigo.hex, self.refrigerio.codigo.hex])
+        self.assertEqual([manifiesto['tipos'][i] for i in manifiesto['tipo']], ['ENTRADA', 'REFRIGERIO'])
+        self.assertEqual(manifiesto['personas'], [[self.usuario.id, self.usuario.full_name]])
+
+    def test_manifiesto_verifica_sin_la_clave_del_evento(self):
+        contenido = gzip.decompress(self.client.get(f'/api/eventos/{self.evento.pk}/manifiesto/').content)
+        manifiesto = json.loads(contenido)
+
+        clave = base64.urlsafe_b64encode(qr_signing.clave_evento(self.evento.pk)).rstrip(b'=')
+        self.assertNotIn(clave, contenido)
+        self.assertNotIn('clave_firma', manifiesto)
+        # La firma de cada código basta para comprobar su contenido firmado
+        for indice, qr in enumerate([self.qr, self.refrigerio]):
+            firmado = qr_signing.firmar(self.evento.pk, qr.tipo_comida, qr.codigo)
+            self.assertEqual(firmado.rsplit('.', 1)[1], manifiesto['firma'][indice])
+
+    def test_sincronizar_conflicto_gana_fecha_mas_temprana(self):
+        # El refrigerio no cambia después del manifiesto: no debe aparecer en el delta
+        CodigoQR.objects.filter(pk=self.refrigerio.pk).update(fecha_actualizacion=timezone.now() - timedelta(minutes=5))
+        version = json.loads(gzip.decompress(
+            self.client.get(f'/api/eventos/{self.evento.pk}/manifiesto/').content
+        ))['version']
+        # Otro dispositivo sincronizó antes un escaneo posterior del mismo código
+        self.qr.marcar_como_usado()
+
+        response = self.client.post(f'/api/eventos/{self.evento.pk}/sincronizar_manifiesto/', {
+            'version': version,
+            'redenciones': [{'codigo': str(self.qr.codigo), 'fecha_escaneo': '2026-03-01T08:00:00Z'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['resultados'][0]['status'], 'conflicto_ganado')
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.fecha_uso.isoformat(), '2026-03-01T08:00:00+00:00')
+        self.assertEqual(response.data['cambios']['codigos'], [self.qr.codigo.hex])
+
+    def test_sincronizar_conflicto_perdido(self):
+        # Otro dispositivo ya sincronizó un escaneo anterior: la redención de este no cuenta
+        self.qr.marcar_como_usado(timezone.make_aware(timezone.datetime(2026, 3, 1, 8, 0), timezone.get_fixed_timezone(0)))
+
+        response = self.client.post(f'/api/eventos/{self.evento.pk}/sincronizar_manifiesto/', {
+            'version': 0,
+            'redenciones': [{'codigo': str(self.qr.codigo), 'fecha_escaneo': '2026-03-01T08:10:00Z'}],
+        }, format='json')
+
+        self.assertEqual(response.data['resultados'][0]['status'], 'usado')
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.fecha_uso.isoformat(), '2026-03-01T08:00:00+00:00')
+
+
+class EnvioEmailsTests(TestCase):
+    """Pruebas del envío de correos en segundo plano (TrabajoEnvio + procesar_envios)."""
+
+    def setUp(self):
+        # Los correos adjuntan imágenes QR, que se guardan en la caché de disco
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.evento, self.usuario, self.qr = crear_evento_con_inscrito()
+        self.usuario.email = 'ana@example.com'
+        self.usuario.save()
+        otro = CustomUser.objects.create_user(id='1002', password='clave123', full_name='Luis Pérez')
+        Inscripcion.objects.create(evento=self.evento, usuario=otro)  # sin email: no cuenta
+        self.admin = CustomUser.objects.create_user(id='9001', password='clave123', full_name='Admin', role='Administrador')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_trabajos_y_errores_solo_para_admin_o_creador(self):
+        response = self.client.post(f'/api/eventos/{self.evento.id}/enviar_emails_evento/')
+        trabajo_id = response.data['trabajo_id']
+
+        self.client.force_authenticate(self.usuario)
+        self.assertEqual(self.client.get('/api/trabajos/').data['count'], 0)
+        self.assertEqual(self.client.get(f'/api/trabajos/{trabajo_id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/eventos/{self.evento.id}/errores_envio/').status_code, 403)
+
+        self.evento.creado_por = self.usuario
+        self.evento.save()
+        self.assertEqual(self.client.get('/api/trabajos/').data['count'], 1)
+        self.assertEqual(self.client.get(f'/api/eventos/{self.evento.id}/errores_envio/').status_code, 200)
+
+    def test_reenvio_a_asistente_usa_el_motor_compartido(self):
+        asistente = Asistente.objects.create(identificacion='5001', nombre_completo='Marta Ruiz', correo='marta@example.com')
+        CodigoQR.objects.create(evento=self.evento, asistente=asistente, tipo_comida='ENTRADA')
+
+        with mock.patch.object(DespachadorCorreos, 'intentar', autospec=True, side_effect=DespachadorCorreos.intentar) as intentar:
+            response = self.client.post(f'/api/asistentes/{asistente.id}/enviar_qr_correo/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(intentar.call_count, 1)
+        self.assertEqual(mail.outbox[-1].to, ['marta@example.com'])
+
+    def test_encola_y_procesa_trabajo(self):
+        response = self.client.post(f'/api/eventos/{self.evento.id}/enviar_emails_evento/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['trabajo']['estado'], 'PENDIENTE')
+        self.assertEqual(response.data['trabajo']['total'], 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Un segundo clic mientras está pendiente reutiliza el mismo trabajo
+        repetido = self.client.post(f'/api/eventos/{self.evento.id}/enviar_emails_evento/')
+        self.assertEqual(repetido.data['trabajo_id'], response.data['trabajo_id'])
+
+        call_command('procesar_envios', '--una-vez', stdout=StringIO())
+
+        avance = self.client.get(f"/api/trabajos/{response.data['trabajo_id']}/")
+        self.assertEqual(avance.data['estado'], 'COMPLETADO')
+        self.assertEqual(avance.data['enviados'], 1)
+        self.assertEqual(avance.data['fallidos'], 0)
+        self.assertEqual(avance.data['restantes'], 0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+
+    def test_retoma_trabajo_abandonado(self):
+        trabajo = TrabajoEnvio.objects.create(
+            evento=self.evento, creado_por=self.admin, total=1, estado='EN_PROCESO',
+            trabajador='otro-host:1', fecha_latido=timezone.now() - timedelta(minutes=10)
+        )
+
+        call_command('procesar_envios', '--una-vez', stdout=StringIO())
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'COMPLETADO')
+        self.assertEqual(trabajo.enviados, 1)
+        self.assertNotEqual(trabajo.trabajador, 'otro-host:1')
+
+    @override_settings(EMAIL_HILOS_ENVIO=1)
+    def test_retomado_por_otro_no_envia_lo_encolado(self):
+        for i in range(10):
+            otro = CustomUser.objects.create_user(
+                id=f'30{i}', password='clave123', full_name=f'Persona {i}', email=f'r{i}@example.com'
+            )
+            Inscripcion.objects.create(evento=self.evento, usuario=otro)
+            CodigoQR.objects.create(evento=self.evento, usuario=otro, tipo_comida='ENTRADA')
+        trabajo = TrabajoEnvio.objects.get(pk=jobs.encolar_envio(self.evento, self.admin)[0].pk)
+
+        intentar_original = DespachadorCorreos.intentar
+
+        def lento(despachador, mensaje):
+            time.sleep(0.05)
+            return intentar_original(despachador, mensaje)
+
+        # Al guardar el primer lote, otro trabajador ya tomó el trabajo
+        with mock.patch.object(jobs, 'TAMANO_LOTE', 2), \
+                mock.patch.object(jobs, '_guardar_avance', return_value=False), \
+                mock.patch.object(DespachadorCorreos, 'intentar', autospec=True, side_effect=lento):
+            jobs.procesar_trabajo(trabajo)
+
+        # Los 2 del lote y, a lo sumo, el que estaba en curso; no los 4 encolados detrás
+        self.assertLessEqual(len(mail.outbox), 3)
+        self.assertEqual(CorreoSaliente.objects.filter(estado='ENVIADO').count(), 2)
+
+    def test_una_consulta_de_qrs_por_envio(self):
+        for i in range(5):
+            otro = CustomUser.objects.create_user(
+                id=f'20{i}', password='clave123', full_name=f'Persona {i}', email=f'p{i}@example.com'
+            )
+            Inscripcion.objects.create(evento=self.evento, usuario=otro)
+            CodigoQR.objects.create(evento=self.evento, usuario=otro, tipo_comida='ENTRADA')
+            CodigoQR.objects.create(evento=self.evento, usuario=otro, tipo_comida='ALMUERZO')
+        self.client.post(f'/api/eventos/{self.evento.id}/enviar_emails_evento/')
+
+        with CaptureQueriesContext(connection) as consultas:
+            call_command('procesar_envios', '--una-vez', stdout=StringIO())
+
+        consultas_qr = [q['sql'] for q in consultas.captured_queries
+                        if 'FROM "event_management_codigoqr"' in q['sql'] and q['sql'].startswith('SELECT')]
+        self.assertEqual(len(consultas_qr), 1)
+        self.assertEqual(len(mail.outbox), 6)
+
+        correo = next(m for m in mail.outbox if m.to == ['p3@example.com'])
+        html = correo.alternatives[0][0]
+        self.assertIn('¡Hola Persona 3!', html)
+        self.assertIn('Congreso', html)
+        self.assertIn('ALMUERZO', html)
+        self.assertEqual(html.count('class="qr-section"'), 2)
+        self.assertEqual(len(correo.attachments), 2)
+
+    def test_repetir_envio_omite_entregados_y_reenvia_fallidos(self):
+        otro = CustomUser.objects.create_user(id='1003', password='clave123', full_name='Marta Ruiz', email='marta@example.com')
+        Inscripcion.objects.create(evento=self.evento, usuario=otro)
+        CodigoQR.objects.create(evento=self.evento, usuario=otro, tipo_comida='ENTRADA')
+
+        intentar_original = DespachadorCorreos.intentar
+
+        def falla_para_marta(despachador, mensaje):
+            if mensaje.to == ['marta@example.com']:
+                raise smtplib.SMTPRecipientsRefused({'marta@example.com': (550, b'Buzon no disponible')})
+            return intentar_original(despachador, mensaje)
+
+        with mock.patch.object(DespachadorCorreos, 'intentar', autospec=True, side_effect=falla_para_marta):
+            self.client.post(f'/api/eventos/{self.evento.id}/enviar_emails_evento/')
+            call_command('procesar_envios', '--una-vez', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+        errores = self.client.get(f'/api/eventos/{self.evento.id}/errores_envio/')
+        self.assertEqual(errores.data['error_count'], 1)
+        self.assertIn('marta@example.com', errores.data['error_details'][0])
+
+        # El reenvío solo incluye a quien falló
+        response = self.client.post(f'/api/eventos/{self.evento.id}/reenviar_fallidos/')
+        self.assertEqual(response.data['trabajo']['total'], 1)
+        call_command('procesar_envios', '--una-vez', stdout=StringIO())
+        self.assertEqual([m.to for m in mail.outbox], [['ana@example.com'], ['marta@example.com']])
+
+        # Repetir el envío completo no vuelve a escribirle a quien ya lo recibió
+        self.client.post(f'/api/eventos/{self.evento.id}/enviar_emails_evento/')
+        call_command('procesar_envios', '--una-vez', stdout=StringIO())
+        trabajo = TrabajoEnvio.objects.first()
+        self.assertEqual((trabajo.enviados, trabajo.omitidos), (0, 2))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(CorreoSaliente.objects.filter(estado='FALLIDO').exists())
+        self.assertEqual(
+            self.client.post(f'/api/eventos/{self.evento.id}/reenviar_fallidos/').status_code, 400
+        )
+
+
+class DespachadorCorreosTests(TestCase):
+    """Reutilización de la conexión SMTP contra el servidor SMTP local."""
+
+    def _enviar(self, servidor, cantidad, **opciones):
+        mensajes = [EmailMessage(f'Prueba {i}', 'Hola', 'noreply@example.com', [f'a{i}@example.com']) for i in range(cantidad)]
+        with DespachadorCorreos(
+            backend='django.core.mail.backends.smtp.EmailBackend', host=servidor.host, port=servidor.port,
+            username='', password='', use_tls=False, use_ssl=False, **opciones
+        ) as despachador:
+            for mensaje in mensajes:
+                despachador.intentar(mensaje)
+
+    def test_limita_mensajes_por_conexion(self):
+        with ServidorSMTPLocal() as servidor:
+            self._enviar(servidor, 7, max_por_conexion=3)
+
+        self.assertEqual(servidor.mensajes, 7)
+        self.assertEqual(servidor.conexiones, 3)
+
+    def test_reconecta_si_el_servidor_corta(self):
+        # El servidor cierra la sesión cada 2 mensajes sin avisar
+        with ServidorSMTPLocal(max_por_conexion=2) as servidor:
+            self._enviar(servidor, 5, max_por_conexion=100)
+
+        self.assertEqual(servidor.mensajes, 5)
+        self.assertEqual(servidor.conexiones, 3)
+
+
+class MotorEnvioTests(TestCase):
+    """Motor de envío concurrente con límite de tasa, contra el servidor SMTP local con latencia."""
+
+    def _mensajes(self, cantidad):
+        return [
+            (EmailMessage(f'Prueba {i}', 'Hola', 'noreply@example.com', [f'a{i}@example.com']), i)
+            for i in range(cantidad)
+        ]
+
+    def _motor(self, servidor, **opciones):
+        return MotorEnvio(
+            backend='django.core.mail.backends.smtp.EmailBackend', host=servidor.host, port=servidor.port,
+            username='', password='', use_tls=False, use_ssl=False, **opciones
+        )
+
+    def test_envia_en_paralelo_y_en_orden(self):
+        with ServidorSMTPLocal(latencia=0.01) as servidor:
+            with self._motor(servidor, hilos=4, limitador=LimitadorTasa()) as motor:
+                resultados = list(motor.mapear(self._mensajes(24)))
+
+        self.assertEqual(resultados, [(i, True) for i in range(24)])
+        self.assertEqual(servidor.mensajes, 24)
+        # Una conexión reutilizable por hilo
+        self.assertLessEqual(servidor.conexiones, 4)
+        self.assertGreater(servidor.max_simultaneas, 1)
+
+    def test_reintenta_ante_respuestas_4xx(self):
+        limitador = LimitadorTasa(por_segundo=100)
+        with ServidorSMTPLocal(latencia=0.005, fallos_temporales=3) as servidor:
+            with self._motor(servidor, hilos=2, limitador=limitador, espera_base=0.01) as motor:
+                resultados = [resultado for _, resultado in motor.mapear(self._mensajes(6))]
+
+        self.assertEqual(resultados, [True] * 6)
+        self.assertEqual(servidor.rechazos, 3)
+        self.assertEqual(servidor.mensajes, 6)
+        # La tasa bajó con los 4xx y se recupera de a poco con los envíos exitosos
+        self.assertLess(limitador.tasa, 100)
+
+    def test_limitador_respeta_la_tasa(self):
+        limitador = LimitadorTasa(por_segundo=50, rafaga=1)
+        inicio = time.monotonic()
+        for _ in range(11):
+            limitador.tomar()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.19)
+
+
+class CertificadoPlantillaTests(TestCase):
+    """Certificados generados desde la plantilla precompilada (caché por proceso)."""
+
+    def setUp(self):
+        descriptor, self.ruta = tempfile.mkstemp(suffix='.pdf')
+        os.close(descriptor)
+        self.addCleanup(os.remove, self.ruta)
+        self._plantilla('CERTIFICADO DE ASISTENCIA')
+
+    def _plantilla(self, titulo):
+        c = canvas.Canvas(self.ruta, pagesize=landscape(letter))
+        c.setFont('Times-Bold', 30)
+        c.drawCentredString(396, 480, titulo)
+        c.setFillColorRGB(1, 0, 0)  # Estado gráfico sin restaurar: no debe afectar el texto del asistente
+        c.save()
+
+    def _texto(self, pdf):
+        return PdfReader(pdf).pages[0].extract_text()
+
+    def test_superpone_nombre_y_documento(self):
+        texto = self._texto(utils.generar_certificado_pdf('José Peña', '1001', self.ruta))
+
+        self.assertIn('CERTIFICADO DE ASISTENCIA', texto)
+        self.assertIn('JOSÉ PEÑA', texto)
+        self.assertIn('Identificación: 1001', texto)
+
+    def test_reutiliza_la_plantilla_hasta_que_cambia(self):
+        utils.generar_certificado_pdf('Ana', '1', self.ruta)
+        with mock.patch.object(utils, 'PdfReader', side_effect=AssertionError('no debe releer la plantilla')):
+            utils.generar_certificado_pdf('Luis', '2', self.ruta)
+
+        self._plantilla('CONSTANCIA DE PARTICIPACION EN EL CONGRESO')
+        texto = self._texto(utils.generar_certificado_pdf('Marta', '3', self.ruta))
+        self.assertIn('CONSTANCIA DE PARTICIPACION', texto)
+        self.assertIn('MARTA', texto)
+
+    def test_escapa_parentesis_barras_y_texto_no_latino(self):
+        self.assertEqual(pdf_objetos.texto_pdf('a(b)c\\d'), 'a\\(b\\)c\\\\d')
+        # Fuera de WinAnsiEncoding se reemplaza por '?'; el euro sí existe en cp1252
+        self.assertEqual(pdf_objetos.texto_pdf('Peña 漢字 €'), 'Peña ?? \x80')
+
+        texto = self._texto(utils.generar_certificado_pdf('Ana (Gómez) \\ 漢', '(1001)', self.ruta))
+        self.assertIn('ANA (GÓMEZ) \\ ?', texto)
+        self.assertIn('Identificación: (1001)', texto)
+
+
+class CertificadosMasivosTests(TestCase):
+    """Certificados generados en un pool de procesos y enviados en segundo plano."""
+
+    ASISTENTES = 10
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name, CERTIFICADOS_PROCESOS=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.evento = Evento.objects.create(titulo='Congreso', fecha='2026-03-01T08:00:00Z', lugar='Auditorio', estado='APROBADO')
+        for i in range(self.ASISTENTES + 1):
+            usuario = CustomUser.objects.create_user(
+                id=f'50{i:02d}', password=None, full_name=f'Asistente {i}', email=f'asistente{i}@example.com'
+            )
+            # El último no asistió: no recibe certificado
+            Inscripcion.objects.create(evento=self.evento, usuario=usuario, asistio=i < self.ASISTENTES)
+
+        self.admin = CustomUser.objects.create_user(id='9001', password='clave123', full_name='Admin', role='Administrador')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _plantilla(self):
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=landscape(letter))
+        c.drawCentredString(396, 480, 'CERTIFICADO DE ASISTENCIA')
+        c.save()
+        return SimpleUploadedFile('plantilla.pdf', buffer.getvalue(), content_type='application/pdf')
+
+    def test_encola_genera_en_paralelo_y_no_reenvia(self):
+        response = self.client.post(
+            f'/api/eventos/{self.evento.id}/generar_certificados_masivo/', {'plantilla': self._plantilla()}, format='multipart'
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['trabajo']['total'], self.ASISTENTES)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Lotes pequeños para que el trabajo pase por el pool de procesos
+        with mock.patch.object(jobs, 'TAMANO_LOTE_PDF', 3):
+            call_command('procesar_envios', '--una-vez', stdout=StringIO())
+
+        trabajo = TrabajoEnvio.objects.get(pk=response.data['trabajo_id'])
+        self.assertEqual(trabajo.estado, 'COMPLETADO')
+        self.assertEqual(trabajo.enviados, self.ASISTENTES)
+        enviados = {m.to[0]: m for m in mail.outbox}
+        self.assertEqual(sorted(enviados), sorted(f'asistente{i}@example.com' for i in range(self.ASISTENTES)))
+        nombre, contenido, tipo = enviados['asistente3@example.com'].attachments[0]
+        self.assertEqual(tipo, 'application/pdf')
+        self.assertIn('ASISTENTE 3', PdfReader(BytesIO(contenido)).pages[0].extract_text())
+        self.assertEqual(
+            CorreoSaliente.objects.filter(evento=self.evento, tipo='CERTIFICADO', estado='ENVIADO').count(), self.ASISTENTES
+        )
+        # Quedan guardados: descargarlos no vuelve a generarlos
+        self.client.force_authenticate(CustomUser.objects.get(id='5003'))
+        with mock.patch.object(utils, 'generar_certificado_pdf', side_effect=AssertionError('no debe regenerarse')):
+            descarga = self.client.get(f'/api/eventos/{self.evento.id}/certificado/')
+        self.assertEqual(b''.join(descarga.streaming_content), contenido)
+        self.client.force_authenticate(self.admin)
+
+        # Repetir con la misma plantilla no reenvía nada
+        repetido = self.client.post(f'/api/eventos/{self.evento.id}/generar_certificados_masivo/')
+        call_command('procesar_envios', '--una-vez', stdout=StringIO())
+
+        trabajo = TrabajoEnvio.objects.get(pk=repetido.data['trabajo_id'])
+        self.assertEqual(trabajo.omitidos, self.ASISTENTES)
+        self.assertEqual(len(mail.outbox), self.ASISTENTES)
+
+    def test_sin_plantilla(self):
+        response = self.client.post(f'/api/eventos/{self.evento.id}/generar_certificados_masivo/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TrabajoEnvio.objects.exists())
+
+
+class CertificadoDescargaTests(TestCase):
+    """Certificados guardados una vez en el storage y descargados con ETag/Range."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.evento, self.usuario, _ = crear_evento_con_inscrito()
+        self.evento.inscripciones.update(asistio=True)
+        self._plantilla('CERTIFICADO DE ASISTENCIA')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.url = f'/api/eventos/{self.evento.id}/certificado/'
+
+    def _plantilla(self, titulo):
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=landscape(letter))
+        c.drawCentredString(396, 480, titulo)
+        c.save()
+        self.evento.plantilla_certificado = SimpleUploadedFile('plantilla.pdf', buffer.getvalue())
+        self.evento.save()
+
+    def test_genera_una_vez_y_revalida(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        pdf = b''.join(response.streaming_content)
+        self.assertIn('ANA GÓMEZ', PdfReader(BytesIO(pdf)).pages[0].extract_text())
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        with mock.patch.object(utils, 'generar_certificado_pdf', side_effect=AssertionError('no debe regenerarse')):
+            revalidacion = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+            parcial = self.client.get(self.url, HTTP_RANGE='bytes=0-7')
+            final = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+            fuera = self.client.get(self.url, HTTP_RANGE=f'bytes={len(pdf)}-')
+
+        self.assertEqual(revalidacion.status_code, 304)
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(parcial.content, pdf[:8])
+        self.assertEqual(parcial['Content-Range'], f'bytes 0-7/{len(pdf)}')
+        self.assertEqual(final.content, pdf[-5:])
+        self.assertEqual(fuera.status_code, 416)
+
+        # Una plantilla nueva cambia la clave: se regenera y la versión anterior se borra
+        self._plantilla('CONSTANCIA DE PARTICIPACION')
+        nueva = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva['ETag'], response['ETag'])
+        directorio = os.path.join(settings.MEDIA_ROOT, 'certificados', str(self.evento.id), self.usuario.pk)
+        self.assertEqual(len(os.listdir(directorio)), 1)
+
+    def test_exporta_zip_y_pdf_combinado(self):
+        otro = CustomUser.objects.create_user(id='1002', password=None, full_name='Luis Pérez')
+        Inscripcion.objects.create(evento=self.evento, usuario=otro, asistio=True)
+        url = f'/api/eventos/{self.evento.id}/exportar_certificados/'
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+        admin = CustomUser.objects.create_user(id='9001', password=None, full_name='Admin', role='Administrador')
+        self.client.force_authenticate(admin)
+
+        respuesta_zip = self.client.get(url)
+        self.assertTrue(respuesta_zip.streaming)
+        with zipfile.ZipFile(BytesIO(b''.join(respuesta_zip.streaming_content))) as archivo_zip:
+            nombres = archivo_zip.namelist()
+            self.assertEqual(nombres, ['1001_Certificado_Ana_Gómez.pdf', '1002_Certificado_Luis_Pérez.pdf'])
+            texto = PdfReader(BytesIO(archivo_zip.read(nombres[1]))).pages[0].extract_text()
+        self.assertIn('LUIS PÉREZ', texto)
+
+        respuesta_pdf = self.client.get(url, {'formato': 'pdf'})
+        paginas = PdfReader(BytesIO(b''.join(respuesta_pdf.streaming_content))).pages
+        self.assertEqual(len(paginas), 2)
+        self.assertIn('CERTIFICADO DE ASISTENCIA', paginas[1].extract_text())
+        self.assertIn('LUIS PÉREZ', paginas[1].extract_text())
+
+    def test_solo_asistentes_y_propio(self):
+        self.evento.inscripciones.update(asistio=False)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'usuario': '9999'}).status_code, 403)
+
+
+class DisenoCertificadoTests(TestCase):
+    """Diseño del certificado por evento y vistas previas en caché."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.fuentes = os.path.join(media.name, 'fuentes')
+        os.makedirs(self.fuentes)
+        ajustes = override_settings(MEDIA_ROOT=media.name, CERTIFICADOS_DIR_FUENTES=self.fuentes)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache.clear()
+
+        self.evento, self.usuario, _ = crear_evento_con_inscrito()
+        self.admin = CustomUser.objects.create_user(id='9001', password=None, full_name='Admin', role='Administrador')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/eventos/{self.evento.id}/ver_previsualizacion_certificado/'
+
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=landscape(letter))
+        c.drawCentredString(396, 480, 'CERTIFICADO DE ASISTENCIA')
+        c.save()
+        self.plantilla = buffer.getvalue()
+
+    def _previa(self, diseno=None):
+        datos = {'plantilla': SimpleUploadedFile('plantilla.pdf', self.plantilla)}
+        if diseno is not None:
+            datos['diseno'] = json.dumps(diseno)
+        return self.client.post(self.url, datos, format='multipart')
+
+    def test_valida_el_diseno(self):
+        with self.assertRaisesMessage(ValueError, 'nombre.color'):
+            utils.normalizar_diseno({'nombre': {'color': 'rojo'}})
+        with self.assertRaisesMessage(ValueError, 'Opción desconocida'):
+            utils.normalizar_diseno({'documento': {'negrita': True}})
+
+        response = self.client.patch(
+            f'/api/eventos/{self.evento.id}/', {'diseno_certificado': {'nombre': {'fuente': 'NoExiste.ttf'}}}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('NoExiste.ttf', str(response.data['diseno_certificado']))
+
+    def test_ajusta_nombres_largos(self):
+        diseno = utils.normalizar_diseno({'nombre': {'ajustar': True, 'ancho_maximo': 300, 'alineacion': 'izquierda', 'x': 50}})
+        nombre = utils._elementos(diseno, 'María Fernanda de los Ángeles Rodríguez', '1')[0]
+        elemento, texto, fuente, tamano, x = nombre
+
+        self.assertLess(tamano, 24)
+        self.assertLessEqual(stringWidth(texto, fuente, tamano), 300)
+        self.assertEqual(x, 50)
+
+    def test_vista_previa_en_cache_y_plantilla_sin_reescribir(self):
+        primera = self._previa({'nombre': {'y': 320, 'color': '#B71C1C'}})
+        self.assertEqual(primera.status_code, 200)
+        self.evento.refresh_from_db()
+        nombre_plantilla = self.evento.plantilla_certificado.name
+        self.assertEqual(self.evento.diseno_certificado['nombre']['y'], 320)
+
+        # Misma plantilla y diseño: ni se reescribe el archivo ni se vuelve a generar
+        with mock.patch.object(utils, 'generar_certificado_pdf', side_effect=AssertionError('debe venir de la caché')):
+            segunda = self._previa({'nombre': {'y': 320, 'color': '#B71C1C'}})
+        self.assertEqual(segunda.content, primera.content)
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.plantilla_certificado.name, nombre_plantilla)
+
+        # Otro diseño: nueva vista previa
+        tercera = self._previa({'nombre': {'y': 200}})
+        self.assertNotEqual(tercera.content, primera.content)
+
+    def test_fuente_ttf_propia(self):
+        import reportlab
+        shutil.copy(os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'VeraBd.ttf'), self.fuentes)
+
+        response = self._previa({'nombre': {'fuente': 'VeraBd.ttf'}})
+
+        self.assertEqual(response.status_code, 200)
+        pagina = PdfReader(BytesIO(response.content)).pages[0]
+        self.assertIn('JUAN PEREZ', pagina.extract_text())
+        fuentes = [f.get_object()['/BaseFont'] for f in pagina['/Resources']['/Font'].values()]
+        self.assertTrue(any('Vera' in fuente for fuente in fuentes))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class RedencionConcurrenteTests(TransactionTestCase):
+    """
+    Varias estaciones escaneando el mismo código al mismo tiempo: solo una debe ganar.
+    Requiere bloqueo de filas real (PostgreSQL/MySQL); en SQLite los hilos chocan con 'database is locked'.
+    """
+
+    HILOS = 12
+
+    def test_solo_una_estacion_redime(self):
+        evento, usuario, qr = crear_evento_con_inscrito()
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+        lock = threading.Lock()
+
+        def escanear():
+            try:
+                # Cada hilo lee el QR (aún sin usar) antes de intentar redimirlo
+                instancia = CodigoQR.objects.get(pk=qr.pk)
+                barrera.wait()
+                ganado = instancia.marcar_como_usado()
+                with lock:
+                    resultados.append(ganado)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=escanear) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(resultados), self.HILOS)
+        self.assertEqual(resultados.count(True), 1)
+        qr.refresh_from_db()
+        self.assertTrue(qr.usado)
+        self.assertTrue(Inscripcion.objects.get(evento=evento, usuario=usuario).asistio)
+
+
+class EstadisticasTests(TestCase):
+    """Estadísticas del dashboard agregadas en la base de datos."""
+
+    def setUp(self):
+        self.evento, self.usuario, self.qr = crear_evento_con_inscrito()
+        self.evento.cantidad_refrigerios = 50
+        self.evento.save()
+        self.admin = CustomUser.objects.create_user(id='9000', password=None, full_name='Admin', role='Administrador')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/eventos/{self.evento.id}/estadisticas/'
+
+    def _asistente(self, id_usuario, dependencia, refrigerio=False):
+        usuario = CustomUser.objects.create_user(id=id_usuario, password=None, full_name=f'Usuario {id_usuario}', dependency=dependencia)
+        Inscripcion.objects.create(evento=self.evento, usuario=usuario)
+        CodigoQR.objects.create(evento=self.evento, usuario=usuario, tipo_comida='ENTRADA').marcar_como_usado()
+        if refrigerio:
+            CodigoQR.objects.create(evento=self.evento, usuario=usuario, tipo_comida='REFRIGERIO').marcar_como_usado()
+
+    def test_respuesta_con_desglose_normalizado(self):
+        self.qr.marcar_como_usado()
+        self._asistente('1002', '  CONTADURÍA ', refrigerio=True)
+        self._asistente('1003', 'sistemas')
+        self._asistente('1004', '')
+        CustomUser.objects.create_user(id='1005', password=None, full_name='Sin asistir', dependency='sistemas')
+        Inscripcion.objects.create(evento=self.evento, usuario_id='1005')
+        CodigoQR.objects.create(evento=self.evento, usuario_id='1005', tipo_comida='ENTRADA')
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'total_inscritos': 5,
+            'asistentes_reales': 4,
+            'porcentaje_asistencia': 80.0,
+            'refrigerios_entregados': 1,
+            'total_refrigerios_disponibles': 50,
+            'asistencia_por_dependencia': {'Contaduría': 2, 'Sistemas': 1, 'Sin Definir': 1},
+        })
+        self.assertEqual(list(response.json()['asistencia_por_dependencia']), ['Contaduría', 'Sistemas', 'Sin Definir'])
+
+    def test_consultas_constantes(self):
+        self.qr.marcar_como_usado()
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as pocas:
+            self.client.get(self.url)
+
+        for i in range(20):
+            self._asistente(str(2000 + i), f'dependencia {i % 3}')
+        with CaptureQueriesContext(connection) as muchas:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.json()['asistentes_reales'], 21)
+        self.assertEqual(len(muchas), len(pocas))
+
+    def test_contadores_coinciden_con_los_codigos(self):
+        self.evento.detalles_refrigerios = {'items': ['REFRIGERIO']}
+        self.evento.save()
+        self._asistente('1002', 'sistemas')
+        self.client.post(f'/api/eventos/{self.evento.pk}/generar_qrs_masivo/')
+        codigos = CodigoQR.objects.filter(evento=self.evento, tipo_comida='REFRIGERIO').values_list('codigo', flat=True)
+        CodigoQR.redimir_en_lote({codigo: timezone.now() for codigo in codigos})
+        self.qr.marcar_como_usado()
+
+        self.assertEqual(estadisticas.diferencias(self.evento), {})
+        self.assertEqual(self.client.get(self.url).json()['refrigerios_entregados'], 2)
+        self.assertEqual(estadisticas.reconstruir(self.evento), 0)
+
+    def test_borrados_descuentan_los_contadores(self):
+        self.qr.marcar_como_usado()
+        self._asistente('1002', 'sistemas', refrigerio=True)
+        self._asistente('1003', 'sistemas')
+
+        # Borrado en cascada de un inscrito (usuario -> inscripción y códigos)
+        CustomUser.objects.get(id='1002').delete()
+        self.assertEqual(estadisticas.diferencias(self.evento), {})
+        self.assertEqual(self.client.get(self.url).json(), {
+            'total_inscritos': 2,
+            'asistentes_reales': 2,
+            'porcentaje_asistencia': 100.0,
+            'refrigerios_entregados': 0,
+            'total_refrigerios_disponibles': 50,
+            'asistencia_por_dependencia': {'Contaduría': 1, 'Sistemas': 1},
+        })
+
+        # Borrado en bloque
+        CodigoQR.objects.filter(evento=self.evento, usuario_id='1003').delete()
+        Inscripcion.objects.filter(evento=self.evento, usuario_id='1003').delete()
+        self.assertEqual(estadisticas.diferencias(self.evento), {})
+        self.assertEqual(self.client.get(self.url).json()['asistencia_por_dependencia'], {'Contaduría': 1})
+
+        # Borrar el evento elimina sus contadores
+        evento_id = self.evento.pk
+        self.evento.delete()
+        self.assertFalse(ContadorEvento.objects.filter(evento_id=evento_id).exists())
+
+    def test_cambio_de_dependencia_no_mueve_los_contadores(self):
+        # Generado en Contaduría; el usuario cambia de dependencia antes de redimir y antes de borrar
+        self.usuario.dependency = 'Sistemas'
+        self.usuario.save()
+        self.qr.marcar_como_usado()
+
+        contadores = ContadorEvento.objects.filter(evento=self.evento, tipo='ENTRADA')
+        self.assertEqual(list(contadores.values_list('dependencia', 'emitidos', 'redimidos')), [('Contaduría', 1, 1)])
+        self.assertEqual(estadisticas.diferencias(self.evento), {})
+
+        self.usuario.dependency = 'Derecho'
+        self.usuario.save()
+        CodigoQR.objects.filter(pk=self.qr.pk).delete()
+
+        self.assertEqual(list(contadores.values_list('dependencia', 'emitidos', 'redimidos')), [('Contaduría', 0, 0)])
+        self.assertEqual(estadisticas.diferencias(self.evento), {})
+
+    def test_reconstruir_y_verificar(self):
+        self.qr.marcar_como_usado()
+        esperado = self.client.get(self.url).json()
+        ContadorEvento.objects.filter(evento=self.evento, tipo='ENTRADA').update(redimidos=7)
+        ContadorEvento.objects.create(evento=self.evento, tipo='ALMUERZO', dependencia='Otra', emitidos=3)
+
+        with self.assertRaises(CommandError):
+            call_command('reconstruir_contadores', self.evento.pk, '--verificar', stdout=StringIO())
+        call_command('reconstruir_contadores', stdout=StringIO())
+        call_command('reconstruir_contadores', self.evento.pk, '--verificar', stdout=StringIO())
+
+        self.assertEqual(self.client.get(self.url).json(), esperado)
+        self.assertFalse(ContadorEvento.objects.filter(tipo='ALMUERZO').exists())
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ContadoresConcurrentesTests(TransactionTestCase):
+    """
+    Estaciones redimiendo códigos distintos a la vez: no se pierde ningún incremento.
+    Como RedencionConcurrenteTests, solo corre con bloqueo de filas real (no en SQLite).
+    """
+
+    HILOS = 8
+
+    def test_redenciones_concurrentes(self):
+        evento, _, qr = crear_evento_con_inscrito()
+        qrs = [qr]
+        for i in range(1, self.HILOS):
+            usuario = CustomUser.objects.create_user(id=str(3000 + i), password=None, full_name=f'Usuario {i}', dependency='contaduría')
+            Inscripcion.objects.create(evento=evento, usuario=usuario)
+            qrs.append(CodigoQR.objects.create(evento=evento, usuario=usuario, tipo_comida='ENTRADA'))
+        barrera = threading.Barrier(self.HILOS)
+
+        def escanear(pk):
+            try:
+                instancia = CodigoQR.objects.get(pk=pk)
+                barrera.wait()
+                instancia.marcar_como_usado()
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=escanear, args=(qr.pk,)) for qr in qrs]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        resultado = estadisticas.calcular(evento)
+        self.assertEqual(resultado['asistentes_reales'], self.HILOS)
+        self.assertEqual(resultado['asistencia_por_dependencia'], {'Contaduría': self.HILOS})
+        self.assertEqual(estadisticas.diferencias(evento), {})
+
+
+@override_settings(EN_VIVO_DURACION=0.05, EN_VIVO_INTERVALO=0.01)
+class EnVivoTests(TestCase):
+    """Flujo SSE del dashboard con las redenciones publicadas en la caché."""
+
+    def setUp(self):
+        cache.clear()
+        self.evento, self.usuario, self.qr = crear_evento_con_inscrito()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.url = f'/api/eventos/{self.evento.pk}/en_vivo/'
+
+    def _leer(self, **cabeceras):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream', **cabeceras)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        eventos = []
+        for bloque in b''.join(response.streaming_content).decode('utf-8').split('\n\n'):
+            campos = dict(linea.split(': ', 1) for linea in bloque.splitlines() if ': ' in linea and not linea.startswith(':'))
+            if 'event' in campos:
+                eventos.append((campos.get('id'), campos['event'], json.loads(campos['data'])))
+        return eventos
+
+    def test_estado_inicial_y_redenciones(self):
+        inicial = self._leer()
+        self.assertEqual(inicial, [('0', 'estadisticas', self.client.get(f'/api/eventos/{self.evento.pk}/estadisticas/').json())])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.qr.marcar_como_usado()
+
+        eventos = self._leer(HTTP_LAST_EVENT_ID='0')
+        self.assertEqual([(id_, tipo) for id_, tipo, _ in eventos], [('1', 'escaneo'), (None, 'contadores')])
+        datos = eventos[0][2]
+        self.assertEqual(datos['escaneos'][0]['codigo'], str(self.qr.codigo))
+        self.assertEqual(datos['escaneos'][0]['tipo'], 'ENTRADA')
+        self.assertEqual(datos['escaneos'][0]['usuario_id'], self.usuario.id)
+        self.assertEqual(datos['escaneos'][0]['asistente']['nombre_completo'], 'Ana Gómez')
+        self.assertEqual(eventos[1][2]['asistentes_reales'], 1)
+        self.assertEqual(eventos[1][2]['asistencia_por_dependencia'], {'Contaduría': 1})
+
+        # Ya entregado: una reconexión con el último id no recibe nada nuevo
+        self.assertEqual(self._leer(HTTP_LAST_EVENT_ID='1'), [])
+
+    def test_lote_publica_un_mensaje_por_evento(self):
+        otro = CustomUser.objects.create_user(id='1002', password=None, full_name='Luis Díaz')
+        qr_otro = CodigoQR.objects.create(evento=self.evento, usuario=otro, tipo_comida='ENTRADA')
+
+        # Publicar no consulta la base de datos: los contadores los lee el flujo
+        with self.captureOnCommitCallbacks() as callbacks:
+            CodigoQR.redimir_en_lote({self.qr.codigo: timezone.now(), qr_otro.codigo: timezone.now()})
+        with self.assertNumQueries(0):
+            for callback in callbacks:
+                callback()
+
+        mensajes, posicion, completos = en_vivo.pendientes(self.evento.pk, 0)
+        self.assertEqual((posicion, completos), (1, True))
+        self.assertEqual(len(mensajes[0][1]['datos']['escaneos']), 2)
+
+    def test_mensajes_vencidos_reenvian_el_estado(self):
+        en_vivo.publicar(self.evento.pk, 'escaneo', {})
+        en_vivo.publicar(self.evento.pk, 'escaneo', {})
+        cache.delete(f'{en_vivo.PREFIJO}{self.evento.pk}:1')
+
+        eventos = self._leer(HTTP_LAST_EVENT_ID='0')
+
+        self.assertEqual([(id_, tipo) for id_, tipo, _ in eventos], [('2', 'escaneo'), ('2', 'estadisticas')])
+
+
+class FlujoEscaneosTests(TestCase):
+    """Escaneos por intervalo, tipo y estación agrupados en la base de datos."""
+
+    def setUp(self):
+        cache.clear()
+        self.evento, self.usuario, self.qr = crear_evento_con_inscrito()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.url = f'/api/eventos/{self.evento.pk}/flujo_escaneos/'
+        self.inicio = timezone.make_aware(timezone.datetime(2026, 3, 1, 8, 0), timezone.get_fixed_timezone(0))
+
+        escaneos = [(0, 'ENTRADA', 'Puerta 1'), (2, 'ENTRADA', 'Puerta 1'), (3, 'ENTRADA', 'Puerta 2'),
+                    (7, 'ENTRADA', 'Puerta 1'), (7, 'REFRIGERIO', 'Cafetería')]
+        for i, (minuto, tipo, estacion) in enumerate(escaneos):
+            usuario = CustomUser.objects.create_user(id=str(4000 + i), password=None, full_name=f'Usuario {i}')
+            qr = CodigoQR.objects.create(evento=self.evento, usuario=usuario, tipo_comida=tipo)
+            qr.marcar_como_usado(self.inicio + timedelta(minutes=minuto, seconds=30), estacion=estacion)
+
+    def _series(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [(fila['inicio'][11:16], fila['tipo'], fila['estacion'], fila['total']) for fila in response.json()['series']]
+
+    def test_intervalos(self):
+        self.assertEqual(self._series(intervalo=5), [
+            ('08:00', 'ENTRADA', 'Puerta 1', 2),
+            ('08:00', 'ENTRADA', 'Puerta 2', 1),
+            ('08:05', 'ENTRADA', 'Puerta 1', 1),
+            ('08:05', 'REFRIGERIO', 'Cafetería', 1),
+        ])
+        self.assertEqual(len(self._series(intervalo=1)), 5)
+        self.assertEqual(self._series(intervalo=15, desde='2026-03-01T08:05:00Z'), [
+            ('08:00', 'ENTRADA', 'Puerta 1', 1),
+            ('08:00', 'REFRIGERIO', 'Cafetería', 1),
+        ])
+
+    def test_intervalo_invalido(self):
+        self.assertEqual(self.client.get(self.url, {'intervalo': 10}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'desde': 'ayer'}).status_code, 400)
+
+    def test_respuesta_en_cache(self):
+        self._series(intervalo=5)
+        with CaptureQueriesContext(connection) as consultas:
+            self._series(intervalo=5)
+        # Solo la carga del evento; la serie sale de la caché
+        self.assertEqual(len(consultas), 1)
+
+    def test_lote_registra_la_estacion(self):
+        CodigoQR.redimir_en_lote({self.qr.codigo: self.inicio}, estacion='Puerta 3')
+        self.qr.refresh_from_db()
+        self.assertEqual(self.qr.estacion, 'Puerta 3')
@@ -0,0 +1,160 @@
+"""
+Correos transaccionales (verificación de registro y similares) entregados en segundo plano.
+
+La petición solo crea el registro PENDIENTE en la bandeja de salida (CorreoSaliente) y
+responde de inmediato; el proceso 'procesar_envios' los reclama, los envía por el motor
+compartido (conexiones abiertas, límite de tasa) y, si la entrega falla, los reintenta
+automáticamente con una espera creciente hasta MAX_INTENTOS.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.mail import EmailMessage
+from django.utils import timezone
+
+from . import outbox
+from .mail_dispatch import motor_compartido
+from .models import CorreoSaliente
+
+logger = logging.getLogger(__name__)
+
+# Intentos de entrega antes de dar el correo por fallido definitivamente
+MAX_INTENTOS = 5
+
+# Espera antes del primer reintento (se duplica en cada fallo, hasta ESPERA_MAXIMA)
+ESPERA_REINTENTO = timedelta(minutes=1)
+ESPERA_MAXIMA = timedelta(minutes=30)
+
+# Tiempo que un trabajador tiene reservado un correo mientras lo envía
+RESERVA = timedelta(minutes=2)
+
+# Correos reclamados por cada pasada
+TAMANO_LOTE = 50
+
+# Vigencia del token con el que el registro consulta el estado de su correo de verificación
+VIGENCIA_TOKEN_ESTADO = timedelta(days=1)
+SALT_TOKEN_ESTADO = 'sigue.verificacion.estado'
+
+
+def encolar_verificacion(usuario):
+    """Registra el correo con el código de verificación del usuario para enviarlo en segundo plano."""
+    return CorreoSaliente.objects.create(
+        usuario=usuario,
+        destinatario=usuario.email,
+        tipo='VERIFICACION',
+        hash_contenido=outbox.hash_contenido([usuario.pk, usuario.verification_code]),
+        proximo_intento=timezone.now()
+    )
+
+
+def token_estado(usuario):
+    """
+    Token firmado (no adivinable) que identifica al usuario recién registrado en la consulta
+    del estado de su correo de verificación; aún no puede autenticarse porque está inactivo.
+    """
+    return signing.dumps(usuario.pk, salt=SALT_TOKEN_ESTADO)
+
+
+def usuario_de_token(token):
+    """ID del usuario del token de 'token_estado', o None si es inválido o venció."""
+    try:
+        return signing.loads(token, salt=SALT_TOKEN_ESTADO, max_age=VIGENCIA_TOKEN_ESTADO)
+    except signing.BadSignature:
+        return None
+
+
+def estado_verificacion(id_usuario):
+    """
+    Estado de entrega del último correo de verificación del usuario.
+
+    Returns:
+        dict o None si el usuario no tiene correos de verificación.
+    """
+    correo = (
+        CorreoSaliente.objects.filter(usuario_id=id_usuario, tipo='VERIFICACION')
+        .order_by('-fecha_creacion').first()
+    )
+    if correo is None:
+        return None
+    return {
+        'estado': correo.estado,
+        'intentos': correo.intentos,
+        'fecha_envio': correo.fecha_envio,
+        'proximo_intento': correo.proximo_intento if correo.estado == 'FALLIDO' else None,
+    }
+
+
+def _mensaje_verificacion(correo):
+    usuario = correo.usuario
+    if usuario is None or usuario.is_active or not usuario.verification_code:
+        return None
+    return EmailMessage(
+        'Confirma tu cuenta - SIGUE',
+        f'Hola {usuario.full_name},\n\nTu código de verificación es: {usuario.verification_code}',
+        settings.DEFAULT_FROM_EMAIL,
+        [correo.destinatario],
+    )
+
+
+# Constructor del mensaje por tipo; devuelve None si el correo ya no tiene sentido
+CONSTRUCTORES = {
+    'VERIFICACION': _mensaje_verificacion,
+}
+
+
+def _reclamar(ahora):
+    """Reserva con un UPDATE condicional los correos listos para (re)intentarse."""
+    candidatos = CorreoSaliente.objects.filter(
+        tipo__in=CorreoSaliente.TIPOS_TRANSACCIONALES,
+        estado__in=['PENDIENTE', 'FALLIDO'],
+        proximo_intento__lte=ahora
+    ).order_by('proximo_intento').values_list('pk', 'proximo_intento')[:TAMANO_LOTE]
+
+    reclamados = []
+    for pk, proximo in candidatos:
+        if CorreoSaliente.objects.filter(pk=pk, proximo_intento=proximo).update(proximo_intento=ahora + RESERVA):
+            reclamados.append(pk)
+    return list(CorreoSaliente.objects.filter(pk__in=reclamados).select_related('usuario'))
+
+
+def _espera(intentos):
+    return min(ESPERA_REINTENTO * (2 ** max(intentos - 1, 0)), ESPERA_MAXIMA)
+
+
+def procesar_pendientes():
+    """
+    Envía los correos transaccionales pendientes o con reintento vencido.
+
+    Returns:
+        int: cantidad de correos procesados en esta pasada.
+    """
+    ahora = timezone.now()
+    correos = _reclamar(ahora)
+    if not correos:
+        return 0
+
+    tareas = []
+    for correo in correos:
+        mensaje = CONSTRUCTORES[correo.tipo](correo)
+        if mensaje is None:
+            correo.estado = 'CANCELADO'
+            correo.proximo_intento = None
+            correo.save(update_fields=['estado', 'proximo_intento', 'fecha_actualizacion'])
+            continue
+        tareas.append((mensaje, correo))
+
+    for correo, resultado in motor_compartido().mapear(tareas):
+        outbox.registrar_resultado(correo, resultado)
+        if resultado is True:
+            correo.proximo_intento = None
+        elif correo.intentos < MAX_INTENTOS:
+            correo.proximo_intento = timezone.now() + _espera(correo.intentos)
+            logger.warning(f"Correo {correo.tipo} a {correo.destinatario} falló; se reintentará ({correo.intentos}/{MAX_INTENTOS})")
+        else:
+            correo.proximo_intento = None
+            logger.error(f"Correo {correo.tipo} a {correo.destinatario} falló definitivamente tras {correo.intentos} intentos")
+        correo.save(update_fields=['proximo_intento'])
+
+    return len(correos)
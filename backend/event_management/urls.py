@@ -1,12 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AsistenteViewSet, CodigoQRViewSet, EventoViewSet
+from .views import AsistenteViewSet, CodigoQRViewSet, EventoViewSet, TrabajoEnvioViewSet
 
 # Router para generar automáticamente las URLs de los ViewSets
 router = DefaultRouter()
 router.register(r'asistentes', AsistenteViewSet) # /api/asistentes/ (Legacy)
 router.register(r'qr', CodigoQRViewSet)          # /api/qr/ (Escaneo y gestión)
 router.register(r'eventos', EventoViewSet)       # /api/eventos/ (Gestión principal)
+router.register(r'trabajos', TrabajoEnvioViewSet) # /api/trabajos/ (Avance de envíos masivos)
 
 urlpatterns = [
     # Incluir las rutas del router
@@ -1,16 +1,404 @@
-
 import os
 import io
+import json
+import hashlib
+import logging
+from functools import lru_cache
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, landscape
 from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfbase.ttfonts import TTFont
 from PyPDF2 import PdfWriter, PdfReader
-from django.conf import settings
-from django.core.files.base import ContentFile
-import textwrap
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject
+
+from .pdf_objetos import entrada_xref, fuente_estandar, objeto_pdf, stream_pdf, texto_pdf
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------
+# DISEÑO PREDETERMINADO DEL CERTIFICADO
+# -------------------------------------------------------------------------
+# Cada evento puede ajustar posiciones, fuentes, tamaños y colores en
+# Evento.diseno_certificado (ver normalizar_diseno); estos son los valores por defecto.
+# Las coordenadas están en puntos (1 punto = 1/72 pulgada).
+# (0,0) es la esquina inferior izquierda.
+
+# Coordenadas para el NOMBRE DEL ASISTENTE
+X_NOMBRE = 400   # Posición horizontal (centro aproximado)
+Y_NOMBRE = 300   # Posición vertical
+FONT_SIZE_NOMBRE = 24
+
+# Coordenadas para el DOCUMENTO (si se desea mostrar)
+MOSTRAR_DOCUMENTO = True
+X_DOC = 400
+Y_DOC = 260
+FONT_SIZE_DOC = 14
+PREFIX_DOC = "Identificación: "
+
+# COLORES RGB (0-1)
+COLOR_TEXTO = (0, 0, 0) # Negro
+
+# -------------------------------------------------------------------------
+
+# Plantillas precompiladas que se conservan por proceso
+TAMANO_CACHE_PLANTILLAS = 8
+
+# Fuentes estándar de PDF (no se incrustan); cualquier otra debe ser un archivo .ttf
+FUENTES_ESTANDAR = {
+    'Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique', 'Helvetica-BoldOblique',
+    'Times-Roman', 'Times-Bold', 'Times-Italic', 'Times-BoldItalic',
+    'Courier', 'Courier-Bold', 'Courier-Oblique', 'Courier-BoldOblique',
+}
+
+ALINEACIONES = ('centro', 'izquierda', 'derecha')
+
+
+def _diseno_predeterminado():
+    elemento = {'alineacion': 'centro', 'ajustar': False, 'ancho_maximo': 600, 'mayusculas': False}
+    return {
+        'nombre': {
+            **elemento, 'x': X_NOMBRE, 'y': Y_NOMBRE, 'fuente': 'Helvetica-Bold', 'tamano': FONT_SIZE_NOMBRE,
+            'color': list(COLOR_TEXTO), 'mayusculas': True, 'tamano_minimo': 10,
+        },
+        'documento': {
+            **elemento, 'mostrar': MOSTRAR_DOCUMENTO, 'x': X_DOC, 'y': Y_DOC, 'fuente': 'Helvetica',
+            'tamano': FONT_SIZE_DOC, 'color': list(COLOR_TEXTO), 'prefijo': PREFIX_DOC, 'tamano_minimo': 6,
+        },
+    }
 
-def generar_certificado_pdf(nombre_asistente, documento_asistente, ruta_plantilla_pdf):
+
+def _numero(campo, clave, valor, minimo=None, maximo=None):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise ValueError(f'{campo}.{clave} debe ser un número')
+    if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+        raise ValueError(f'{campo}.{clave} debe estar entre {minimo} y {maximo}')
+    return float(valor)
+
+
+def _color(campo, valor):
+    """Color como '#RRGGBB' o [r, g, b] con componentes entre 0 y 1."""
+    if isinstance(valor, str) and len(valor) == 7 and valor.startswith('#'):
+        try:
+            return [round(int(valor[i:i + 2], 16) / 255, 4) for i in (1, 3, 5)]
+        except ValueError:
+            pass
+    elif isinstance(valor, (list, tuple)) and len(valor) == 3:
+        return [_numero(campo, 'color', componente, 0, 1) for componente in valor]
+    raise ValueError(f"{campo}.color debe ser '#RRGGBB' o [r, g, b] entre 0 y 1")
+
+
+@lru_cache(maxsize=None)
+def registrar_fuente(archivo_ttf):
+    """Registra un .ttf en reportlab una sola vez por proceso; devuelve el nombre registrado."""
+    nombre = f'SigueTTF-{hashlib.sha1(archivo_ttf.encode("utf-8")).hexdigest()[:12]}'
+    pdfmetrics.registerFont(TTFont(nombre, archivo_ttf))
+    return nombre
+
+
+def _fuente_reportlab(elemento):
+    return registrar_fuente(elemento['archivo']) if elemento['archivo'] else elemento['fuente']
+
+
+def normalizar_diseno(diseno=None, directorio_fuentes=None):
+    """
+    Diseño completo del certificado: valores predeterminados + los del evento, validados.
+
+    Por elemento ('nombre', 'documento'): x, y, fuente, tamano, color, alineacion
+    (centro/izquierda/derecha; x es el punto de referencia), mayusculas y, para nombres
+    largos, ajustar + ancho_maximo + tamano_minimo (reduce la letra hasta que quepa).
+    'documento' además admite mostrar y prefijo.
+
+    Una fuente que no es estándar es el nombre de un archivo .ttf dentro de directorio_fuentes;
+    se resuelve a su ruta ('archivo') y se registra en reportlab al validarla.
+
+    Raises:
+        ValueError: con un mensaje que se puede mostrar al organizador.
+    """
+    if diseno is None:
+        diseno = {}
+    if not isinstance(diseno, dict):
+        raise ValueError('El diseño debe ser un objeto JSON')
+    completo = _diseno_predeterminado()
+    desconocidos = set(diseno) - set(completo)
+    if desconocidos:
+        raise ValueError(f"Elementos desconocidos en el diseño: {', '.join(sorted(desconocidos))}")
+
+    for campo, elemento in completo.items():
+        propios = diseno.get(campo) or {}
+        if not isinstance(propios, dict):
+            raise ValueError(f'{campo} debe ser un objeto JSON')
+        for clave, valor in propios.items():
+            if clave not in elemento:
+                raise ValueError(f'Opción desconocida: {campo}.{clave}')
+            elemento[clave] = valor
+
+        for clave in ('x', 'y'):
+            elemento[clave] = _numero(campo, clave, elemento[clave], -2000, 2000)
+        elemento['tamano'] = _numero(campo, 'tamano', elemento['tamano'], 1, 300)
+        elemento['tamano_minimo'] = _numero(campo, 'tamano_minimo', elemento['tamano_minimo'], 1, elemento['tamano'])
+        elemento['ancho_maximo'] = _numero(campo, 'ancho_maximo', elemento['ancho_maximo'], 1, 5000)
+        elemento['color'] = _color(campo, elemento['color'])
+        if elemento['alineacion'] not in ALINEACIONES:
+            raise ValueError(f"{campo}.alineacion debe ser una de: {', '.join(ALINEACIONES)}")
+        for clave in ('ajustar', 'mayusculas', 'mostrar'):
+            if clave in elemento and not isinstance(elemento[clave], bool):
+                raise ValueError(f'{campo}.{clave} debe ser true o false')
+        if not isinstance(elemento.get('prefijo', ''), str):
+            raise ValueError(f'{campo}.prefijo debe ser texto')
+
+        fuente = elemento['fuente']
+        elemento['archivo'] = None
+        if fuente not in FUENTES_ESTANDAR:
+            if not isinstance(fuente, str) or not fuente.lower().endswith('.ttf') or os.path.basename(fuente) != fuente:
+                raise ValueError(
+                    f"{campo}.fuente debe ser una fuente estándar ({', '.join(sorted(FUENTES_ESTANDAR))}) "
+                    f"o el nombre de un archivo .ttf"
+                )
+            archivo = os.path.join(directorio_fuentes or '', fuente)
+            if not directorio_fuentes or not os.path.isfile(archivo):
+                raise ValueError(f'No se encontró la fuente {fuente} en el servidor')
+            try:
+                registrar_fuente(archivo)
+            except Exception as e:
+                raise ValueError(f'La fuente {fuente} no es un TTF válido: {e}')
+            elemento['archivo'] = archivo
+    return completo
+
+
+def huella_diseno(diseno):
+    """SHA-256 de un diseño normalizado (identifica el diseño con que se generó un certificado)."""
+    return hashlib.sha256(json.dumps(diseno, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def usa_fuentes_ttf(diseno):
+    return any(elemento['archivo'] for elemento in diseno.values())
+
+
+def _elementos(diseno, nombre_asistente, documento_asistente):
+    """
+    Textos a escribir como (elemento, texto, fuente de reportlab, tamaño, x), con la letra
+    reducida si el elemento pide ajustarse a su ancho y la x según la alineación.
+    """
+    textos = [('nombre', str(nombre_asistente))]
+    if diseno['documento']['mostrar']:
+        textos.append(('documento', f"{diseno['documento']['prefijo']}{documento_asistente}"))
+
+    resultado = []
+    for campo, texto in textos:
+        elemento = diseno[campo]
+        if elemento['mayusculas']:
+            texto = texto.upper()
+        fuente = _fuente_reportlab(elemento)
+        tamano = elemento['tamano']
+        if elemento['ajustar']:
+            while tamano > elemento['tamano_minimo'] and stringWidth(texto, fuente, tamano) > elemento['ancho_maximo']:
+                tamano = max(tamano - 0.5, elemento['tamano_minimo'])
+        ancho = stringWidth(texto, fuente, tamano)
+        x = elemento['x']
+        if elemento['alineacion'] == 'centro':
+            x -= ancho / 2
+        elif elemento['alineacion'] == 'derecha':
+            x -= ancho
+        resultado.append((elemento, texto, fuente, tamano, x))
+    return resultado
+
+
+class PlantillaCertificado:
+    """
+    Plantilla de certificado leída y preparada una sola vez.
+
+    La primera página de la plantilla se reescribe (PyPDF2) como un PDF base de una página.
+    Cada certificado es ese PDF base + una actualización incremental (la forma estándar en que
+    un PDF se modifica añadiendo objetos al final): la página se redefine con el contenido
+    original envuelto en q/Q y un stream extra con el texto del asistente. Todo lo que no
+    depende del asistente (fuentes, página modificada, offsets) se serializa aquí, así generar
+    el certificado N+1 es solo formatear el texto y concatenar bytes, sin volver a leer ni
+    fusionar la plantilla.
+
+    Solo admite fuentes estándar (no incrustadas); los diseños con fuentes .ttf se generan
+    con la fusión de reportlab + PyPDF2 (generar_certificado_pdf_fusion).
+    """
+
+    def __init__(self, ruta_plantilla_pdf, diseno=None):
+        self._diseno = diseno or normalizar_diseno()
+        if usa_fuentes_ttf(self._diseno):
+            raise ValueError('La plantilla precompilada no admite fuentes TTF')
+        with open(ruta_plantilla_pdf, 'rb') as archivo:
+            original = PdfReader(archivo)
+            writer = PdfWriter()
+            writer.add_page(original.pages[0])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+
+        base = buffer.getvalue()
+        if not base.endswith(b'\n'):
+            base += b'\n'
+
+        lector = PdfReader(io.BytesIO(base))
+        pagina = lector.pages[0]
+        numero_pagina = pagina.indirect_reference.idnum
+        raiz = lector.trailer.raw_get('/Root').idnum
+        siguiente = int(lector.trailer['/Size'])
+        xref_anterior = int(base[base.rindex(b'startxref') + len(b'startxref'):].split()[0])
+
+        # Un recurso /FSigueN por cada fuente estándar del diseño
+        nombres_fuentes = sorted({elemento['fuente'] for elemento in self._diseno.values()})
+        self._recursos_fuentes = {nombre: f'FSigue{i}' for i, nombre in enumerate(nombres_fuentes)}
+        self._fijos = len(nombres_fuentes) + 1
+        apertura = siguiente + len(nombres_fuentes)
+        self._numero_texto = apertura + 1
+
+        # Contenido original (stream o arreglo de streams) entre q ... Q para aislar su estado gráfico
+        contenidos = []
+        if '/Contents' in pagina:
+            referencia = pagina.raw_get('/Contents')
+            resuelto = referencia.get_object()
+            contenidos = list(resuelto) if isinstance(resuelto, ArrayObject) else [referencia]
+
+        recursos = DictionaryObject(pagina['/Resources'].get_object()) if '/Resources' in pagina else DictionaryObject()
+        fuentes = DictionaryObject(recursos['/Font'].get_object()) if '/Font' in recursos else DictionaryObject()
+        for i, nombre in enumerate(nombres_fuentes):
+            fuentes[NameObject(f'/{self._recursos_fuentes[nombre]}')] = IndirectObject(siguiente + i, 0, lector)
+        recursos[NameObject('/Font')] = fuentes
+
+        nueva_pagina = DictionaryObject(pagina)
+        nueva_pagina[NameObject('/Resources')] = recursos
+        nueva_pagina[NameObject('/Contents')] = ArrayObject(
+            [IndirectObject(apertura, 0, lector)] + contenidos + [IndirectObject(self._numero_texto, 0, lector)]
+        )
+        serializada = io.BytesIO()
+        nueva_pagina.write_to_stream(serializada, None)
+
+        # Para el PDF combinado: la página sin /Parent ni /Contents (se completan por asistente)
+        comun = DictionaryObject(nueva_pagina)
+        for clave in ('/Parent', '/Contents'):
+            comun.pop(NameObject(clave), None)
+        pagina_comun = io.BytesIO()
+        comun.write_to_stream(pagina_comun, None)
+        self._pagina_comun = pagina_comun.getvalue().rstrip()[:-2]
+        self._contenidos_comunes = ' '.join(
+            [f'{apertura} 0 R'] + [f'{referencia.idnum} 0 R' for referencia in contenidos]
+        )
+        self._numero_arbol = pagina.raw_get('/Parent').idnum
+        self._raiz = raiz
+        self._xref_anterior = xref_anterior
+
+        objetos = [(siguiente + i, fuente_estandar(nombre)) for i, nombre in enumerate(nombres_fuentes)]
+        objetos += [
+            (apertura, stream_pdf(b'q\n')),
+            (numero_pagina, serializada.getvalue()),
+        ]
+
+        partes = [base]
+        posicion = len(base)
+        self._posiciones = {}
+        for numero, cuerpo in objetos:
+            objeto = objeto_pdf(numero, cuerpo)
+            self._posiciones[numero] = posicion
+            partes.append(objeto)
+            posicion += len(objeto)
+
+        self._prefijo = b''.join(partes)
+        self._posicion_texto = posicion
+        self._numero_pagina = numero_pagina
+        self._primer_nuevo = siguiente
+        self._trailer = (
+            f'trailer\n<< /Size {self._numero_texto + 1} /Root {raiz} 0 R /Prev {xref_anterior} >>\nstartxref\n'
+        )
+
+    def _texto(self, nombre_asistente, documento_asistente):
+        operaciones = ['Q\n']
+        for elemento, texto, fuente, tamano, x in _elementos(self._diseno, nombre_asistente, documento_asistente):
+            r, g, b = elemento['color']
+            operaciones.append(
+                f'{r} {g} {b} rg BT /{self._recursos_fuentes[fuente]} {tamano:.2f} Tf '
+                f'{x:.2f} {elemento["y"]:.2f} Td ({texto_pdf(texto)}) Tj ET\n'
+            )
+        return ''.join(operaciones).encode('latin-1')
+
+    def generar(self, nombre_asistente, documento_asistente):
+        """Bytes del certificado del asistente."""
+        objeto_texto = objeto_pdf(self._numero_texto, stream_pdf(self._texto(nombre_asistente, documento_asistente)))
+        inicio_xref = self._posicion_texto + len(objeto_texto)
+
+        posiciones = [self._posiciones[numero] for numero in range(self._primer_nuevo, self._primer_nuevo + self._fijos)]
+        posiciones.append(self._posicion_texto)
+        xref = [
+            'xref\n',
+            f'{self._numero_pagina} 1\n',
+            entrada_xref(self._posiciones[self._numero_pagina]),
+            f'{self._primer_nuevo} {self._fijos + 1}\n',
+        ]
+        xref.extend(entrada_xref(p) for p in posiciones)
+        xref.append(f'{self._trailer}{inicio_xref}\n%%EOF\n')
+
+        return b''.join([self._prefijo, objeto_texto, ''.join(xref).encode('latin-1')])
+
+    def generar_combinado(self, asistentes):
+        """
+        PDF de varias páginas, una por asistente, como generador de bytes.
+
+        Todas las páginas comparten el contenido, los recursos y las fuentes de la plantilla
+        (escritos una sola vez); por asistente solo se escriben su texto y su página, y de cada
+        una se conserva únicamente su posición para la tabla xref. Así la memoria se mantiene
+        constante aunque el evento tenga miles de asistentes.
+
+        Args:
+            asistentes (iterable): tuplas (nombre, documento) en el orden de las páginas.
+        """
+        # Base + fuentes + apertura, sin la página de la plantilla redefinida
+        prefijo = self._prefijo[:self._posiciones[self._numero_pagina]]
+        yield prefijo
+
+        posicion = len(prefijo)
+        numero = self._numero_texto
+        posiciones = []
+        paginas = []
+        for nombre, documento in asistentes:
+            objeto_texto = objeto_pdf(numero, stream_pdf(self._texto(nombre, documento)))
+            objeto_pagina = objeto_pdf(
+                numero + 1,
+                self._pagina_comun
+                + f' /Parent {self._numero_arbol} 0 R /Contents [{self._contenidos_comunes} {numero} 0 R] >>'.encode('latin-1')
+            )
+            posiciones.extend([posicion, posicion + len(objeto_texto)])
+            paginas.append(numero + 1)
+            posicion += len(objeto_texto) + len(objeto_pagina)
+            numero += 2
+            yield objeto_texto + objeto_pagina
+
+        # El árbol de páginas de la plantilla se redefine con las páginas de los asistentes
+        kids = ' '.join(f'{pagina} 0 R' for pagina in paginas)
+        arbol = objeto_pdf(self._numero_arbol, f'<< /Type /Pages /Kids [{kids}] /Count {len(paginas)} >>')
+        inicio_xref = posicion + len(arbol)
+
+        xref = ['xref\n', f'{self._numero_arbol} 1\n', entrada_xref(posicion), f'{self._primer_nuevo} {self._fijos}\n']
+        xref.extend(entrada_xref(self._posiciones[n]) for n in range(self._primer_nuevo, self._primer_nuevo + self._fijos))
+        if posiciones:
+            xref.append(f'{self._numero_texto} {len(posiciones)}\n')
+            xref.extend(entrada_xref(p) for p in posiciones)
+        xref.append(
+            f'trailer\n<< /Size {numero} /Root {self._raiz} 0 R /Prev {self._xref_anterior} >>\n'
+            f'startxref\n{inicio_xref}\n%%EOF\n'
+        )
+        yield arbol + ''.join(xref).encode('latin-1')
+
+
+@lru_cache(maxsize=TAMANO_CACHE_PLANTILLAS)
+def _plantilla(ruta_plantilla_pdf, mtime_ns, tamano, diseno_json):
+    # mtime y tamaño forman parte de la clave: si la plantilla se reemplaza, se vuelve a preparar
+    return PlantillaCertificado(ruta_plantilla_pdf, json.loads(diseno_json))
+
+
+def obtener_plantilla(ruta_plantilla_pdf, diseno=None):
+    """Plantilla preparada desde la caché del proceso (LRU por ruta + mtime + tamaño + diseño)."""
+    estado = os.stat(ruta_plantilla_pdf)
+    diseno_json = json.dumps(diseno or normalizar_diseno(), sort_keys=True)
+    return _plantilla(ruta_plantilla_pdf, estado.st_mtime_ns, estado.st_size, diseno_json)
+
+
+def generar_certificado_pdf(nombre_asistente, documento_asistente, ruta_plantilla_pdf, diseno=None):
     """
     Genera un certificado PDF superponiendo el nombre y documento sobre una plantilla PDF existente.
     
@@ -18,52 +406,70 @@ def generar_certificado_pdf(nombre_asistente, documento_asistente, ruta_plantill
         nombre_asistente (str): Nombre completo del asistente.
         documento_asistente (str): Documento de identidad.
         ruta_plantilla_pdf (str): Ruta absoluta al archivo PDF plantilla en el servidor.
+        diseno (dict, opcional): Diseño normalizado (ver normalizar_diseno); por defecto el predeterminado.
         
     Returns:
         BytesIO: El contenido del PDF generado en memoria (listo para enviar o guardar).
     """
-    
-    # -------------------------------------------------------------------------
-    # CONFIGURACIÓN DE COORDENADAS (AJUSTAR AQUÍ MANUALMENTE SI CAMBIA LA PLANTILLA)
-    # -------------------------------------------------------------------------
-    # Las coordenadas están en puntos (1 punto = 1/72 pulgada).
-    # (0,0) es la esquina inferior izquierda.
-    
-    # Coordenadas para el NOMBRE DEL ASISTENTE
-    X_NOMBRE = 400   # Posición horizontal (centro aproximado)
-    Y_NOMBRE = 300   # Posición vertical
-    FONT_SIZE_NOMBRE = 24
-    
-    # Coordenadas para el DOCUMENTO (si se desea mostrar)
-    MOSTRAR_DOCUMENTO = True
-    X_DOC = 400
-    Y_DOC = 260
-    FONT_SIZE_DOC = 14
-    PREFIX_DOC = "Identificación: "
-    
-    # COLORES RGB (0-1)
-    COLOR_TEXTO = (0, 0, 0) # Negro
-    
-    # -------------------------------------------------------------------------
-    
+    diseno = diseno or normalizar_diseno()
+    if usa_fuentes_ttf(diseno):
+        # Las fuentes TTF se incrustan con reportlab
+        return generar_certificado_pdf_fusion(nombre_asistente, documento_asistente, ruta_plantilla_pdf, diseno)
+    try:
+        return io.BytesIO(obtener_plantilla(ruta_plantilla_pdf, diseno).generar(nombre_asistente, documento_asistente))
+    except Exception as e:
+        # Plantillas que no se pueden precompilar (p.ej. cifradas): fusión clásica con PyPDF2
+        logger.warning(f"No se pudo usar la plantilla precompilada ({e}); se fusiona con PyPDF2")
+        return generar_certificado_pdf_fusion(nombre_asistente, documento_asistente, ruta_plantilla_pdf, diseno)
+
+
+def huella_plantilla(ruta_plantilla_pdf):
+    """SHA-256 del contenido de la plantilla: identifica la versión con la que se generó un certificado."""
+    digest = hashlib.sha256()
+    with open(ruta_plantilla_pdf, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def generar_certificados_lote(ruta_plantilla_pdf, asistentes, diseno=None):
+    """
+    Trabajo de cada proceso del pool de certificados: genera los PDF de un lote de
+    (nombre, documento). La plantilla se prepara una vez por proceso (caché LRU).
+    Solo usa la ruta de la plantilla y el diseño ya normalizado (con las rutas de las fuentes
+    resueltas), así no depende de la configuración de Django en el proceso hijo.
+
+    Returns:
+        list: bytes del PDF o, si falló, el texto del error (mismo orden que 'asistentes').
+    """
+    resultados = []
+    for nombre, documento in asistentes:
+        try:
+            pdf = generar_certificado_pdf(nombre, documento, ruta_plantilla_pdf, diseno)
+            resultados.append(pdf.getvalue() if pdf else 'No se pudo generar el PDF')
+        except Exception as e:
+            resultados.append(f'Error al generar PDF: {e}')
+    return resultados
+
+
+def generar_certificado_pdf_fusion(nombre_asistente, documento_asistente, ruta_plantilla_pdf, diseno=None):
+    """
+    Genera el certificado leyendo la plantilla y fusionando un canvas de reportlab con PyPDF2
+    (sin caché). Se usa para los diseños con fuentes TTF, como respaldo y como referencia
+    en 'benchmark_certificados'.
+    """
+    diseno = diseno or normalizar_diseno()
     packet = io.BytesIO()
     
     # 1. Crear un canvas temporal para "dibujar" el texto dinámico
     # Usamos landscape(letter) como base, pero el tamaño final depende de la plantilla
     c = canvas.Canvas(packet, pagesize=landscape(letter))
     
-    # Configuración de fuente 
-    # (usamos Helvetica-Bold por defecto, se podría cargar una fuente externa si fuera necesario)
-    c.setFont("Helvetica-Bold", FONT_SIZE_NOMBRE)
-    c.setFillColorRGB(*COLOR_TEXTO)
-    
-    # Dibujar Nombre centrado en las coordenadas dadas
-    c.drawCentredString(X_NOMBRE, Y_NOMBRE, nombre_asistente.upper())
-    
-    # Dibujar Documento debajo del nombre
-    if MOSTRAR_DOCUMENTO:
-        c.setFont("Helvetica", FONT_SIZE_DOC)
-        c.drawCentredString(X_DOC, Y_DOC, f"{PREFIX_DOC}{documento_asistente}")
+    # Dibujar nombre y documento según el diseño (fuente, tamaño ya ajustado, color y alineación)
+    for elemento, texto, fuente, tamano, x in _elementos(diseno, nombre_asistente, documento_asistente):
+        c.setFont(fuente, tamano)
+        c.setFillColorRGB(*elemento['color'])
+        c.drawString(x, elemento['y'], texto)
     
     c.save()
     packet.seek(0)
@@ -73,21 +479,22 @@ def generar_certificado_pdf(nombre_asistente, documento_asistente, ruta_plantill
     
     # 3. Leer la plantilla original
     try:
-        existing_pdf = PdfReader(open(ruta_plantilla_pdf, "rb"))
-        output = PdfWriter()
-        
-        # Asumimos que la plantilla tiene 1 sola página relevante (la primera)
-        page = existing_pdf.pages[0]
-        
-        # 4. Fusionar: plantilla + texto
-        # merge_page superpone el contenido de 'new_pdf' sobre 'page'
-        page.merge_page(new_pdf.pages[0])
-        output.add_page(page)
-        
-        # 5. Guardar el resultado en un nuevo buffer de memoria
-        output_stream = io.BytesIO()
-        output.write(output_stream)
-        output_stream.seek(0)
+        with open(ruta_plantilla_pdf, "rb") as archivo:
+            existing_pdf = PdfReader(archivo)
+            output = PdfWriter()
+            
+            # Asumimos que la plantilla tiene 1 sola página relevante (la primera)
+            page = existing_pdf.pages[0]
+            
+            # 4. Fusionar: plantilla + texto
+            # merge_page superpone el contenido de 'new_pdf' sobre 'page'
+            page.merge_page(new_pdf.pages[0])
+            output.add_page(page)
+            
+            # 5. Guardar el resultado en un nuevo buffer de memoria
+            output_stream = io.BytesIO()
+            output.write(output_stream)
+            output_stream.seek(0)
         
         return output_stream
         
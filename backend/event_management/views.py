@@ -1,18 +1,83 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from .models import Asistente, CodigoQR, Evento, Inscripcion
-from .serializers import AsistenteSerializer, CodigoQRSerializer, EventoSerializer, InscripcionSerializer
+from .models import Asistente, CodigoQR, ContadorEvento, Evento, Inscripcion, TrabajoEnvio
+from .serializers import AsistenteSerializer, CodigoQRSerializer, EventoSerializer, InscripcionSerializer, TrabajoEnvioSerializer
 import pandas as pd
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from .email_utils import enviar_codigos_qr_email
+from . import qr_cache, qr_signing
+from .en_vivo import RenderizadorEventos, flujo as flujo_en_vivo
 import uuid
 from django.core.files.base import ContentFile
 import qrcode
 from io import BytesIO
-from django.db.models import Q
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.db import transaction
+from collections import defaultdict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Roles que operan los escáneres y pueden descargar datos de validación offline
+ROLES_ESCANER = ('Administrador', 'Asistente')
+
+
+def puede_escanear_offline(user, evento):
+    """Personal de escáner, o el Docente que creó el evento (solo para ese evento)."""
+    return user.role in ROLES_ESCANER or (user.role == 'Docente' and evento.creado_por_id == user.pk)
+
+
+def estacion_de(request):
+    """Nombre de la estación (puerta o punto de entrega) que envía la petición de escaneo, o ''."""
+    return str(request.data.get('estacion') or '').strip()[:100]
+
+
+def normalizar_escaneos(escaneos):
+    """
+    Normaliza una cola de escaneos enviada por un dispositivo: [{'codigo', 'fecha_escaneo'}, ...].
+
+    Returns:
+        tuple: (orden, fechas_por_codigo)
+            orden: lista de (texto recibido, UUID o None si no es un UUID ni un contenido firmado
+            válido) en el orden original.
+            fechas_por_codigo: {UUID: fecha de escaneo}; si un código se repite se conserva
+            el escaneo más temprano. Las fechas ausentes, inválidas o futuras se reemplazan
+            por la hora del servidor.
+    """
+    ahora = timezone.now()
+    fechas_por_codigo = {}
+    orden = []
+
+    for escaneo in escaneos:
+        texto = str(escaneo.get('codigo', '') if isinstance(escaneo, dict) else escaneo).strip()
+        if qr_signing.es_firmado(texto):
+            # Contenido firmado: una firma inválida se descarta sin consultar la BD
+            datos = qr_signing.verificar(texto)
+            codigo = datos['codigo'] if datos else None
+        else:
+            try:
+                codigo = uuid.UUID(texto)
+            except ValueError:
+                codigo = None
+        if codigo is None:
+            orden.append((texto, None))
+            continue
+
+        fecha = parse_datetime(str(escaneo.get('fecha_escaneo') or '')) if isinstance(escaneo, dict) else None
+        if fecha and timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+        if not fecha or fecha > ahora:
+            fecha = ahora
+
+        if codigo not in fechas_por_codigo or fecha < fechas_por_codigo[codigo]:
+            fechas_por_codigo[codigo] = fecha
+        orden.append((texto, codigo))
+
+    return orden, fechas_por_codigo
 
 # -----------------------------------------------------------------------------
 # EVENTO VIEWSET
@@ -116,46 +181,62 @@ class EventoViewSet(viewsets.ModelViewSet):
         - Asistencia real (basada en QRs de entrada usados)
         - Refrigerios entregados
         - Desglose por dependencia
+        Se leen de los contadores del evento (ver estadisticas.py).
         """
+        from . import estadisticas
+
         evento = self.get_object()
-        total_inscritos = evento.inscripciones.count()
-        
-        # Estadísticas de QRs
-        qrs = CodigoQR.objects.filter(evento=evento)
-        qrs_entregados = qrs.count()
-        qrs_usados = qrs.filter(usado=True).count()
-        
-        # Asistencia Real = Códigos de tipo 'ENTRADA' que han sido usados
-        asistentes_reales = qrs.filter(tipo_comida='ENTRADA', usado=True).count()
-        
-        # Estadísticas de Refrigerios
-        refrigerios_entregados = qrs.filter(tipo_comida='REFRIGERIO', usado=True).count()
-        
-        # Desglose por Dependencia (solo de los que asistieron)
-        asistencia_qrs = qrs.filter(tipo_comida='ENTRADA', usado=True).select_related('usuario', 'asistente')
-        
-        dependencias_stats = {}
-        
-        for qr in asistencia_qrs:
-            dep = "Sin Definir"
-            if qr.usuario and qr.usuario.dependency:
-                dep = qr.usuario.dependency
-            elif qr.asistente and qr.asistente.sede:
-                dep = qr.asistente.sede
-            
-            # Normalizar texto (Title Case)
-            dep = dep.strip().title() if dep else "Sin Definir"
-            
-            dependencias_stats[dep] = dependencias_stats.get(dep, 0) + 1
+        return Response(estadisticas.calcular(evento))
 
-        return Response({
-            'total_inscritos': total_inscritos,
-            'asistentes_reales': asistentes_reales,
-            'porcentaje_asistencia': (asistentes_reales / total_inscritos * 100) if total_inscritos > 0 else 0,
-            'refrigerios_entregados': refrigerios_entregados,
-            'total_refrigerios_disponibles': evento.cantidad_refrigerios,
-            'asistencia_por_dependencia': dependencias_stats
-        })
+    @action(detail=True, methods=['get'])
+    def flujo_escaneos(self, request, pk=None):
+        """
+        Escaneos redimidos por intervalo (?intervalo=1|5|15 minutos), tipo y estación, para
+        dimensionar las puertas durante el evento. Acepta ?desde= y ?hasta= (ISO 8601).
+        """
+        from . import estadisticas
+
+        evento = self.get_object()
+        try:
+            intervalo = int(request.query_params.get('intervalo', 1))
+        except ValueError:
+            intervalo = None
+
+        fechas = {}
+        for nombre in ('desde', 'hasta'):
+            texto = request.query_params.get(nombre)
+            if texto:
+                fecha = parse_datetime(texto)
+                if fecha is None:
+                    return Response({'error': f"Fecha '{nombre}' inválida"}, status=status.HTTP_400_BAD_REQUEST)
+                fechas[nombre] = fecha if timezone.is_aware(fecha) else timezone.make_aware(fecha)
+
+        try:
+            series = estadisticas.flujo_escaneos(evento, intervalo, **fechas)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'intervalo': intervalo, 'series': series})
+
+    @action(detail=True, methods=['get'], renderer_classes=[JSONRenderer, RenderizadorEventos])
+    def en_vivo(self, request, pk=None):
+        """
+        Flujo Server-Sent Events del dashboard: las estadísticas al conectarse y luego un
+        mensaje por cada redención (quién escaneó, qué tipo y los contadores actualizados).
+        Al reconectarse, el encabezado Last-Event-ID recupera los mensajes perdidos.
+        """
+        from django.http import StreamingHttpResponse
+
+        evento = self.get_object()
+        try:
+            ultimo_id = int(request.headers.get('Last-Event-ID', ''))
+        except ValueError:
+            ultimo_id = None
+
+        response = StreamingHttpResponse(flujo_en_vivo(evento, ultimo_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Evita que un proxy (p.ej. nginx) acumule el flujo antes de entregarlo
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
     @action(detail=True, methods=['post'])
     def generar_qrs_masivo(self, request, pk=None):
@@ -164,8 +245,6 @@ class EventoViewSet(viewsets.ModelViewSet):
         Crea QRs de Entrada y de los tipos de comida configurados.
         """
         evento = self.get_object()
-        inscripciones = evento.inscripciones.all()
-        generated_count = 0
         
         types = ['ENTRADA']
         
@@ -179,180 +258,378 @@ class EventoViewSet(viewsets.ModelViewSet):
         # Si no, usar lógica simple por defecto
         elif evento.requiere_refrigerio:
             types.append('REFRIGERIO')
-            
-        for inscripcion in inscripciones:
-            user = inscripcion.usuario
-            for tipo in types:
-                _, created = CodigoQR.objects.get_or_create(
-                    evento=evento,
-                    usuario=user,
-                    tipo_comida=tipo,
-                    defaults={'asistente': None}
-                )
-                if created:
-                    generated_count += 1
-                    
-        return Response({'message': f'Se generaron {generated_count} códigos QR nuevos.'})
+        types = list(dict.fromkeys(types))
+
+        # Operación de conjuntos: (inscritos × tipos) - pares (usuario, tipo) ya existentes.
+        # Una consulta para los existentes, otra para los inscritos y bulk_create por lotes.
+        # El bloqueo del evento serializa las generaciones concurrentes, así los códigos nuevos
+        # son exactamente los que se suman a los contadores del evento.
+        with transaction.atomic():
+            list(Evento.objects.select_for_update().filter(pk=evento.pk).values_list('pk'))
+            qrs_evento = CodigoQR.objects.filter(evento=evento, usuario__isnull=False)
+            existentes = set(qrs_evento.values_list('usuario_id', 'tipo_comida'))
+            usuarios = evento.inscripciones.values_list('usuario_id', 'usuario__dependency')
+
+            nuevos = []
+            emitidos = defaultdict(int)
+            for usuario_id, dependencia in usuarios.iterator(chunk_size=2000):
+                dependencia = ContadorEvento.normalizar_dependencia(dependencia)
+                for tipo in types:
+                    if (usuario_id, tipo) not in existentes:
+                        nuevos.append(CodigoQR(
+                            evento=evento, usuario_id=usuario_id, tipo_comida=tipo, dependencia_contador=dependencia
+                        ))
+                        emitidos[(evento.pk, tipo, dependencia)] += 1
+
+            CodigoQR.objects.bulk_create(nuevos, batch_size=1000)
+            ContadorEvento.sumar({clave: (total, 0) for clave, total in emitidos.items()})
+            generated_count = len(nuevos)
+
+        # Si el evento ya estaba precargado para escaneo, incluir los códigos nuevos
+        if generated_count and qr_cache.evento_caliente(evento.pk):
+            qr_cache.calentar_evento(evento)
+
+        return Response({
+            'message': f'Se generaron {generated_count} códigos QR nuevos.',
+            'generados': generated_count,
+            'existentes': len(existentes),
+            'tipos': types
+        })
+
+    @action(detail=True, methods=['post', 'delete'])
+    def precargar_escaneo(self, request, pk=None):
+        """
+        Precarga (POST) o libera (DELETE) en caché los códigos QR del evento para que el
+        escaneo responda sin consultar la base de datos. Se recomienda ejecutarlo después
+        de 'generar_qrs_masivo' y antes de abrir las puertas.
+        """
+        evento = self.get_object()
+
+        if request.method == 'DELETE':
+            qr_cache.enfriar_evento(evento)
+            return Response({'message': 'Precarga del evento eliminada.'})
+
+        total = qr_cache.calentar_evento(evento)
+        return Response({'message': f'Se precargaron {total} códigos QR.', 'total': total})
+
+    @action(detail=True, methods=['get'])
+    def escarapelas_pdf(self, request, pk=None):
+        """
+        Descarga un PDF imprimible con las escarapelas QR del evento (nombre, ID y tipo),
+        varias por página (?columnas=2&filas=4) y opcionalmente de un solo tipo (?tipo=ENTRADA).
+        El PDF se transmite página por página para mantener la memoria constante.
+        """
+        from django.http import StreamingHttpResponse
+        from .badges import generar_escarapelas_pdf
+
+        evento = self.get_object()
+
+        try:
+            columnas = min(max(int(request.query_params.get('columnas', 2)), 1), 4)
+            filas = min(max(int(request.query_params.get('filas', 4)), 1), 6)
+        except ValueError:
+            return Response({'error': 'Columnas y filas deben ser números'}, status=status.HTTP_400_BAD_REQUEST)
+
+        qrs = CodigoQR.objects.filter(evento=evento).select_related('usuario', 'asistente')
+        tipo = request.query_params.get('tipo')
+        if tipo:
+            qrs = qrs.filter(tipo_comida=tipo)
+        qrs = qrs.order_by('usuario__full_name', 'asistente__nombre_completo', 'tipo_comida')
+
+        response = StreamingHttpResponse(
+            generar_escarapelas_pdf(qrs.iterator(chunk_size=500), columnas, filas),
+            content_type='application/pdf'
+        )
+        response['Content-Disposition'] = f'attachment; filename="escarapelas_{evento.id}.pdf"'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def manifiesto(self, request, pk=None):
+        """
+        Descarga el manifiesto offline del evento (JSON en columnas comprimido con gzip)
+        para que los escáneres sigan validando sin red. La versión va en 'X-Manifiesto-Version'.
+        """
+        from django.http import HttpResponse
+        from .manifest import construir_manifiesto
+
+        evento = self.get_object()
+        if not puede_escanear_offline(request.user, evento):
+            return Response({'error': 'No tienes permisos para realizar esta acción'}, status=status.HTTP_403_FORBIDDEN)
+
+        contenido, version = construir_manifiesto(evento)
+
+        response = HttpResponse(contenido, content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="manifiesto_{evento.id}_{version}.json.gz"'
+        response['X-Manifiesto-Version'] = str(version)
+        return response
 
     @action(detail=True, methods=['post'])
-    def enviar_emails_evento(self, request, pk=None):
+    def sincronizar_manifiesto(self, request, pk=None):
         """
-        Envía los códigos QR por correo electrónico a todos los inscritos que tengan email.
+        Sincronización delta de un escáner offline.
+        Recibe 'version' (la del último manifiesto o delta recibido) y 'redenciones'
+        ([{'codigo', 'fecha_escaneo'}, ...]) hechas sin conexión por la 'estacion'. Aplica las redenciones
+        (si dos dispositivos redimieron el mismo código gana la 'fecha_uso' más temprana)
+        y devuelve solo las filas modificadas desde 'version' junto con la nueva versión.
+        El estado de cada redención es 'success', 'conflicto_ganado' (el código ya estaba sincronizado,
+        pero este dispositivo lo escaneó primero: queda su fecha), 'usado' o 'desconocido'.
         """
+        from .manifest import cambios_desde
+
         evento = self.get_object()
-        
-        count = 0
-        errors = 0
-        error_details = []
-        
+        if not puede_escanear_offline(request.user, evento):
+            return Response({'error': 'No tienes permisos para realizar esta acción'}, status=status.HTTP_403_FORBIDDEN)
+
         try:
-             inscripciones = evento.inscripciones.all()
-             for inscripcion in inscripciones:
-                 user = inscripcion.usuario
-                 
-                 if not user.email:
-                     continue
-
-                 # Obtener QRs para este evento y usuario
-                 qrs = CodigoQR.objects.filter(evento=evento, usuario=user)
-                 
-                 if qrs.exists():
-                     # Clase adaptadora para que la función de envío de email funcione con el modelo User
-                     # (Originalmente estaba hecha solo para Asistente legacy)
-                     class AsistenteAdapter:
-                         def __init__(self, u):
-                             self.nombre_completo = u.full_name
-                             self.correo = u.email
-                             self.identificacion = u.id
-                     
-                     adapter = AsistenteAdapter(user)
-                     
-                     result = enviar_codigos_qr_email(adapter, evento, qrs)
-                     if result is True:
-                         count += 1
-                     else:
-                         errors += 1
-                         error_details.append(f"{user.email}: {result}")
-             
-             return Response({
-                 'message': f'Proceso finalizado. Emails enviados: {count}. Errores: {errors}',
-                 'sent_count': count,
-                 'error_count': errors,
-                 'error_details': error_details
-             })
-        except Exception as e:
-            print(f"CRITICAL ERROR in enviar_emails_evento: {str(e)}")
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            version = int(request.data.get('version'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Versión del manifiesto requerida'}, status=status.HTTP_400_BAD_REQUEST)
+
+        redenciones = request.data.get('redenciones') or []
+        if not isinstance(redenciones, list):
+            return Response({'error': 'Las redenciones deben ser una lista'}, status=status.HTTP_400_BAD_REQUEST)
+
+        orden, fechas_por_codigo = normalizar_escaneos(redenciones)
+        resultados_db = CodigoQR.redimir_en_lote(
+            fechas_por_codigo, evento=evento, conservar_mas_temprana=True, estacion=estacion_de(request)
+        ) if fechas_por_codigo else {}
+        # Todos los códigos reportados quedan usados (también los corregidos por conflicto)
+        qr_cache.registrar_redenciones({
+            codigo: qr_obj.fecha_uso for codigo, (qr_obj, redimido) in resultados_db.items()
+        })
+
+        resultados = []
+        for texto, codigo in orden:
+            if codigo not in resultados_db:
+                resultados.append({'codigo': texto, 'status': 'desconocido'})
+                continue
+            qr_obj, redimido = resultados_db[codigo]
+            if redimido:
+                estado = 'success'
+            elif qr_obj.fecha_uso == fechas_por_codigo[codigo]:
+                estado = 'conflicto_ganado'
+            else:
+                estado = 'usado'
+            resultados.append({'codigo': texto, 'status': estado, 'fecha_uso': qr_obj.fecha_uso})
+
+        cambios, nueva_version = cambios_desde(evento, version)
+        return Response({'version': nueva_version, 'resultados': resultados, 'cambios': cambios})
+
+    @action(detail=True, methods=['post'])
+    def enviar_emails_evento(self, request, pk=None):
+        """
+        Encola el envío de los códigos QR por correo electrónico a todos los inscritos que tengan email.
+        Responde de inmediato con el trabajo creado; el avance se consulta en /api/trabajos/<id>/
+        y el envío lo realiza el comando 'procesar_envios'.
+        """
+        from .jobs import encolar_envio
+
+        evento = self.get_object()
+        trabajo, creado = encolar_envio(evento, request.user)
+
+        return Response({
+            'message': 'Envío de correos encolado.' if creado else 'Ya hay un envío en curso para este evento.',
+            'trabajo_id': trabajo.id,
+            'trabajo': TrabajoEnvioSerializer(trabajo).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def reenviar_fallidos(self, request, pk=None):
+        """
+        Encola el reenvío solo de los correos que fallaron (según la bandeja de salida).
+        Body opcional: {"tipo": "QR" | "CERTIFICADO"} (por defecto QR).
+        """
+        from . import outbox
+        from .jobs import encolar_envio
+
+        evento = self.get_object()
+        tipo = request.data.get('tipo', 'QR')
+        if tipo not in dict(TrabajoEnvio.TIPO_CHOICES):
+            return Response({'error': f'Tipo de envío no válido: {tipo}'}, status=status.HTTP_400_BAD_REQUEST)
+        if not outbox.fallidos(evento, tipo).exists():
+            return Response({'error': 'No hay correos fallidos para reenviar.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        trabajo, creado = encolar_envio(evento, request.user, tipo=tipo, solo_fallidos=True)
+
+        return Response({
+            'message': 'Reenvío de correos fallidos encolado.' if creado else 'Ya hay un envío en curso para este evento.',
+            'trabajo_id': trabajo.id,
+            'trabajo': TrabajoEnvioSerializer(trabajo).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def errores_envio(self, request, pk=None):
+        """
+        Correos cuyo último intento de envío falló, desde la bandeja de salida.
+        Parámetro opcional: ?tipo=QR|CERTIFICADO (por defecto QR).
+        Solo para administradores y el creador del evento (incluye correos de los asistentes).
+        """
+        from . import outbox
+
+        evento = self.get_object()
+        if request.user.role != 'Administrador' and evento.creado_por_id != request.user.pk:
+            return Response({'error': 'No autorizado.'}, status=status.HTTP_403_FORBIDDEN)
+        tipo = request.query_params.get('tipo', 'QR')
+        error_count, error_details = outbox.detalle_errores(evento, tipo)
+        return Response({
+            'error_count': error_count,
+            'error_details': error_details
+        })
 
     @action(detail=True, methods=['post'])
     def generar_certificados_masivo(self, request, pk=None):
         """
-        Genera y envía certificados PDF a los asistentes que marcaron asistencia (asistio=True).
-        Requiere que el evento tenga una plantilla PDF cargada.
+        Encola la generación y el envío de certificados PDF a los asistentes que marcaron
+        asistencia (asistio=True). Requiere que el evento tenga una plantilla PDF cargada.
+        Responde de inmediato con el trabajo creado; el avance se consulta en /api/trabajos/<id>/
+        y los PDF los genera y envía el comando 'procesar_envios'.
         """
+        from .jobs import encolar_envio
+
         evento = self.get_object()
         
-        # 1. Actualizar plantilla si se envía una nueva en la petición
-        plantilla = request.FILES.get('plantilla')
-        if plantilla:
-            evento.plantilla_certificado = plantilla
-            evento.save()
+        # 1. Actualizar plantilla y diseño si se envían en la petición
+        error = self._actualizar_certificado(request, evento)
+        if error:
+            return error
             
         if not evento.plantilla_certificado:
             return Response({'error': 'No hay plantilla de certificado configurada para este evento.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # 2. Filtrar solo los que asistieron
-        inscripciones = evento.inscripciones.filter(asistio=True)
-        
-        generated_count = 0
-        email_sent_count = 0
-        errors = []
-        
-        from .utils import generar_certificado_pdf
-        from django.core.mail import EmailMessage
-        
-        ruta_plantilla = evento.plantilla_certificado.path
+        # 2. Encolar el envío (solo los que asistieron y tienen correo)
+        trabajo, creado = encolar_envio(evento, request.user, tipo='CERTIFICADO')
 
-        for inscripcion in inscripciones:
-            user = inscripcion.usuario
-            if not user.email:
-                continue
-                
-            try:
-                # Generar PDF en memoria usando la utilidad
-                pdf_stream = generar_certificado_pdf(
-                    user.full_name, 
-                    user.id,
-                    ruta_plantilla
-                )
-                
-                if pdf_stream:
-                    generated_count += 1
-                    
-                    # Preparar Email con adjunto
-                    subject = f"Certificado de Asistencia - {evento.titulo}"
-                    body = f"Hola {user.full_name},\n\nAdjunto encontrarás tu certificado de asistencia al evento '{evento.titulo}'.\n\n¡Gracias por participar!"
-                    
-                    from django.conf import settings
-                    email = EmailMessage(
-                        subject,
-                        body,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [user.email],
-                    )
-                    
-                    # Adjuntar PDF
-                    filename = f"Certificado_{user.full_name.replace(' ', '_')}.pdf"
-                    email.attach(filename, pdf_stream.read(), 'application/pdf')
-                    
-                    # Enviar
-                    email.send()
-                    email_sent_count += 1
-                    
-            except Exception as e:
-                errors.append(f"{user.email}: {str(e)}")
-                
         return Response({
-            'message': f'Proceso finalizado. Certificados generados: {generated_count}. Emails enviados: {email_sent_count}.',
-            'errors': errors
-        })
+            'message': 'Envío de certificados encolado.' if creado else 'Ya hay un envío de certificados en curso para este evento.',
+            'trabajo_id': trabajo.id,
+            'trabajo': TrabajoEnvioSerializer(trabajo).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def _actualizar_certificado(self, request, evento):
+        """
+        Aplica la plantilla ('plantilla', solo si sus bytes cambiaron) y el diseño ('diseno',
+        objeto JSON o texto JSON en multipart) enviados en la petición.
+        Devuelve una respuesta de error o None.
+        """
+        import json
+        from . import certificados
+
+        diseno = request.data.get('diseno')
+        if diseno not in (None, ''):
+            try:
+                if isinstance(diseno, str):
+                    diseno = json.loads(diseno)
+                certificados.diseno_evento(evento, diseno)
+            except ValueError as e:
+                return Response({'error': f'Diseño no válido: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+            if diseno != evento.diseno_certificado:
+                evento.diseno_certificado = diseno
+                evento.save(update_fields=['diseno_certificado'])
+
+        plantilla = request.FILES.get('plantilla')
+        if plantilla:
+            certificados.actualizar_plantilla(evento, plantilla)
+        return None
 
     @action(detail=True, methods=['post'])
     def ver_previsualizacion_certificado(self, request, pk=None):
         """
         Genera una vista previa del certificado con datos dummy para verificar alineación.
+        Acepta la plantilla y el diseño a probar (se guardan en el evento); la vista previa se
+        guarda en caché por (plantilla, diseño), así repetirla sin cambios es inmediato.
         """
         evento = self.get_object()
         from django.http import HttpResponse
-        from .utils import generar_certificado_pdf
+        from . import certificados
         
-        # Guardar plantilla temporal si se envía
-        plantilla_file = request.FILES.get('plantilla')
-        if plantilla_file:
-            evento.plantilla_certificado = plantilla_file
-            evento.save()
+        error = self._actualizar_certificado(request, evento)
+        if error:
+            return error
             
         if not evento.plantilla_certificado:
             return Response({'error': 'No hay plantilla configurada.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        ruta_plantilla = evento.plantilla_certificado.path
-
-        # Datos de prueba
-        nombre_preview = "JUAN PEREZ (VISTA PREVIA)"
-        doc_preview = "123456789"
-        
         try:
-            pdf_stream = generar_certificado_pdf(nombre_preview, doc_preview, ruta_plantilla)
-            
-            if pdf_stream:
-                response = HttpResponse(pdf_stream.read(), content_type='application/pdf')
-                response['Content-Disposition'] = 'inline; filename="certificado_preview.pdf"'
-                return response
-            else:
-                return Response({'error': 'Error al generar PDF (stream vacío)'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            pdf = certificados.vista_previa(evento, certificados.diseno_evento(evento))
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = 'inline; filename="certificado_preview.pdf"'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def certificado(self, request, pk=None):
+        """
+        Descarga el certificado de asistencia del usuario actual (los administradores pueden
+        indicar ?usuario=<id>). Se genera la primera vez y después se sirve desde el storage,
+        con ETag (304 si no cambió) y soporte de descargas parciales (Range).
+        Solo se regenera si cambian la plantilla, el diseño o el nombre del asistente.
+        """
+        from . import certificados
+
+        evento = self.get_object()
+        if not evento.plantilla_certificado:
+            return Response({'error': 'El evento no tiene plantilla de certificado.'}, status=status.HTTP_404_NOT_FOUND)
+
+        id_usuario = request.query_params.get('usuario', request.user.pk)
+        if str(id_usuario) != str(request.user.pk) and request.user.role != 'Administrador':
+            return Response({'error': 'No autorizado.'}, status=status.HTTP_403_FORBIDDEN)
+
+        inscripcion = evento.inscripciones.select_related('usuario').filter(usuario_id=id_usuario, asistio=True).first()
+        if inscripcion is None:
+            return Response({'error': 'No hay certificado: la asistencia al evento no está registrada.'}, status=status.HTTP_404_NOT_FOUND)
+
+        user = inscripcion.usuario
+        try:
+            ruta, clave = certificados.obtener(evento, user)
+        except Exception as e:
+            return Response({'error': f'Error al generar el certificado: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return certificados.respuesta_descarga(request, ruta, clave, certificados.nombre_archivo(user))
+
+    @action(detail=True, methods=['get'])
+    def exportar_certificados(self, request, pk=None):
+        """
+        Descarga todos los certificados del evento (asistentes con asistencia registrada) como
+        un ZIP (?formato=zip, por defecto) o un solo PDF con una página por asistente (?formato=pdf).
+        La respuesta se transmite a medida que se generan los certificados, con memoria constante.
+        Solo para administradores y el creador del evento.
+        """
+        from django.http import StreamingHttpResponse
+        from . import certificados
+
+        evento = self.get_object()
+        if request.user.role != 'Administrador' and evento.creado_por_id != request.user.pk:
+            return Response({'error': 'No autorizado.'}, status=status.HTTP_403_FORBIDDEN)
+        if not evento.plantilla_certificado:
+            return Response({'error': 'No hay plantilla de certificado configurada para este evento.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        formato = request.query_params.get('formato', 'zip').lower()
+        usuarios = (
+            inscripcion.usuario for inscripcion in
+            evento.inscripciones.filter(asistio=True).select_related('usuario')
+            .order_by('usuario__full_name', 'pk').iterator(chunk_size=500)
+        )
+
+        if formato == 'zip':
+            contenido, tipo = certificados.zip_certificados(evento, usuarios), 'application/zip'
+        elif formato == 'pdf':
+            # La plantilla se prepara antes de empezar a transmitir para poder responder el error
+            try:
+                contenido, tipo = certificados.pdf_combinado(evento, usuarios), 'application/pdf'
+            except Exception as e:
+                return Response(
+                    {'error': f'No se pudo generar el PDF combinado ({str(e)}); use el formato zip.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            return Response({'error': 'Formato no soportado (zip o pdf)'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(contenido, content_type=tipo)
+        response['Content-Disposition'] = f'attachment; filename="certificados_{evento.id}.{formato}"'
+        return response
+
     @action(detail=True, methods=['get'])
     def exportar_asistentes_excel(self, request, pk=None):
         """
@@ -390,6 +667,30 @@ class EventoViewSet(viewsets.ModelViewSet):
 
         return Response(response)
 
+# -----------------------------------------------------------------------------
+# TRABAJOS DE ENVÍO VIEWSET
+# -----------------------------------------------------------------------------
+
+class TrabajoEnvioViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Consulta del avance de los envíos masivos en segundo plano (enviados/fallidos/restantes).
+    Permite filtrar por evento con ?evento=<id>.
+    Los administradores ven todos los trabajos; los demás, solo los de eventos que crearon
+    (los errores incluyen los correos de los asistentes).
+    """
+    queryset = TrabajoEnvio.objects.all().select_related('evento')
+    serializer_class = TrabajoEnvioSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.role != 'Administrador':
+            queryset = queryset.filter(evento__creado_por=self.request.user)
+        evento_id = self.request.query_params.get('evento')
+        if evento_id:
+            queryset = queryset.filter(evento_id=evento_id)
+        return queryset
+
 # -----------------------------------------------------------------------------
 # ASISTENTE LEGACY VIEWSET
 # -----------------------------------------------------------------------------
@@ -504,11 +805,10 @@ class AsistenteViewSet(viewsets.ModelViewSet):
         if not evento:
              return Response({'error': 'No se encontró un evento asociado a estos códigos QR'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            enviar_codigos_qr_email(asistente, evento, qrs)
-            return Response({'message': f'Códigos QR enviados a {asistente.correo}'})
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        resultado = enviar_codigos_qr_email(asistente, evento, qrs)
+        if resultado is not True:
+            return Response({'error': resultado or 'No se pudo enviar el correo'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({'message': f'Códigos QR enviados a {asistente.correo}'})
 
 # -----------------------------------------------------------------------------
 # CODIGO QR VIEWSET
@@ -522,76 +822,208 @@ class CodigoQRViewSet(viewsets.ModelViewSet):
     serializer_class = CodigoQRSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=True, methods=['get'])
+    def generar_imagen(self, request, pk=None):
+        """
+        Devuelve la imagen del QR (?formato=png|svg, ?tamano=1-40) desde la caché de imágenes.
+        El ETag es la clave de contenido, así que la respuesta es inmutable: los reenvíos,
+        vistas previas y el frontend nunca rasterizan dos veces el mismo código.
+        """
+        from django.http import HttpResponse, HttpResponseNotModified
+        from .qr_images import FORMATOS, BOX_SIZE, obtener_imagen_qr
+
+        qr_obj = self.get_object()
+
+        formato = request.query_params.get('formato', 'png').lower()
+        if formato not in FORMATOS:
+            return Response({'error': 'Formato no soportado (png o svg)'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            box_size = min(max(int(request.query_params.get('tamano', BOX_SIZE)), 1), 40)
+        except ValueError:
+            return Response({'error': 'Tamaño inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        datos, clave = obtener_imagen_qr(qr_signing.contenido_qr(qr_obj), formato, box_size)
+        etag = f'"{clave}"'
+
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(datos, content_type=FORMATOS[formato])
+            response['Content-Disposition'] = f'inline; filename="QR_{qr_obj.tipo_comida}.{formato}"'
+        response['ETag'] = etag
+        # 'private': la imagen requiere autenticación y no debe quedar en cachés compartidas
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+
+    def _buscar_por_identificacion(self, identificacion, evento_id=None, tipo=None):
+        """
+        Búsqueda manual por cédula: primer QR disponible (no usado) del Usuario o, si no hay,
+        del Asistente legacy con esa identificación. Son dos consultas separadas (cada una
+        resuelta por su índice compuesto) en lugar de un OR entre dos joins, limitadas al
+        evento y tipo de la estación cuando se conocen.
+        """
+        filtros = {}
+        if evento_id:
+            filtros['evento_id'] = evento_id
+        if tipo:
+            filtros['tipo_comida'] = tipo
+
+        qrs = CodigoQR.objects.filter(**filtros).select_related('usuario', 'asistente', 'evento').order_by('usado', 'fecha_creacion')
+        return (
+            qrs.filter(usuario_id=identificacion).first()
+            or qrs.filter(asistente__identificacion=identificacion).first()
+        )
+
     @action(detail=False, methods=['post'])
     def escanear(self, request):
         """
         Endpoint crítico para validar códigos QR.
-        Recibe un 'codigo' que puede ser un UUID o una Cédula (entrada manual).
+        Recibe un 'codigo' que puede ser un UUID, un contenido firmado (ver qr_signing)
+        o una Cédula (entrada manual).
+        Opcionalmente recibe el 'evento' que atiende la estación (y el 'tipo' que valida):
+        si ese evento está precargado en caché, la búsqueda y los rechazos se resuelven sin
+        consultar la BD, y la búsqueda manual por cédula se limita a ese evento y tipo.
+        La 'estacion' (p.ej. 'Puerta 1') queda registrada en el código redimido.
         """
         codigo = request.data.get('codigo')
         if not codigo:
             return Response({'error': 'Código requerido'}, status=status.HTTP_400_BAD_REQUEST)
 
+        evento_id = request.data.get('evento')
+
+        # Contenido firmado: se valida la firma (y el evento) sin consultar la BD
+        if qr_signing.es_firmado(codigo):
+            datos = qr_signing.verificar(codigo)
+            if not datos:
+                return Response({'error': 'Código QR inválido o alterado'}, status=status.HTTP_404_NOT_FOUND)
+            if evento_id and str(datos['evento_id']) != str(evento_id):
+                return Response({'error': 'El código no corresponde a este evento'}, status=status.HTTP_404_NOT_FOUND)
+            codigo = str(datos['codigo'])
+
         try:
             qr_obj = None
-            # 1. Intentar buscar por UUID (QR estándar del sistema)
-            try:
-                qr_obj = CodigoQR.objects.select_related('usuario', 'asistente', 'evento').get(codigo=codigo)
-            except (ValidationError, ValueError, CodigoQR.DoesNotExist):
-                # 2. Si falla (ej. entrada manual de cédula), buscar por ID de Usuario o Asistente
-                # Priorizamos encontrar un QR disponible (no usado) de tipo ENTRADA
-                qr_obj = CodigoQR.objects.filter(
-                    (Q(usuario__id=codigo) | Q(asistente__identificacion=codigo))
-                ).select_related('usuario', 'asistente', 'evento').order_by('usado', 'fecha_creacion').first()
-
-            if not qr_obj:
-                 return Response({'error': 'Código o Identificación no válida'}, status=status.HTTP_404_NOT_FOUND)
-            
-            # Construir información de respuesta normalizada
-            attendant_info = {}
-            if qr_obj.usuario:
-                attendant_info = {
-                    'nombre_completo': qr_obj.usuario.full_name,
-                    'identificacion': qr_obj.usuario.id,
-                    'sede': qr_obj.usuario.dependency or 'N/A',
-                    'email': qr_obj.usuario.email
-                }
-            elif qr_obj.asistente:
-                attendant_info = {
-                    'nombre_completo': qr_obj.asistente.nombre_completo,
-                    'identificacion': qr_obj.asistente.identificacion,
-                    'sede': qr_obj.asistente.sede or 'N/A',
-                    'email': qr_obj.asistente.correo
-                }
+            # 0. Evento precargado: responder desde la caché
+            entrada = qr_cache.obtener(codigo)
+            if entrada is not None:
+                qr_obj = qr_cache.qr_desde_entrada(entrada)
+                attendant_info = entrada['asistente']
+                evento_titulo = entrada['evento']
             else:
-                attendant_info = {
-                    'nombre_completo': 'Desconocido',
-                    'identificacion': 'N/A',
-                    'sede': 'N/A'
-                }
-
-            # Validar si ya fue usado
-            if qr_obj.usado:
+                # En un evento precargado la caché contiene todos sus códigos válidos
+                if qr_cache.normalizar_codigo(codigo) and qr_cache.evento_caliente(evento_id):
+                    return Response({'error': 'Código o Identificación no válida'}, status=status.HTTP_404_NOT_FOUND)
+
+                # 1. Intentar buscar por UUID (QR estándar del sistema)
+                try:
+                    qr_obj = CodigoQR.objects.select_related('usuario', 'asistente', 'evento').get(codigo=codigo)
+                except (ValidationError, ValueError, CodigoQR.DoesNotExist):
+                    # 2. Si falla (ej. entrada manual de cédula), buscar por ID de Usuario o Asistente
+                    qr_obj = self._buscar_por_identificacion(codigo, evento_id, request.data.get('tipo'))
+
+                if not qr_obj:
+                     return Response({'error': 'Código o Identificación no válida'}, status=status.HTTP_404_NOT_FOUND)
+
+                # Construir información de respuesta normalizada
+                attendant_info = qr_obj.datos_asistente()
+                evento_titulo = qr_obj.evento.titulo if qr_obj.evento else None
+
+            # Validar si ya fue usado.
+            # MARCAR COMO USADO (Redimir): el UPDATE condicional decide si esta estación ganó,
+            # aunque otra haya redimido el código entre la lectura y la escritura.
+            if qr_obj.usado or not qr_obj.marcar_como_usado(estacion=estacion_de(request)):
+                if not qr_obj.usado:
+                    qr_obj.refresh_from_db(fields=['usado', 'fecha_uso'])
+                    qr_cache.registrar_redenciones({qr_obj.codigo: qr_obj.fecha_uso})
                 return Response({
                     'status': 'error',
                     'message': f'Este código ya fue usado el {qr_obj.fecha_uso.strftime("%d/%m/%Y %H:%M") if qr_obj.fecha_uso else "previamente"}',
                     'asistente': attendant_info,
                     'tipo': qr_obj.tipo_comida,
-                    'evento': qr_obj.evento.titulo if qr_obj.evento else None
+                    'evento': evento_titulo
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # MARCAR COMO USADO (Redimir)
-            qr_obj.marcar_como_usado()
-            
+            qr_cache.registrar_redenciones({qr_obj.codigo: qr_obj.fecha_uso})
+
             return Response({
                 'status': 'success',
                 'message': 'Código validado exitosamente',
                 'asistente': attendant_info,
                 'tipo': qr_obj.tipo_comida,
                 'fecha_uso': qr_obj.fecha_uso,
-                'evento': qr_obj.evento.titulo if qr_obj.evento else None
+                'evento': evento_titulo
             })
 
         except Exception as e:
             print(f"ERROR CRÍTICO en escanear: {str(e)}")
             return Response({'error': f'Error interno: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Máximo de códigos aceptados en una sola petición de escaneo por lote
+    MAX_ESCANEOS_LOTE = 1000
+
+    @action(detail=False, methods=['post'])
+    def escanear_lote(self, request):
+        """
+        Redime en bloque los escaneos que una estación acumuló sin conexión.
+        Recibe 'escaneos': [{'codigo': <UUID>, 'fecha_escaneo': <ISO 8601>}, ...] y la 'estacion',
+        y devuelve un resultado por código (success / usado / desconocido)
+        con el mismo formato de 'asistente' que el endpoint 'escanear'.
+        """
+        escaneos = request.data.get('escaneos')
+        if not isinstance(escaneos, list) or not escaneos:
+            return Response({'error': 'Se requiere una lista de escaneos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(escaneos) > self.MAX_ESCANEOS_LOTE:
+            return Response(
+                {'error': f'Máximo {self.MAX_ESCANEOS_LOTE} escaneos por petición'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        orden, fechas_por_codigo = normalizar_escaneos(escaneos)
+
+        try:
+            resultados_db = CodigoQR.redimir_en_lote(fechas_por_codigo, estacion=estacion_de(request)) if fechas_por_codigo else {}
+            qr_cache.registrar_redenciones({
+                codigo: qr_obj.fecha_uso for codigo, (qr_obj, redimido) in resultados_db.items() if redimido
+            })
+        except Exception:
+            logger.exception('Error al redimir el lote de escaneos')
+            return Response({'error': 'Error interno al procesar el lote'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        resultados = []
+        reportados = set()
+        resumen = {'success': 0, 'usado': 0, 'desconocido': 0}
+
+        for texto, codigo in orden:
+            if codigo not in resultados_db:
+                resultados.append({
+                    'codigo': texto,
+                    'status': 'desconocido',
+                    'message': 'Código o Identificación no válida'
+                })
+                resumen['desconocido'] += 1
+                continue
+
+            qr_obj, redimido = resultados_db[codigo]
+            # Las repeticiones del mismo código dentro del lote se reportan como ya usadas
+            redimido = redimido and codigo not in reportados
+            reportados.add(codigo)
+
+            item = {
+                'codigo': texto,
+                'asistente': qr_obj.datos_asistente(),
+                'tipo': qr_obj.tipo_comida,
+                'fecha_uso': qr_obj.fecha_uso,
+                'evento': qr_obj.evento.titulo if qr_obj.evento else None
+            }
+            if redimido:
+                item.update({'status': 'success', 'message': 'Código validado exitosamente'})
+                resumen['success'] += 1
+            else:
+                item.update({
+                    'status': 'usado',
+                    'message': f'Este código ya fue usado el {qr_obj.fecha_uso.strftime("%d/%m/%Y %H:%M") if qr_obj.fecha_uso else "previamente"}'
+                })
+                resumen['usado'] += 1
+            resultados.append(item)
+
+        return Response({'resumen': resumen, 'resultados': resultados})
@@ -1,9 +1,13 @@
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework import serializers
 from .models import CustomUser
+import logging
 import random
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from event_management.transaccional import encolar_verificacion, token_estado
+
+logger = logging.getLogger(__name__)
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
@@ -29,11 +33,17 @@ class RegisterSerializer(serializers.ModelSerializer):
     Maneja la creación del usuario y el hasheo de la contraseña.
     """
     password = serializers.CharField(write_only=True) # La contraseña solo se escribe, no se lee
+    # Token para consultar el estado del correo de verificación (/api/users/auth/verify/estado/)
+    token_estado = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'full_name', 'email', 'password', 'role', 'dependency']
+        fields = ['id', 'full_name', 'email', 'password', 'role', 'dependency', 'token_estado']
+
+    def get_token_estado(self, obj):
+        return token_estado(obj)
 
+    @transaction.atomic
     def create(self, validated_data):
         """
         Crea un nuevo usuario usando el CustomUserManager.
@@ -56,20 +66,11 @@ class RegisterSerializer(serializers.ModelSerializer):
             verification_code=code
         )
 
-        # Enviar correo
-        try:
-             print(f"DEBUG CODE for {user.email}: {code}") # Para facilitar pruebas locales
-             send_mail(
-                'Confirma tu cuenta - SIGUE',
-                f'Hola {user.full_name},\n\nTu código de verificación es: {code}',
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            # Si falla el correo, podríamos borrar el usuario o solo loguear. 
-            # Por ahora, permitimos que falle pero logueamos (idealmente rollback manual o transaccional).
-            print(f"Error enviando correo: {e}")
+        # El correo se entrega en segundo plano ('procesar_envios'), con reintentos automáticos;
+        # el registro responde sin esperar al servidor SMTP. Estado en /api/users/auth/verify/estado/
+        if settings.DEBUG:
+            logger.debug(f"Código de verificación para {user.email}: {code}")  # Para facilitar pruebas locales
+        encolar_verificacion(user)
 
         return user
 
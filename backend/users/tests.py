@@ -1,3 +1,78 @@
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from event_management.mail_dispatch import DespachadorCorreos
+from event_management.models import CorreoSaliente
+from .models import CustomUser
+
+
+class RegistroVerificacionTests(TestCase):
+    """Registro con el correo de verificación entregado en segundo plano."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.datos = {
+            'id': '3001', 'full_name': 'Laura Díaz', 'email': 'laura@example.com',
+            'password': 'clave123', 'role': 'Estudiante', 'dependency': 'Contaduria Publica'
+        }
+
+    def _registrar(self):
+        response = self.client.post('/api/users/auth/register/', self.datos, format='json')
+        self.token = response.data.get('token_estado')
+        return response
+
+    def _estado(self):
+        return self.client.get('/api/users/auth/verify/estado/', {'token': self.token})
+
+    def test_registro_no_espera_el_envio(self):
+        response = self._registrar()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(self._estado().data['estado'], 'PENDIENTE')
+
+        call_command('procesar_envios', '--una-vez', stdout=StringIO())
+
+        codigo = CustomUser.objects.get(id='3001').verification_code
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(codigo, mail.outbox[0].body)
+        self.assertEqual(self._estado().data['estado'], 'ENVIADO')
+
+    def test_reintenta_automaticamente_si_falla(self):
+        self._registrar()
+
+        caido = smtplib.SMTPServerDisconnected('Servidor no disponible')
+        with mock.patch.object(DespachadorCorreos, 'intentar', side_effect=caido):
+            call_command('procesar_envios', '--una-vez', stdout=StringIO())
+
+        estado = self._estado().data
+        self.assertEqual(estado['estado'], 'FALLIDO')
+        self.assertEqual(estado['intentos'], 1)
+        self.assertGreater(estado['proximo_intento'], timezone.now())
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Al vencer la espera, el siguiente ciclo del trabajador lo reenvía
+        CorreoSaliente.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+        call_command('procesar_envios', '--una-vez', stdout=StringIO())
+
+        self.assertEqual(self._estado().data['estado'], 'ENVIADO')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_estado_requiere_el_token_del_registro(self):
+        self._registrar()
+
+        # La cédula ya no sirve para consultar el estado de otra persona
+        por_cedula = self.client.get('/api/users/auth/verify/estado/', {'id': '3001'})
+        alterado = self.client.get('/api/users/auth/verify/estado/', {'token': self.token[:-1] + 'x'})
 
-# Create your tests here.
+        self.assertEqual(por_cedula.status_code, 400)
+        self.assertEqual(alterado.status_code, 403)
+        self.assertEqual(self._estado().status_code, 200)
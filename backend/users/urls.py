@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import CustomTokenObtainPairView, RegisterView, UserUpdateView, UserViewSet, VerifyEmailView
+from .views import CustomTokenObtainPairView, RegisterView, UserUpdateView, UserViewSet, VerificationStatusView, VerifyEmailView
 
 # Router para las vistas basadas en ViewSet (CRUD de administradores)
 router = DefaultRouter()
@@ -19,6 +19,9 @@ urlpatterns = [
 
     # Endpoint para verificar email
     path('auth/verify/', VerifyEmailView.as_view(), name='auth_verify'),
+
+    # Endpoint para consultar el estado de entrega del correo de verificación
+    path('auth/verify/estado/', VerificationStatusView.as_view(), name='auth_verify_status'),
     
     # Endpoint para ver y editar el perfil propio del usuario autenticado
     path('profile/', UserUpdateView.as_view(), name='user_profile'),
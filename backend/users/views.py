@@ -6,6 +6,7 @@ from rest_framework import permissions
 from rest_framework import viewsets
 from .serializers import RegisterSerializer, UserSerializer, UserAdminSerializer
 from .models import CustomUser
+from event_management.transaccional import estado_verificacion, usuario_de_token
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """
@@ -82,3 +83,27 @@ class VerifyEmailView(APIView):
             return Response({'message': 'Cuenta verificada exitosamente'}, status=status.HTTP_200_OK)
         else:
             return Response({'error': 'Código incorrecto'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class VerificationStatusView(APIView):
+    """
+    Estado de entrega del correo de verificación (PENDIENTE, ENVIADO, FALLIDO o CANCELADO).
+    Si falló, se reintenta automáticamente; 'proximo_intento' indica cuándo.
+    El usuario aún no puede autenticarse, así que se identifica con el 'token_estado' firmado
+    que devuelve el registro (no con su cédula, que cualquiera podría consultar).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        token = request.query_params.get('token')
+        if not token:
+            return Response({'error': 'El token es obligatorio'}, status=status.HTTP_400_BAD_REQUEST)
+
+        id_usuario = usuario_de_token(token)
+        if id_usuario is None:
+            return Response({'error': 'Token inválido o vencido'}, status=status.HTTP_403_FORBIDDEN)
+
+        estado = estado_verificacion(id_usuario)
+        if estado is None:
+            return Response({'error': 'No hay correos de verificación para este usuario'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(estado)
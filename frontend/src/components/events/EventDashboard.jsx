@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useParams, useNavigate } from 'react-router-dom';
 import { showSuccess, showError, showConfirm, showToast } from '../../services/alert';
+import { suscribirEnVivo } from '../../services/enVivo';
 import { Chart as ChartJS, ArcElement, Tooltip, Legend, CategoryScale, LinearScale, BarElement } from 'chart.js';
 import { Pie, Bar } from 'react-chartjs-2';
 
@@ -21,6 +22,7 @@ const EventDashboard = () => {
     // Estados de botones de acción
     const [generating, setGenerating] = useState(false);
     const [sending, setSending] = useState(false);
+    const [envioProgreso, setEnvioProgreso] = useState(null);
     
     // Estados de filtrado y paginación
     const [searchTerm, setSearchTerm] = useState('');
@@ -32,6 +34,7 @@ const EventDashboard = () => {
     const [showStats, setShowStats] = useState(false);
     const [chartType, setChartType] = useState('pie'); // 'pie' o 'bar'
     const [certTemplate, setCertTemplate] = useState(null);
+    const [certDiseno, setCertDiseno] = useState({});
     const [generatingCerts, setGeneratingCerts] = useState(false);
 
     // Configuración de Auth
@@ -43,16 +46,14 @@ const EventDashboard = () => {
     const fetchAllData = async () => {
         try {
             setLoading(true);
-            // 1. Detalles del Evento
-            const resEvento = await axios.get(`http://localhost:8000/api/eventos/${id}/`, authConfig);
+            // Evento, estadísticas e inscritos en paralelo
+            const [resEvento, resStats, resInscritos] = await Promise.all([
+                axios.get(`http://localhost:8000/api/eventos/${id}/`, authConfig),
+                axios.get(`http://localhost:8000/api/eventos/${id}/estadisticas/`, authConfig),
+                axios.get(`http://localhost:8000/api/eventos/${id}/inscritos/`, authConfig),
+            ]);
             setEvento(resEvento.data);
-
-            // 2. Estadísticas
-            const resStats = await axios.get(`http://localhost:8000/api/eventos/${id}/estadisticas/`, authConfig);
             setStats(resStats.data);
-
-            // 3. Lista de Inscritos
-            const resInscritos = await axios.get(`http://localhost:8000/api/eventos/${id}/inscritos/`, authConfig);
             setInscritos(resInscritos.data);
 
         } catch (error) {
@@ -67,6 +68,29 @@ const EventDashboard = () => {
         if (id) fetchAllData();
     }, [id]);
 
+    // --- DATOS EN VIVO ---
+    // El servidor envía las estadísticas al conectarse, un mensaje por cada escaneo y luego los contadores:
+    // se actualizan los contadores y la asistencia sin volver a pedir la lista de inscritos.
+    useEffect(() => {
+        if (!id) return undefined;
+        return suscribirEnVivo(id, (tipo, datos) => {
+            if (tipo === 'estadisticas') {
+                setStats(datos);
+            } else if (tipo === 'contadores') {
+                setStats(prev => ({ ...prev, ...datos }));
+            } else if (tipo === 'escaneo') {
+                const asistieron = new Set(
+                    datos.escaneos.filter(e => e.tipo === 'ENTRADA' && e.usuario_id).map(e => e.usuario_id)
+                );
+                if (asistieron.size) {
+                    setInscritos(prev => prev.map(ins => (
+                        asistieron.has(ins.usuario.id) && !ins.asistio ? { ...ins, asistio: true } : ins
+                    )));
+                }
+            }
+        });
+    }, [id]);
+
     // --- ACCIONES PRINCIPALES ---
 
     /**
@@ -92,30 +116,66 @@ const EventDashboard = () => {
     };
 
     /**
-     * Envía correos electrónicos masivos con los QRs a todos los inscritos.
+     * Sigue el avance de un trabajo de envío en segundo plano hasta que termina y muestra el resumen.
+     * Si hubo fallos, ofrece reenviar solo esos correos.
      */
-    const handleEnviarEmails = async () => {
-        const confirmed = await showConfirm(
-            'Enviar Correos', 
-            '¿Enviar emails con los códigos QR a todos los inscritos? Esto puede tomar unos segundos.'
-        );
-        if (!confirmed) return;
+    const seguirEnvio = async (res, tipo = 'QR') => {
+        let trabajo = res.data.trabajo;
+        setEnvioProgreso(trabajo);
+
+        while (trabajo.estado === 'PENDIENTE' || trabajo.estado === 'EN_PROCESO') {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            const avance = await axios.get(`http://localhost:8000/api/trabajos/${res.data.trabajo_id}/`, authConfig);
+            trabajo = avance.data;
+            setEnvioProgreso(trabajo);
+        }
+
+        let resumen = `Se enviaron ${trabajo.enviados} emails exitosamente.`;
+        if (trabajo.omitidos > 0) {
+            resumen += ` ${trabajo.omitidos} ya lo habían recibido y no se reenviaron.`;
+        }
+
+        if (trabajo.estado === 'FALLIDO' || trabajo.fallidos > 0) {
+            const errores = await axios.get(`http://localhost:8000/api/eventos/${id}/errores_envio/?tipo=${tipo}`, authConfig);
+            const reenviar = await showConfirm(
+                'Atención',
+                `${resumen} Fallaron ${errores.data.error_count}.\n\nDetalles:\n${errores.data.error_details.join('\n')}`,
+                'Reenviar fallidos'
+            );
+            if (reenviar) return ejecutarEnvio('reenviar_fallidos', tipo);
+            return false;
+        }
+        showSuccess('¡Enviado!', resumen);
+        return true;
+    };
 
+    const ejecutarEnvio = async (accion, tipo = 'QR') => {
         try {
             setSending(true);
-            const res = await axios.post(`http://localhost:8000/api/eventos/${id}/enviar_emails_evento/`, {}, authConfig);
-            if (res.data.error_count > 0 && res.data.error_details) {
-                showError('Atención', `${res.data.message}\n\nDetalles:\n${res.data.error_details.join('\n')}`);
-            } else {
-                showSuccess('¡Enviado!', res.data.message);
-            }
+            const res = await axios.post(`http://localhost:8000/api/eventos/${id}/${accion}/`, { tipo }, authConfig);
+            return await seguirEnvio(res, tipo);
         } catch (error) {
             showError('Error de Envío', 'Error al enviar emails: ' + (error.response?.data?.error || error.message));
+            return false;
         } finally {
             setSending(false);
+            setEnvioProgreso(null);
         }
     };
 
+    /**
+     * Envía correos electrónicos masivos con los QRs a todos los inscritos.
+     */
+    const handleEnviarEmails = async () => {
+        const confirmed = await showConfirm(
+            'Enviar Correos', 
+            '¿Enviar emails con los códigos QR a todos los inscritos? A quienes ya los recibieron no se les reenvían, y el envío continúa en el servidor aunque cierres esta página.'
+        );
+        if (!confirmed) return;
+
+        await ejecutarEnvio('enviar_emails_evento');
+    };
+
     /**
      * Exporta la lista de asistentes a un archivo CSV.
      */
@@ -141,25 +201,40 @@ const EventDashboard = () => {
 
     // --- CERTIFICADOS ---
 
+    // Diseño del certificado: solo se envían los valores que el organizador cambió
+    useEffect(() => {
+        if (showCertModal && evento) {
+            setCertDiseno(evento.diseno_certificado || {});
+        }
+    }, [showCertModal]);
+
+    const actualizarDiseno = (elemento, clave, valor) => {
+        setCertDiseno(prev => ({ ...prev, [elemento]: { ...(prev[elemento] || {}), [clave]: valor } }));
+    };
+
+    const certFormData = () => {
+        const formData = new FormData();
+        if (certTemplate) {
+            formData.append('plantilla', certTemplate);
+        }
+        formData.append('diseno', JSON.stringify(certDiseno));
+        return formData;
+    };
+
     const handleGenerarCertificados = async (e) => {
         e.preventDefault();
         
         const confirmed = await showConfirm(
             'Generar Certificados', 
-            'Esto generará certificados para todos los asistentes que marcaron asistencia y los enviará por correo. ¿Continuar?'
+            'Esto generará certificados para todos los asistentes que marcaron asistencia y los enviará por correo. A quienes ya recibieron el mismo certificado no se les reenvía. ¿Continuar?'
         );
         if (!confirmed) return;
 
         try {
             setGeneratingCerts(true);
-            const formData = new FormData();
-            if (certTemplate) {
-                formData.append('plantilla', certTemplate);
-            }
-            
             const res = await axios.post(
                 `http://localhost:8000/api/eventos/${id}/generar_certificados_masivo/`, 
-                formData, 
+                certFormData(), 
                 {
                     headers: {
                         'Authorization': `Bearer ${token}`,
@@ -168,10 +243,8 @@ const EventDashboard = () => {
                 }
             );
             
-            if (res.data.errors && res.data.errors.length > 0) {
-                 showError('Proceso Finalizado con Errores', `${res.data.message}\n\nErrores:\n${res.data.errors.join('\n')}`);
-            } else {
-                showSuccess('¡Éxito!', res.data.message);
+            // La generación y el envío siguen en el servidor; aquí solo se muestra el avance
+            if (await seguirEnvio(res, 'CERTIFICADO')) {
                 setShowCertModal(false);
                 setCertTemplate(null);
             }
@@ -180,19 +253,15 @@ const EventDashboard = () => {
             showError('Error', 'Error al generar certificados: ' + (error.response?.data?.error || error.message));
         } finally {
             setGeneratingCerts(false);
+            setEnvioProgreso(null);
         }
     };
 
     const handlePreviewCertificado = async () => {
         try {
-            const formData = new FormData();
-            if (certTemplate) {
-                formData.append('plantilla', certTemplate);
-            }
-
             const res = await axios.post(
                 `http://localhost:8000/api/eventos/${id}/ver_previsualizacion_certificado/`, 
-                formData, 
+                certFormData(), 
                 {
                     headers: {
                         'Authorization': `Bearer ${token}`,
@@ -208,7 +277,30 @@ const EventDashboard = () => {
 
         } catch (error) {
             console.error(error);
-            showError('Error', 'No se pudo generar la vista previa. Asegúrate de haber subido una plantilla.');
+            const mensaje = error.response?.data instanceof Blob ? JSON.parse(await error.response.data.text()).error : null;
+            showError('Error', mensaje || 'No se pudo generar la vista previa. Asegúrate de haber subido una plantilla.');
+        }
+    };
+
+    /**
+     * Descarga todos los certificados del evento en un ZIP (el servidor lo genera mientras lo transmite).
+     */
+    const handleExportarCertificados = async () => {
+        try {
+            const res = await axios.get(`http://localhost:8000/api/eventos/${id}/exportar_certificados/`, {
+                headers: { Authorization: `Bearer ${token}` },
+                responseType: 'blob'
+            });
+
+            const url = window.URL.createObjectURL(new Blob([res.data], { type: 'application/zip' }));
+            const link = document.createElement('a');
+            link.href = url;
+            link.setAttribute('download', `certificados_evento_${id}.zip`);
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+        } catch (error) {
+            showError('Error', 'No se pudieron descargar los certificados. Asegúrate de haber subido una plantilla.');
         }
     };
 
@@ -327,7 +419,9 @@ const EventDashboard = () => {
                     disabled={sending}
                     style={{ width: '100%', justifyContent: 'center', height: '100%', display: 'flex', alignItems: 'center' }}
                 >
-                    {sending ? 'Enviando...' : '📧 Enviar QRs por Email'}
+                    {sending
+                        ? (envioProgreso ? `Enviando... ${envioProgreso.procesados}/${envioProgreso.total}` : 'Enviando...')
+                        : '📧 Enviar QRs por Email'}
                 </button>
 
                 <button 
@@ -516,6 +610,74 @@ const EventDashboard = () => {
                                 </small>
                             </div>
 
+                            <div className="form-group">
+                                <label>Diseño del texto (puntos desde la esquina inferior izquierda)</label>
+                                {[
+                                    { elemento: 'nombre', titulo: 'Nombre', x: 400, y: 300, tamano: 24, fuente: 'Helvetica-Bold' },
+                                    { elemento: 'documento', titulo: 'Documento', x: 400, y: 260, tamano: 14, fuente: 'Helvetica' }
+                                ].map(({ elemento, titulo, ...predeterminado }) => {
+                                    const valores = certDiseno[elemento] || {};
+                                    const numero = (clave) => (
+                                        <input
+                                            type="number"
+                                            placeholder={predeterminado[clave]}
+                                            value={valores[clave] ?? ''}
+                                            onChange={(e) => actualizarDiseno(elemento, clave, e.target.value === '' ? undefined : Number(e.target.value))}
+                                            disabled={generatingCerts}
+                                            style={{ width: '70px' }}
+                                        />
+                                    );
+                                    return (
+                                        <div key={elemento} style={{ display: 'flex', flexWrap: 'wrap', gap: '8px', alignItems: 'center', marginTop: '8px' }}>
+                                            <strong style={{ width: '90px' }}>{titulo}</strong>
+                                            X {numero('x')} Y {numero('y')} Tamaño {numero('tamano')}
+                                            <input
+                                                type="text"
+                                                list="fuentes-certificado"
+                                                placeholder={predeterminado.fuente}
+                                                value={valores.fuente ?? ''}
+                                                onChange={(e) => actualizarDiseno(elemento, 'fuente', e.target.value || undefined)}
+                                                disabled={generatingCerts}
+                                                style={{ width: '150px' }}
+                                            />
+                                            <input
+                                                type="color"
+                                                value={valores.color ?? '#000000'}
+                                                onChange={(e) => actualizarDiseno(elemento, 'color', e.target.value)}
+                                                disabled={generatingCerts}
+                                            />
+                                            {elemento === 'nombre' ? (
+                                                <label style={{ fontWeight: 'normal' }}>
+                                                    <input
+                                                        type="checkbox"
+                                                        checked={valores.ajustar ?? false}
+                                                        onChange={(e) => actualizarDiseno(elemento, 'ajustar', e.target.checked)}
+                                                        disabled={generatingCerts}
+                                                    /> Reducir nombres largos
+                                                </label>
+                                            ) : (
+                                                <label style={{ fontWeight: 'normal' }}>
+                                                    <input
+                                                        type="checkbox"
+                                                        checked={valores.mostrar ?? true}
+                                                        onChange={(e) => actualizarDiseno(elemento, 'mostrar', e.target.checked)}
+                                                        disabled={generatingCerts}
+                                                    /> Mostrar
+                                                </label>
+                                            )}
+                                        </div>
+                                    );
+                                })}
+                                <datalist id="fuentes-certificado">
+                                    {['Helvetica', 'Helvetica-Bold', 'Times-Roman', 'Times-Bold', 'Times-Italic', 'Courier', 'Courier-Bold'].map(f => (
+                                        <option key={f} value={f} />
+                                    ))}
+                                </datalist>
+                                <small style={{display: 'block', marginTop: '5px', color: '#666'}}>
+                                    También puedes usar una fuente .ttf instalada en el servidor escribiendo su nombre de archivo.
+                                </small>
+                            </div>
+
                             <div className="modal-footer">
                                 <button 
                                     type="button" 
@@ -527,6 +689,15 @@ const EventDashboard = () => {
                                     👁️ Vista Previa
                                 </button>
 
+                                <button 
+                                    type="button" 
+                                    className="btn btn-secondary" 
+                                    onClick={() => handleExportarCertificados()}
+                                    disabled={generatingCerts}
+                                >
+                                    📦 Descargar ZIP
+                                </button>
+
                                 <button 
                                     type="button" 
                                     className="btn btn-secondary" 
@@ -540,7 +711,9 @@ const EventDashboard = () => {
                                     className="btn btn-primary"
                                     disabled={generatingCerts}
                                 >
-                                    {generatingCerts ? 'Generando y Enviando...' : '🚀 Generar y Enviar'}
+                                    {generatingCerts
+                                        ? (envioProgreso ? `Generando y Enviando... ${envioProgreso.procesados}/${envioProgreso.total}` : 'Generando y Enviando...')
+                                        : '🚀 Generar y Enviar'}
                                 </button>
                             </div>
                         </form>
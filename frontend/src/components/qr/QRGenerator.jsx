@@ -4,7 +4,7 @@ import {
   generarCodigosQR,
   generarCodigosMasivo,
   getCodigosPorEstudiante,
-  getCodigoQRBase64
+  getCodigoQRImagenBlob
 } from '../../services/api';
 import '../../styles/QRGenerator.css';
 
@@ -55,6 +55,15 @@ function QRGenerator() {
     setPendientesCount(count);
   }, [estudiantes]);
 
+  // Liberar las URLs de las imágenes cuando se reemplaza la lista de códigos o al desmontar
+  useEffect(() => {
+    return () => {
+      codigos.forEach(codigo => {
+        if (codigo.imagen) URL.revokeObjectURL(codigo.imagen);
+      });
+    };
+  }, [codigos]);
+
   /**
    * Obtiene la lista completa de asistentes y verifica si ya tienen códigos generados.
    */
@@ -170,14 +179,14 @@ function QRGenerator() {
         return;
       }
       
-      // Cargar imágenes Base64 para cada código
+      // Cargar la imagen de cada código desde la caché de imágenes del backend
       const codigosConImagenes = await Promise.all(
         response.data.map(async (codigo) => {
           try {
-            const imgResponse = await getCodigoQRBase64(codigo.id);
+            const imgResponse = await getCodigoQRImagenBlob(codigo.id);
             return {
               ...codigo,
-              imagen: imgResponse.data.imagen_base64
+              imagen: URL.createObjectURL(imgResponse.data)
             };
           } catch (err) {
             console.error('Error al obtener imagen:', err);
@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef } from 'react';
 import { Html5QrcodeScanner } from 'html5-qrcode';
 import axios from 'axios';
-import { validarCodigoQR } from '../../services/api';
+import { validarCodigoQR, getEstacion, setEstacion, getEventos } from '../../services/api';
 import '../../styles/QRScanner.css';
 
 /**
@@ -14,6 +14,13 @@ function QRScanner() {
   const [scanning, setScanning] = useState(false);
   const [result, setResult] = useState(null);
   const [error, setError] = useState(null);
+  const [estacion, setEstacionActual] = useState(getEstacion());
+
+  // Evento y tipo que atiende la estación: con el evento precargado, el backend valida sin
+  // consultar la BD y la búsqueda manual por cédula se limita a ese evento y tipo.
+  const [eventos, setEventos] = useState([]);
+  const [evento, setEvento] = useState('');
+  const [tipo, setTipo] = useState('');
   
   // Referencias para control de librería y foco
   const [scanner, setScanner] = useState(null);
@@ -26,6 +33,23 @@ function QRScanner() {
     }
   }, []);
 
+  // Cargar los eventos disponibles para el selector
+  useEffect(() => {
+    getEventos()
+      .then(res => setEventos(res.data.results || res.data))
+      .catch(err => console.error('Error cargando eventos:', err));
+  }, []);
+
+  /**
+   * Evento y tipo seleccionados, en el formato que espera 'validarCodigoQR'.
+   */
+  const opcionesEstacion = () => {
+    const opciones = {};
+    if (evento) opciones.evento = evento;
+    if (tipo) opciones.tipo = tipo;
+    return opciones;
+  };
+
   // Recurperar foco tras validar
   useEffect(() => {
     if (result || error) {
@@ -91,7 +115,7 @@ function QRScanner() {
     stopScanning(); // Detener cámara tras lectura exitosa
 
     try {
-      const response = await validarCodigoQR(decodedText);
+      const response = await validarCodigoQR(decodedText, opcionesEstacion());
       setResult({
         success: true,
         mensaje: response.data.mensaje,
@@ -131,7 +155,7 @@ function QRScanner() {
     if (!codigo) return;
 
     try {
-      const response = await validarCodigoQR(codigo);
+      const response = await validarCodigoQR(codigo, opcionesEstacion());
       setResult({
         success: true,
         mensaje: response.data.mensaje,
@@ -307,6 +331,38 @@ function QRScanner() {
         <p style={{ color: '#aaa', marginBottom: '1rem' }}>
           Escanea el código QR (Identificación) con el lector y presiona Enter.
         </p>
+        <div className="form-group">
+          <label htmlFor="estacion">Estación</label>
+          <input
+            id="estacion"
+            type="text"
+            placeholder="Ej: Puerta 1"
+            value={estacion}
+            onChange={(e) => {
+              setEstacionActual(e.target.value);
+              setEstacion(e.target.value);
+            }}
+          />
+        </div>
+        <div className="form-group">
+          <label htmlFor="evento">Evento</label>
+          <select id="evento" value={evento} onChange={(e) => setEvento(e.target.value)}>
+            <option value="">Cualquier evento</option>
+            {eventos.map(ev => (
+              <option key={ev.id} value={ev.id}>{ev.titulo}</option>
+            ))}
+          </select>
+        </div>
+        <div className="form-group">
+          <label htmlFor="tipo">Tipo</label>
+          <select id="tipo" value={tipo} onChange={(e) => setTipo(e.target.value)}>
+            <option value="">Cualquier tipo</option>
+            <option value="ENTRADA">Entrada al Evento</option>
+            <option value="DESAYUNO">Desayuno</option>
+            <option value="ALMUERZO">Almuerzo</option>
+            <option value="REFRIGERIO">Refrigerio</option>
+          </select>
+        </div>
         <form onSubmit={handleManualInput}>
           <div className="form-group">
             <label htmlFor="codigo">Identificación / Código QR</label>
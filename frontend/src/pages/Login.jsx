@@ -97,11 +97,12 @@ const Login = () => {
                 dependency: regData.role === 'Estudiante' ? regData.dependency : (regData.dependency || '')
             };
 
-            await axios.post('http://localhost:8000/api/users/auth/register/', payload);
+            const res = await axios.post('http://localhost:8000/api/users/auth/register/', payload);
             
-            // Éxito: Pasar al paso de verificación
+            // Éxito: Pasar al paso de verificación (el correo se envía en segundo plano)
             setVerificationStep(true);
-            showToast("Código de verificación enviado a su correo", "info");
+            showToast("Enviando código de verificación a su correo...", "info");
+            seguirCorreoVerificacion(res.data.token_estado);
             
         } catch (error) {
             console.error(error);
@@ -109,6 +110,29 @@ const Login = () => {
         }
     };
 
+    /**
+     * Consulta el estado de entrega del correo de verificación hasta que se envíe o falle.
+     * Si falla, el servidor lo reintenta automáticamente.
+     */
+    const seguirCorreoVerificacion = async (tokenEstado) => {
+        for (let intento = 0; intento < 15; intento++) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            try {
+                const res = await axios.get('http://localhost:8000/api/users/auth/verify/estado/', { params: { token: tokenEstado } });
+                if (res.data.estado === 'ENVIADO') {
+                    showToast("Código de verificación enviado a su correo", "success");
+                    return;
+                }
+                if (res.data.estado === 'FALLIDO') {
+                    showToast("No se pudo enviar el código; se reintentará automáticamente", "warning");
+                    return;
+                }
+            } catch (error) {
+                return;
+            }
+        }
+    };
+
     const handleVerifySubmit = async (e) => {
         e.preventDefault();
         try {
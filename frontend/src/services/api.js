@@ -60,9 +60,20 @@ export const importarAsistentesExcel = (formData) => {
 // Gestión centralizada de Códigos QR
 export const getCodigosQR = () => api.get('/qr/');
 export const getCodigoQR = (id) => api.get(`/qr/${id}/`);
-export const validarCodigoQR = (codigo) => api.post('/qr/escanear/', { codigo });
+// Nombre de la estación de este dispositivo (p.ej. 'Puerta 1'): queda registrado en cada redención
+export const getEstacion = () => localStorage.getItem('estacion') || '';
+export const setEstacion = (estacion) => localStorage.setItem('estacion', estacion);
+// 'opciones' permite indicar el evento y tipo que atiende la estación: { evento, tipo }
+export const validarCodigoQR = (codigo, opciones = {}) => api.post('/qr/escanear/', { codigo, estacion: getEstacion(), ...opciones });
+// Envía la cola de escaneos acumulada sin conexión: [{ codigo, fecha_escaneo }]
+export const validarCodigosQRLote = (escaneos) => api.post('/qr/escanear_lote/', { escaneos, estacion: getEstacion() });
+// Escaneos por intervalo (1, 5 o 15 minutos), tipo y estación de un evento
+export const getFlujoEscaneos = (eventoId, intervalo = 5) => api.get(`/eventos/${eventoId}/flujo_escaneos/`, { params: { intervalo } });
 export const getCodigoQRImagen = (id) => `${API_URL}/qr/${id}/generar_imagen/`;
 export const getCodigoQRBase64 = (id) => api.get(`/qr/${id}/generar_base64/`);
+// Imagen del QR renderizada y cacheada por el backend (ETag inmutable, el navegador la reutiliza)
+export const getCodigoQRImagenBlob = (id, formato = 'png') =>
+  api.get(`/qr/${id}/generar_imagen/`, { params: { formato }, responseType: 'blob' });
 export const getCodigosPorAsistente = (asistenteId) => 
   api.get(`/qr/por_asistente/?asistente_id=${asistenteId}`);
 
@@ -0,0 +1,72 @@
+// Cliente del flujo en vivo (Server-Sent Events) de un evento.
+// Se usa fetch en lugar de EventSource para poder enviar el token JWT en el encabezado.
+
+const API_URL = 'http://localhost:8000/api';
+
+// Espera antes de reconectar (el servidor puede indicar otra con 'retry:')
+const ESPERA_RECONEXION = 3000;
+
+/**
+ * Se suscribe al flujo en vivo del evento y llama a onMensaje(tipo, datos) por cada mensaje
+ * ('estadisticas' al conectarse, 'escaneo' por cada redención y 'contadores' tras los escaneos).
+ * Se reconecta sola (enviando Last-Event-ID para no perder mensajes) hasta que se cancele.
+ *
+ * @returns {Function} Cancela la suscripción.
+ */
+export const suscribirEnVivo = (eventoId, onMensaje) => {
+    const controlador = new AbortController();
+    let ultimoId = null;
+    let espera = ESPERA_RECONEXION;
+
+    const procesarBloque = (bloque) => {
+        let tipo = 'message';
+        const datos = [];
+        bloque.split('\n').forEach(linea => {
+            if (!linea || linea.startsWith(':')) return;
+            const separador = linea.indexOf(':');
+            const campo = separador === -1 ? linea : linea.slice(0, separador);
+            const valor = separador === -1 ? '' : linea.slice(separador + 1).replace(/^ /, '');
+            if (campo === 'event') tipo = valor;
+            else if (campo === 'data') datos.push(valor);
+            else if (campo === 'id') ultimoId = valor;
+            else if (campo === 'retry' && !isNaN(parseInt(valor))) espera = parseInt(valor);
+        });
+        if (datos.length) {
+            onMensaje(tipo, JSON.parse(datos.join('\n')));
+        }
+    };
+
+    const conectar = async () => {
+        while (!controlador.signal.aborted) {
+            try {
+                const headers = {
+                    Accept: 'text/event-stream',
+                    Authorization: `Bearer ${localStorage.getItem('token')}`,
+                };
+                if (ultimoId !== null) headers['Last-Event-ID'] = ultimoId;
+
+                const res = await fetch(`${API_URL}/eventos/${eventoId}/en_vivo/`, { headers, signal: controlador.signal });
+                if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+                const lector = res.body.getReader();
+                const decodificador = new TextDecoder();
+                let pendiente = '';
+                for (;;) {
+                    const { value, done } = await lector.read();
+                    if (done) break;
+                    pendiente += decodificador.decode(value, { stream: true });
+                    const bloques = pendiente.split('\n\n');
+                    pendiente = bloques.pop();
+                    bloques.forEach(procesarBloque);
+                }
+            } catch (error) {
+                if (controlador.signal.aborted) return;
+                console.error('Conexión en vivo interrumpida', error);
+            }
+            await new Promise(resolve => setTimeout(resolve, espera));
+        }
+    };
+
+    conectar();
+    return () => controlador.abort();
+};